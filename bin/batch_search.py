@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库联合检索工具 - 命令行批量检索（无界面）
+读取关键词列表（如零件号、材料牌号，每行一个）和数据库配置文件，对所有配置的数据库批量检索，
+每个关键词的结果单独导出为一个文件，并生成汇总表summary.csv。
+关键词按批合并检索：每张表每批只扫描一次（各关键词条件OR合并），而不是每个关键词各扫描一遍。
+
+用法：
+    python bin/batch_search.py -k keywords.txt -c dbs.json -o out_dir -f parquet -w 4
+
+数据库配置文件（JSON）示例：
+    {
+      "databases": [
+        {"db_type": "mysql", "db_alias": "材料库", "host": "10.0.0.5", "port": 3306, "database": "preprae",
+         "user": "reader", "password_env": "CAE_MYSQL_PASSWORD", "tables": ["material"]},
+        {"db_type": "postgresql", "db_alias": "仿真归档", "host": "10.0.0.6", "port": 5432,
+         "database": "cae_archive_db", "user": "postgres", "password": "******"}
+      ]
+    }
+password_env表示从环境变量读取密码；不写tables时检索库中所有表；
+可选non_searchable_columns：{表名: [列名]}，这些列不参与检索
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+# 项目根目录加入模块搜索路径（从任意目录运行脚本都能导入cae_multi_db）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from cae_multi_db.config.db_config import BATCH_SEARCH_CONFIG  # noqa: E402
+from cae_multi_db.config.user_config import build_session_from_config  # noqa: E402
+from cae_multi_db.core.search_engine import CAESearchEngine  # noqa: E402
+from cae_multi_db.core.search_service import prepare_databases  # noqa: E402
+from cae_multi_db.adapters.conn_pool import close_pools  # noqa: E402
+from cae_multi_db.utils.export_utils import RESULT_WRITERS, EXPORT_FORMATS, get_result_formats  # noqa: E402
+
+# 文件名中不允许的字符
+_FILE_NAME_INVALID = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def read_keywords(path):
+    """读取关键词文件（UTF-8，每行一个，忽略空行和#开头的注释行，去重并保持顺序）"""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        keywords = [line.strip() for line in f]
+    return list(dict.fromkeys(kw for kw in keywords if kw and not kw.startswith("#")))
+
+
+def export_keyword_result(result, output_dir, index, file_format):
+    """导出单个关键词的结果（无结果时不生成文件），返回文件路径或空字符串"""
+    if result.empty:
+        return ""
+    safe_keyword = _FILE_NAME_INVALID.sub("_", result.keyword)[:80] or "keyword"
+    path = os.path.join(output_dir, f"{index:04d}_{safe_keyword}{EXPORT_FORMATS[file_format][0]}")
+    RESULT_WRITERS[file_format](result, path)
+    return path
+
+
+def run_batch(session, keywords, output_dir, file_format, workers, batch_size):
+    """
+    按批检索并导出：每批关键词在一个工作线程中检索（连接池进程内共享），检索完成即导出
+    :return: 汇总行列表
+    """
+    indexed = list(enumerate(keywords, start=1))
+    batches = [indexed[start:start + batch_size] for start in range(0, len(indexed), batch_size)]
+
+    def run(batch):
+        start_time = time.time()
+        # 每个线程独立的引擎实例（引擎会记录最近一次检索统计）
+        engine = CAESearchEngine(session, use_cache=False)
+        results = engine.search_keywords([kw for _, kw in batch])
+        elapsed = round(time.time() - start_time, 2)
+        rows = []
+        for index, keyword in batch:
+            result = results[keyword]
+            try:
+                path = export_keyword_result(result, output_dir, index, file_format)
+            except Exception as e:
+                print(f"❌ 导出关键词「{keyword}」失败：{str(e)}")
+                path = "导出失败"
+            rows.append({"序号": index, "关键词": keyword, "命中条数": len(result),
+                         "涉及数据库数": result.db_count, "文件": os.path.basename(path),
+                         "本批耗时（秒）": elapsed})
+        return rows
+
+    summary = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="cae_batch") as executor:
+        futures = [executor.submit(run, batch) for batch in batches]
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                rows = future.result()
+            except Exception as e:
+                print(f"❌ 批次检索异常：{str(e)}")
+                continue
+            summary.extend(rows)
+            print(f"进度：{done}/{len(batches)}批，已完成{len(summary)}/{len(keywords)}个关键词")
+    summary.sort(key=lambda row: row["序号"])
+    return summary
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="CAE多数据库联合检索工具 - 命令行批量检索")
+    parser.add_argument("-k", "--keywords", required=True, help="关键词文件（UTF-8，每行一个）")
+    parser.add_argument("-c", "--config", required=True, help="数据库配置文件（JSON）")
+    parser.add_argument("-o", "--output-dir", default="batch_results", help="结果输出目录（默认batch_results）")
+    parser.add_argument("-f", "--format", default="csv", choices=list(RESULT_WRITERS.keys()),
+                        help="导出格式（默认csv）")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="并行检索的批次数（默认4）")
+    parser.add_argument("-b", "--batch-size", type=int, default=BATCH_SEARCH_CONFIG["keywords_per_statement"],
+                        help="每批合并检索的关键词数（默认%(default)s）")
+    args = parser.parse_args()
+
+    if args.format not in get_result_formats():
+        print(f"❌ 当前环境不支持导出格式{args.format}（需要安装pyarrow）")
+        sys.exit(1)
+    try:
+        keywords = read_keywords(args.keywords)
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取输入文件失败：{e}")
+        sys.exit(1)
+    if not keywords:
+        print("❌ 关键词文件为空")
+        sys.exit(1)
+
+    session, credentials = build_session_from_config(config)
+    start_time = time.time()
+    try:
+        if not prepare_databases(session, credentials, CAESearchEngine(session)):
+            print("❌ 没有验证通过的数据库")
+            sys.exit(1)
+        os.makedirs(args.output_dir, exist_ok=True)
+        print(f"=== 开始批量检索：{len(keywords)}个关键词，每批{args.batch_size}个，{args.workers}个并行批次 ===")
+        summary = run_batch(session, keywords, args.output_dir, args.format, args.workers, max(1, args.batch_size))
+    finally:
+        close_pools()
+
+    summary_path = os.path.join(args.output_dir, "summary.csv")
+    pd.DataFrame(summary).to_csv(summary_path, index=False, encoding="utf-8-sig")
+    hit_keywords = sum(1 for row in summary if row["命中条数"])
+    print(f"=== 完成：{hit_keywords}/{len(keywords)}个关键词有命中，耗时{round(time.time() - start_time, 1)}秒，"
+          f"汇总表：{summary_path} ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库联合检索工具 - HTTP检索接口压测脚本
+用指定并发数的异步客户端在给定时长内循环请求检索接口，统计吞吐量、延迟分位数和各状态码数量
+（503表示超出并发上限被拒绝，504表示超过截止时间）。只依赖tornado，对本机或内网的接口服务发起请求。
+
+用法：
+    python bin/start_api.py -c dbs.json                        # 先启动接口服务
+    python bin/load_test_api.py -k keywords.txt -n 32 -d 30     # 32个并发客户端压测30秒
+    python bin/load_test_api.py -q Q235 -q 铝合金 --stream       # 压测流式接口
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+# 项目根目录加入模块搜索路径（从任意目录运行脚本都能导入cae_multi_db）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from cae_multi_db.config.db_config import API_CONFIG  # noqa: E402
+
+
+def percentile(values, pct):
+    """分位数（最近秩法），values为已排序列表"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+async def run_client(client, urls, stop_at, latencies, statuses, stream_rows):
+    """单个客户端：循环取下一个URL请求，直到压测结束"""
+    for url in urls:
+        if time.monotonic() >= stop_at:
+            return
+        start = time.monotonic()
+        try:
+            response = await client.fetch(url, request_timeout=API_CONFIG["max_timeout"] + 10)
+            status = response.code
+            if "/stream" in url:
+                lines = response.body.decode("utf-8").splitlines()
+                summary = json.loads(lines[-1]).get("_summary", {}) if lines else {}
+                stream_rows.append(summary.get("rows", 0))
+        except HTTPClientError as e:
+            status = e.code
+        except Exception as e:
+            status = type(e).__name__
+        latencies.append(time.monotonic() - start)
+        statuses[status] += 1
+
+
+async def run_load_test(base_url, keywords, concurrency, duration, stream, page_size, timeout):
+    """按并发数启动客户端，返回统计结果"""
+    AsyncHTTPClient.configure(None, max_clients=concurrency)
+    client = AsyncHTTPClient()
+    path = "/api/search/stream" if stream else "/api/search"
+    params = [{"q": kw, "timeout": timeout, **({} if stream else {"page_size": page_size})} for kw in keywords]
+    urls = itertools.cycle([f"{base_url}{path}?{urlencode(p)}" for p in params])
+    latencies, statuses, stream_rows = [], Counter(), []
+    start = time.monotonic()
+    stop_at = start + duration
+    await asyncio.gather(*(run_client(client, urls, stop_at, latencies, statuses, stream_rows)
+                           for _ in range(concurrency)))
+    elapsed = time.monotonic() - start
+    client.close()
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "elapsed": round(elapsed, 2),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "max": round(latencies[-1], 3) if latencies else 0.0,
+        "statuses": dict(statuses),
+        "stream_rows": sum(stream_rows)
+    }
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="CAE多数据库联合检索工具 - HTTP检索接口压测")
+    parser.add_argument("-u", "--url", default=f"http://{API_CONFIG['host']}:{API_CONFIG['port']}",
+                        help="接口服务地址（默认%(default)s）")
+    parser.add_argument("-k", "--keywords", help="关键词文件（UTF-8，每行一个）")
+    parser.add_argument("-q", "--query", action="append", default=[], help="检索关键词（可多次指定）")
+    parser.add_argument("-n", "--concurrency", type=int, default=16, help="并发客户端数（默认16）")
+    parser.add_argument("-d", "--duration", type=float, default=30, help="压测时长（秒，默认30）")
+    parser.add_argument("--stream", action="store_true", help="压测流式接口（/api/search/stream）")
+    parser.add_argument("--page-size", type=int, default=API_CONFIG["default_page_size"], help="分页接口每页条数")
+    parser.add_argument("--timeout", type=float, default=API_CONFIG["default_timeout"], help="请求截止时间（秒）")
+    args = parser.parse_args()
+
+    keywords = list(args.query)
+    if args.keywords:
+        with open(args.keywords, "r", encoding="utf-8-sig") as f:
+            keywords.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not keywords:
+        print("❌ 请用-q或-k指定检索关键词")
+        sys.exit(1)
+
+    print(f"=== 压测{args.url}：{args.concurrency}个并发客户端，{args.duration}秒，{len(keywords)}个关键词 ===")
+    stats = asyncio.run(run_load_test(args.url.rstrip("/"), keywords, max(1, args.concurrency), args.duration,
+                                      args.stream, args.page_size, args.timeout))
+    print(f"请求数：{stats['requests']}，耗时{stats['elapsed']}秒，吞吐量{stats['throughput']}次/秒")
+    print(f"延迟（秒）：p50={stats['p50']} p95={stats['p95']} p99={stats['p99']} max={stats['max']}")
+    print(f"状态码：{stats['statuses']}")
+    if args.stream:
+        print(f"流式返回行数：{stats['stream_rows']}")
+
+
+if __name__ == "__main__":
+    main()
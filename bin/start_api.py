@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库联合检索工具 - HTTP检索接口启动脚本
+供其他内部工具直接调用联合检索（不经过Streamlit页面），只依赖tornado（Streamlit已依赖），无需其他服务。
+数据库配置文件格式与命令行批量检索（bin/batch_search.py）相同。
+
+用法：
+    python bin/start_api.py -c dbs.json --port 8600
+    curl "http://127.0.0.1:8600/api/search?q=Q235&page=1&page_size=20"
+    curl -N "http://127.0.0.1:8600/api/search/stream?q=Q235"
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# 项目根目录加入模块搜索路径（从任意目录运行脚本都能导入cae_multi_db）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from cae_multi_db.api.search_api import make_app  # noqa: E402
+from cae_multi_db.config.db_config import API_CONFIG  # noqa: E402
+from cae_multi_db.config.user_config import build_session_from_config  # noqa: E402
+from cae_multi_db.core.search_service import SearchService, prepare_databases  # noqa: E402
+
+
+async def serve(app, host, port):
+    """启动HTTP服务并一直运行"""
+    server = app.listen(port, address=host, xheaders=True)
+    print(f"=== HTTP检索接口已启动：http://{host}:{port}/api/health ===")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.stop()
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="CAE多数据库联合检索工具 - HTTP检索接口")
+    parser.add_argument("-c", "--config", required=True, help="数据库配置文件（JSON）")
+    parser.add_argument("--host", default=API_CONFIG["host"], help="监听地址（默认%(default)s）")
+    parser.add_argument("--port", type=int, default=API_CONFIG["port"], help="监听端口（默认%(default)s）")
+    parser.add_argument("--max-concurrent", type=int, default=API_CONFIG["max_concurrent_requests"],
+                        help="同时执行的检索请求数上限（默认%(default)s）")
+    args = parser.parse_args()
+
+    try:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取数据库配置文件失败：{e}")
+        sys.exit(1)
+
+    session, credentials = build_session_from_config(config)
+    service = SearchService(session["dynamic_dbs"])
+    api_session = service.open_session(session["user_auth"])
+    try:
+        if not prepare_databases(api_session, credentials):
+            print("❌ 没有验证通过的数据库")
+            sys.exit(1)
+        app, api = make_app(service, api_session, {
+            "max_concurrent_requests": args.max_concurrent,
+            "worker_threads": max(API_CONFIG["worker_threads"], args.max_concurrent)
+        })
+        try:
+            asyncio.run(serve(app, args.host, args.port))
+        except KeyboardInterrupt:
+            print("=== HTTP检索接口已停止 ===")
+        finally:
+            api.close()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,43 @@
 # -*- coding: utf-8 -*-
-"""适配器基类（多线程安全）"""
+"""适配器基类（多线程安全，连接取自进程级连接池，支持库内多连接并行扫描表）"""
+import functools
+import json
+import queue
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import pandas as pd
+from cae_multi_db.adapters.circuit_breaker import DatabaseUnavailableError, get_circuit_breaker
+from cae_multi_db.adapters.conn_pool import get_pool, make_pool_key
+from cae_multi_db.adapters.query_budget import query_slot
+from cae_multi_db.adapters.query_deadline import SearchCancelledError
+from cae_multi_db.config.db_config import SEARCH_CONCURRENCY_CONFIG, BATCH_SEARCH_CONFIG, CIRCUIT_BREAKER_CONFIG
+
+# 单表检索路径（用于前端展示每张表实际使用的检索方式）
+SEARCH_PATH_LABELS = {
+    "fulltext": "FULLTEXT(ngram)索引",
+    "trgm": "pg_trgm索引",
+    "tsvector": "tsvector索引（分词匹配）",
+    "scan": "全表扫描",
+    "shadow": "本地影子索引",
+    "cache": "结果缓存",
+    "skipped": "无可匹配列（跳过）",
+    "timeout": "超时（部分结果）",
+    "cancelled": "已取消（部分结果）",
+    "unavailable": "数据库不可用（熔断跳过）",
+    "error": "检索失败"
+}
+
+# 窄命中格式的列：来源、主键（JSON数组文本）、命中列、命中摘要
+HIT_COLUMNS = ["_db_id", "_db_alias", "_table", "_pk", "_matched_column", "_snippet"]
+
+# 索引建议功能创建的检索辅助列（结果中不展示，全列扫描时不参与拼接）
+SEARCH_TEXT_COLUMN = "_cae_search_text"
+SEARCH_TSV_COLUMN = "_cae_search_tsv"
+GENERATED_SEARCH_COLUMNS = (SEARCH_TEXT_COLUMN, SEARCH_TSV_COLUMN)
+
 
 class BaseDBAdapter(ABC):
     """所有数据库适配器的基类（抽象类）"""
@@ -9,10 +46,41 @@ class BaseDBAdapter(ABC):
         self.db_info = db_info  # 深拷贝后的配置，多线程安全
         self.user_auth = user_auth  # 深拷贝后的权限，多线程安全
         self.conn = None
+        self._pool = None
+        self.table_stats = {}  # 本次检索各表的统计：{table: {"path", "rows", "elapsed"}}
+        self.deadline = None  # 本次检索的截止时间（SearchDeadline），由检索引擎设置，None为不限时
 
     @abstractmethod
     def connect(self):
-        """建立连接，返回(bool, msg)"""
+        """从连接池获取连接，返回(bool, msg)"""
+        pass
+
+    @abstractmethod
+    def _connection_params(self):
+        """返回建立原生连接所需的参数字典"""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def _open_connection(params):
+        """按参数新建一个原生连接（失败时抛出异常），仅由连接池调用"""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def _ping_connection(conn):
+        """探活：连接可用返回True"""
+        pass
+
+    @staticmethod
+    def _reset_connection(conn):
+        """归还连接池前重置连接状态（回滚未结束的事务）"""
+        conn.rollback()
+
+    @staticmethod
+    @abstractmethod
+    def _set_autocommit(conn, enabled):
+        """设置连接的自动提交模式，返回设置前的值"""
         pass
 
     @abstractmethod
@@ -20,17 +88,863 @@ class BaseDBAdapter(ABC):
         """获取所有表名"""
         pass
 
+    def get_tables_meta(self):
+        """
+        批量获取所有表的元信息（不含预览数据）：
+        {table: {"columns": [], "types": {}, "primary_key": [], "row_estimate": 估算行数或None,
+                 "indexes": [{"name", "columns": [], "unique", "type"}]}}
+        默认由get_all_tables和get_columns_catalog组合（无估算行数和索引），各适配器用目录视图批量查询覆盖
+        """
+        catalog = self.get_columns_catalog()
+        return {
+            table: {"columns": catalog.get(table, {}).get("columns", []), "types": catalog.get(table, {}).get("types", {}),
+                    "primary_key": catalog.get(table, {}).get("primary_key", []), "row_estimate": None, "indexes": []}
+            for table in self.get_all_tables()
+        }
+
+    def get_table_previews(self, tables, preview_rows=5, max_workers=None):
+        """
+        并行读取多张表的前preview_rows行（每张表从连接池借出一个连接，查看预览时才调用）
+        :param max_workers: 并行连接数上限，None时读取SEARCH_CONCURRENCY_CONFIG
+        :return: {table: 行元组列表}（读取失败的表不返回）
+        """
+        tables = list(tables)
+        if not tables:
+            return {}
+        workers = max(1, min(max_workers or SEARCH_CONCURRENCY_CONFIG["max_table_workers_per_db"], len(tables)))
+
+        def load(table):
+            conn = self._acquire_connection()
+            try:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(f"SELECT * FROM {self._quote_ident(table)} LIMIT {int(preview_rows)}")
+                    return cursor.fetchall()
+                finally:
+                    cursor.close()
+            finally:
+                self._release_connection(conn)
+
+        previews = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"cae_preview_{self.db_id}") as executor:
+            futures = {table: executor.submit(load, table) for table in tables}
+            for table, future in futures.items():
+                try:
+                    previews[table] = list(future.result())
+                except Exception as e:
+                    print(f"读取{table}预览数据失败：{str(e)}")
+        return previews
+
+    @abstractmethod
+    def get_schema_fingerprint(self):
+        """获取表结构指纹（列定义校验和，表结构变化时指纹变化）"""
+        pass
+
+    @abstractmethod
+    def get_columns_catalog(self):
+        """一次查询获取所有表的列目录：{table: {"columns": [], "types": {}}}"""
+        pass
+
+    @abstractmethod
+    def get_search_indexes(self, tables_catalog=None):
+        """
+        发现可服务关键词检索的索引：{table: [{"name", "kind", ...}]}
+        :param tables_catalog: get_columns_catalog的结果（用于识别列类型）
+        """
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def _quote_ident(name):
+        """标识符加引号"""
+        pass
+
+    @abstractmethod
+    def iter_table_rows(self, table_name, columns, batch_size=5000, where_sql="", params=()):
+        """使用服务端游标流式读取表数据，按批返回元组列表"""
+        pass
+
+    @abstractmethod
+    def _row_hash_sql(self, columns):
+        """单行内容哈希的SQL表达式（非负整数，用于分块校验和）"""
+        pass
+
+    @abstractmethod
+    def _bucket_sql(self, pk_columns, buckets):
+        """按主键哈希分块的SQL表达式（取值0..buckets-1，同一主键始终落在同一块）"""
+        pass
+
+    def get_row_count(self, table_name):
+        """表的总行数"""
+        if not self.connect()[0]:
+            return None
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {self._quote_ident(table_name)}")
+        count = cursor.fetchone()[0]
+        cursor.close()
+        return count
+
+    def get_max_value(self, table_name, column):
+        """列的最大值（用于更新时间列水位），空表返回None"""
+        if not self.connect()[0]:
+            return None
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT MAX({self._quote_ident(column)}) FROM {self._quote_ident(table_name)}")
+        value = cursor.fetchone()[0]
+        cursor.close()
+        return value
+
+    def get_chunk_checksums(self, table_name, columns, pk_columns, buckets):
+        """
+        按主键哈希分块计算每块的行数和行哈希之和（在数据库端聚合，只传回每块一行）
+        :return: {块号: [行数, 校验和字符串]}
+        """
+        if not self.connect()[0]:
+            return {}
+        bucket_sql = self._bucket_sql(pk_columns, buckets)
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT {bucket_sql} AS bucket, COUNT(*), SUM({self._row_hash_sql(columns)})
+            FROM {self._quote_ident(table_name)}
+            GROUP BY {bucket_sql}
+        """)
+        checksums = {int(bucket): [count, str(total)] for bucket, count, total in cursor.fetchall()}
+        cursor.close()
+        return checksums
+
+    def _attach_provenance(self, df, table_name):
+        """为结果添加来源列：_db_id/_db_alias/_table"""
+        df["_db_id"] = self.db_id
+        df["_db_alias"] = self.db_info.get("db_alias", self.db_id)
+        df["_table"] = table_name
+        return df
+
+    def fetch_rows_by_pk(self, table_name, columns, pk_columns, pk_values, chunk_size=500):
+        """
+        按主键批量取回整行（单列主键用IN，复合主键用行构造器IN）
+        :param pk_values: 主键值元组列表
+        :return: DataFrame（含来源列）
+        """
+        if not pk_values or not self.connect()[0]:
+            return pd.DataFrame()
+        q = self._quote_ident
+        select_cols = ", ".join(q(col) for col in columns)
+        rows = []
+        cursor = self.conn.cursor()
+        for start in range(0, len(pk_values), chunk_size):
+            chunk = pk_values[start:start + chunk_size]
+            if len(pk_columns) == 1:
+                where_sql = f"{q(pk_columns[0])} IN ({', '.join(['%s'] * len(chunk))})"
+                params = [value[0] for value in chunk]
+            else:
+                row_placeholder = "(" + ", ".join(["%s"] * len(pk_columns)) + ")"
+                where_sql = (f"({', '.join(q(col) for col in pk_columns)}) IN "
+                             f"({', '.join([row_placeholder] * len(chunk))})")
+                params = [item for value in chunk for item in value]
+            cursor.execute(f"SELECT {select_cols} FROM {q(table_name)} WHERE {where_sql}", params)
+            rows.extend(cursor.fetchall())
+        cursor.close()
+        return self._attach_provenance(pd.DataFrame(rows, columns=columns), table_name)
+
+    def _compile_where(self, columns, schema, keyword):
+        """
+        按列类型编译检索条件：检索索引覆盖全部参与检索的文本列时用索引条件匹配文本，再OR上数值/日期列条件；
+        否则文本列逐列LIKE、数值/日期列按类型匹配，标记为不参与检索的列跳过
+        （索引只覆盖部分文本列、或覆盖了不参与检索的列时不走索引，保证结果与全表扫描一致）
+        :return: (where_sql, params, 检索路径) - 没有可匹配的列时条件恒假，路径为skipped
+        """
+        types = (schema or {}).get("types") or {}
+        skip_columns = set((schema or {}).get("skip_columns") or [])
+        text_columns = [col for col in columns if col not in skip_columns
+                        and self.predicate_compiler.classify(types.get(col)) in ("text", "cast_text")]
+        index_predicate = self._build_index_predicate(schema, keyword, text_columns, skip_columns)
+        if index_predicate:
+            where_sql, params, path = index_predicate
+            typed = self.predicate_compiler.compile(columns, types, keyword, skip_columns, include_text=False)
+            if typed:
+                return (f"(({where_sql}) OR {typed[0]})", tuple(params) + typed[1], path)
+            return (where_sql, params, path)
+        compiled = self.predicate_compiler.compile(columns, types, keyword, skip_columns)
+        if not compiled:
+            return ("1 = 0", (), "skipped")
+        return (compiled[0], compiled[1], "scan")
+
+    def _build_search_query(self, cursor, table_name, keyword, schema=None):
+        """
+        构建单表检索SQL（有可用检索索引时走索引，否则按列类型编译检索条件）
+        :return: (sql, params, 列名列表, 检索路径)，表没有可展示的列时返回None
+        """
+        # 优先使用列目录缓存，未缓存时在同一连接上读取列名（不读取预览数据）
+        columns = schema["columns"] if schema and schema.get("columns") else self._fetch_columns(cursor, table_name)
+        # 索引建议创建的检索辅助列不参与展示和拼接
+        columns = [col for col in columns if col not in GENERATED_SEARCH_COLUMNS]
+        if not columns:
+            return None
+        where_sql, params, path = self._compile_where(columns, schema, keyword)
+        select_cols = ", ".join(self._quote_ident(col) for col in columns)
+        sql = f"SELECT {select_cols} FROM {self._quote_ident(table_name)} WHERE {where_sql}"
+        return (sql, params, columns, path)
+
+    @abstractmethod
+    def _build_index_predicate(self, schema, keyword, text_columns, skip_columns=()):
+        """
+        检索索引覆盖全部text_columns且不覆盖skip_columns时构建索引检索条件（子串匹配语义，与LIKE一致）
+        :param text_columns: 参与检索的文本列
+        :param skip_columns: 不参与检索的列
+        :return: (where_sql, params, 检索路径) 或None（无可用索引或覆盖不全，走全表扫描）
+        """
+        pass
+
     @abstractmethod
-    def get_table_meta(self, table_name, preview_rows=5):
-        """获取表元信息"""
+    def _fetch_columns(self, cursor, table_name):
+        """在指定游标上读取表的列名（按列顺序）"""
         pass
 
+    @staticmethod
     @abstractmethod
-    def search(self, keyword, enabled_tables):
-        """执行检索"""
+    def _server_cursor(conn):
+        """创建服务端游标（结果逐批从服务器读取，不一次性读入内存）"""
         pass
 
     @abstractmethod
+    def cancel_query(self, conn):
+        """取消conn上正在执行的查询（从其他线程调用）"""
+        pass
+
+    def _apply_statement_timeout(self, cursor, sql, timeout_ms):
+        """为即将在cursor上执行的检索语句设置服务端超时（毫秒），返回（可能改写后的）SQL；默认不设置"""
+        return sql
+
+    def _is_cancel_error(self, error):
+        """异常是否由服务端语句超时或查询被取消引起"""
+        return False
+
+    def _execute_search(self, cursor, sql, params=None):
+        """执行检索语句：有截止时间时先检查是否已到期/已取消，再按剩余预算设置服务端语句超时"""
+        if self.deadline is not None:
+            self.deadline.check()
+            timeout_ms = self.deadline.remaining_ms()
+            if timeout_ms is not None:
+                sql = self._apply_statement_timeout(cursor, sql, timeout_ms)
+        cursor.execute(sql, params)
+
+    def _track_query(self, conn):
+        """把conn上即将执行的语句登记到截止时间上，到期或取消时被终止（无截止时间时为空上下文）"""
+        return self.deadline.track(self, conn) if self.deadline is not None else nullcontext()
+
+    def _stopped_path(self):
+        """截止时间已到期或检索已取消时返回对应的检索路径（timeout/cancelled），否则返回None"""
+        if self.deadline is not None and self.deadline.expired():
+            return self.deadline.status()
+        return None
+
+    def _failure_path(self, error):
+        """检索异常对应的检索路径：由超时或取消引起的为timeout/cancelled，其余为error"""
+        if self.deadline is not None and (isinstance(error, SearchCancelledError) or self.deadline.expired()
+                                          or self._is_cancel_error(error)):
+            return self.deadline.status()
+        return "error"
+
+    def _stable_order_sql(self, columns, schema):
+        """没有主键的表按全部列排序（完全相同的行不可区分，顺序互换不影响分页结果）；不可比较的类型按文本排序"""
+        types = (schema or {}).get("types") or {}
+        compiler = self.predicate_compiler
+        return ", ".join(compiler.as_text_sql(col) if compiler.classify(types.get(col)) == "skip"
+                         else self._quote_ident(col) for col in columns)
+
+    def fetch_search_page(self, table_name, keyword, schema=None, after_key=None, limit=100, conn=None):
+        """
+        分页检索单表（LIMIT下推到数据库）：列目录中有主键时按主键keyset分页，
+        否则按全部列排序后OFFSET分页（没有ORDER BY时各页的顺序不稳定，翻页会重复或漏掉行）
+        :param after_key: 上一页返回的next_key（首页为None）
+        :return: (DataFrame, next_key, 检索路径) - 返回不足limit行说明该表已读完
+        """
+        conn = conn or (self.conn if self.connect()[0] else None)
+        if conn is None:
+            # 已熔断的库不尝试连接，该表标记为不可用
+            path = "error" if get_circuit_breaker(self.db_id).allow_request() else "unavailable"
+            return (pd.DataFrame(), after_key, path)
+        q = self._quote_ident
+        pk_columns = list((schema or {}).get("primary_key") or [])
+        with query_slot():
+            cursor = conn.cursor()
+            try:
+                query = self._build_search_query(cursor, table_name, keyword, schema)
+                if not query:
+                    return (pd.DataFrame(), after_key, "scan")
+                sql, params, columns, path = query
+                params = list(params)
+                if pk_columns and all(col in columns for col in pk_columns):
+                    pk_sql = ", ".join(q(col) for col in pk_columns)
+                    if after_key is not None:
+                        if len(pk_columns) == 1:
+                            sql += f" AND {pk_sql} > %s"
+                        else:
+                            sql += f" AND ({pk_sql}) > ({', '.join(['%s'] * len(pk_columns))})"
+                        params.extend(after_key)
+                    sql += f" ORDER BY {pk_sql} LIMIT {int(limit)}"
+                else:
+                    pk_columns = []
+                    sql += (f" ORDER BY {self._stable_order_sql(columns, schema)}"
+                            f" LIMIT {int(limit)} OFFSET {int(after_key or 0)}")
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                cursor.close()
+        df = self._attach_provenance(pd.DataFrame(rows, columns=columns), table_name)
+        if pk_columns:
+            positions = [columns.index(col) for col in pk_columns]
+            next_key = tuple(rows[-1][i] for i in positions) if rows else after_key
+        else:
+            next_key = int(after_key or 0) + len(rows)
+        return (df, next_key, path)
+
+    def count_search_matches(self, table_name, keyword, schema=None, conn=None):
+        """统计单表命中行数（独立的COUNT查询，可通过cancel_query取消）"""
+        conn = conn or (self.conn if self.connect()[0] else None)
+        if conn is None:
+            return None
+        with query_slot():
+            cursor = conn.cursor()
+            try:
+                query = self._build_search_query(cursor, table_name, keyword, schema)
+                if not query:
+                    return 0
+                sql, params, _, _ = query
+                cursor.execute(f"SELECT COUNT(*) FROM ({sql}) AS cae_count", params)
+                return cursor.fetchone()[0]
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                cursor.close()
+
+    @abstractmethod
+    def _search_single_table(self, table_name, keyword, conn=None, schema=None):
+        """
+        在指定连接上检索单个表
+        :param schema: 列目录缓存中的表结构{"columns": [], "types": {}, "search_indexes": []}，为空时在该连接上读取列名
+        :return: (DataFrame, 检索路径) - 检索路径见SEARCH_PATH_LABELS
+        """
+        pass
+
     def close(self):
-        """关闭连接"""
-        pass
\ No newline at end of file
+        """归还连接到连接池"""
+        if self.conn is not None:
+            conn, self.conn = self.conn, None
+            self._release_connection(conn)
+
+    def execute_ddl(self, statements, pause_seconds=0):
+        """
+        逐条执行DDL（自动提交模式，语句之间暂停以减轻数据库压力）
+        :param statements: SQL语句列表
+        :param pause_seconds: 相邻两条语句之间的暂停秒数
+        :return: (bool, msg)
+        """
+        if not self.connect()[0]:
+            return (False, "数据库连接失败")
+        conn = self.conn
+        conn.rollback()
+        previous = self._set_autocommit(conn, True)
+        executed = 0
+        try:
+            cursor = conn.cursor()
+            for sql in statements:
+                if executed and pause_seconds:
+                    time.sleep(pause_seconds)
+                cursor.execute(sql)
+                executed += 1
+            cursor.close()
+            return (True, f"已执行{executed}条语句")
+        except Exception as e:
+            error_msg = f"第{executed + 1}条语句执行失败：{str(e)}"
+            print(error_msg)
+            return (False, error_msg)
+        finally:
+            try:
+                self._set_autocommit(conn, previous)
+            except Exception:
+                pass
+
+    def _get_pool(self):
+        """获取本库当前凭据对应的进程级连接池"""
+        if self._pool is None:
+            key = make_pool_key(self.db_info.get("db_type"), self.db_id, self.db_info, self.user_auth)
+            # 工厂函数只捕获连接参数，不持有适配器（避免连接池引用表元信息等大对象）
+            factory = functools.partial(self._open_connection, self._connection_params())
+            self._pool = get_pool(key, factory, ping=self._ping_connection, reset=self._reset_connection)
+        return self._pool
+
+    def _acquire_connection(self):
+        """
+        从连接池借出一个连接（失败时抛出异常）；该库已熔断时不尝试连接，直接抛出DatabaseUnavailableError，
+        主机不可达等连接失败计入熔断器
+        """
+        breaker = get_circuit_breaker(self.db_id)
+        if not breaker.allow_request():
+            raise DatabaseUnavailableError(f"数据库{self.db_id}暂时不可用（已熔断）：{breaker.last_error}")
+        try:
+            conn = self._get_pool().acquire()
+        except Exception as e:
+            if self._is_unreachable_error(e):
+                breaker.record_failure(e, probe=self._make_probe())
+            raise
+        if breaker.failures:
+            breaker.record_success()
+        return conn
+
+    def _is_unreachable_error(self, error):
+        """连接异常是否表示数据库不可达（主机宕机、网络不通、连接超时；认证失败等不计入熔断）"""
+        return isinstance(error, OSError)
+
+    def _make_probe(self):
+        """熔断探测函数：用较短的连接超时新建并关闭一个连接（只捕获连接参数，不持有适配器）"""
+        params = {**self._connection_params(), "connect_timeout": CIRCUIT_BREAKER_CONFIG["probe_connect_timeout"]}
+        open_connection = self._open_connection
+
+        def probe():
+            open_connection(params).close()
+        return probe
+
+    def _release_connection(self, conn):
+        """归还连接到连接池"""
+        self._get_pool().release(conn)
+
+    def _scan_table(self, table_name, keyword, conn=None, schema=None):
+        """
+        占用一个全局查询名额后检索单个表，并记录检索路径、命中行数和耗时；
+        有截止时间时改为服务端游标逐批读取，超时或取消前已读取的行作为部分结果返回
+        """
+        stopped = self._stopped_path()
+        if stopped:
+            self.table_stats[table_name] = {"path": stopped, "rows": 0, "elapsed": 0.0}
+            return pd.DataFrame()
+        if self.deadline is not None:
+            return self._collect_table_rows(table_name, keyword, conn or self.conn, schema)
+        with query_slot():
+            start_time = time.time()
+            try:
+                df, path = self._search_single_table(table_name, keyword, conn, schema)
+            except Exception as e:
+                # 单表异常只影响该表，不中断其他表的检索
+                print(f"检索{table_name}异常：{str(e)}")
+                df, path = pd.DataFrame(), "error"
+            elapsed = round(time.time() - start_time, 3)
+        self.table_stats[table_name] = {"path": path, "rows": len(df), "elapsed": elapsed}
+        return df
+
+    def _collect_table_rows(self, table_name, keyword, conn, schema=None):
+        """逐批读取单表命中行并合并为DataFrame（_stream_table_rows占用查询名额并记录该表统计）"""
+        columns, rows = None, []
+        stream = self._stream_table_rows(conn, table_name, keyword, schema)
+        try:
+            for columns, batch in stream:
+                rows.extend(batch)
+        finally:
+            stream.close()
+        if columns is None:
+            return pd.DataFrame()
+        return self._attach_provenance(pd.DataFrame(rows, columns=columns), table_name)
+
+    def _build_keywords_query(self, cursor, table_name, keywords, schema=None):
+        """
+        构建多关键词合并检索SQL：WHERE为各关键词条件的OR，SELECT中每个关键词一个CASE标记列，
+        一次扫描即可得到每行命中了哪些关键词
+        :return: (sql, params, 列名列表, [(关键词, 标记列名)], 检索路径)，没有可展示的列或可匹配的列时返回None
+        """
+        columns = schema["columns"] if schema and schema.get("columns") else self._fetch_columns(cursor, table_name)
+        columns = [col for col in columns if col not in GENERATED_SEARCH_COLUMNS]
+        if not columns:
+            return None
+        flag_sqls, flag_params, where_sqls, where_params, flags, paths = [], [], [], [], [], []
+        for idx, keyword in enumerate(keywords):
+            where_sql, params, path = self._compile_where(columns, schema, keyword)
+            if path == "skipped":
+                continue
+            flag = f"cae_kw_{idx}"
+            flag_sqls.append(f"CASE WHEN {where_sql} THEN 1 ELSE 0 END AS {self._quote_ident(flag)}")
+            flag_params.extend(params)
+            where_sqls.append(f"({where_sql})")
+            where_params.extend(params)
+            flags.append((keyword, flag))
+            paths.append(path)
+        if not flags:
+            return None
+        select_cols = ", ".join([self._quote_ident(col) for col in columns] + flag_sqls)
+        sql = f"SELECT {select_cols} FROM {self._quote_ident(table_name)} WHERE {' OR '.join(where_sqls)}"
+        # 任一关键词走索引时记为索引检索
+        path = next((p for p in paths if p != "scan"), "scan")
+        return (sql, tuple(flag_params) + tuple(where_params), columns, flags, path)
+
+    def _scan_table_keywords(self, table_name, keywords, conn=None, schema=None):
+        """
+        占用一个全局查询名额后用一条语句检索单表的多个关键词，并记录检索路径、命中行数和耗时
+        :return: {关键词: DataFrame（含来源列）}，未命中的关键词不返回
+        """
+        conn = conn or self.conn
+        results, path, row_count = {}, "error", 0
+        stopped = self._stopped_path()
+        if stopped:
+            self.table_stats[table_name] = {"path": stopped, "rows": 0, "elapsed": 0.0}
+            return results
+        with query_slot():
+            start_time = time.time()
+            try:
+                cursor = conn.cursor()
+                try:
+                    query = self._build_keywords_query(cursor, table_name, keywords, schema)
+                    if query:
+                        sql, params, columns, flags, path = query
+                        with self._track_query(conn):
+                            self._execute_search(cursor, sql, params)
+                            rows = cursor.fetchall()
+                    else:
+                        path, rows = "skipped", []
+                finally:
+                    cursor.close()
+                if rows:
+                    df = pd.DataFrame(rows, columns=columns + [flag for _, flag in flags])
+                    row_count = len(df)
+                    for keyword, flag in flags:
+                        hit_df = df.loc[df[flag].astype(int) == 1, columns].reset_index(drop=True)
+                        if not hit_df.empty:
+                            results[keyword] = self._attach_provenance(hit_df, table_name)
+            except Exception as e:
+                # 单表异常只影响该表；回滚以免同一连接上后续表检索失败
+                path = self._failure_path(e)
+                print(f"批量检索{table_name}{'超时或已取消' if path != 'error' else '异常'}：{str(e)}")
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            elapsed = round(time.time() - start_time, 3)
+        self.table_stats[table_name] = {"path": path, "rows": row_count, "elapsed": elapsed}
+        return results
+
+    def _stream_table_rows(self, conn, table_name, keyword, schema=None, batch_size=None):
+        """
+        流式检索单表：占用一个全局查询名额，服务端游标逐批fetchmany，每批生成(列名列表, 行元组列表)
+        结束（含提前关闭）时记录检索路径、已读取行数和耗时
+        """
+        batch_size = batch_size or SEARCH_CONCURRENCY_CONFIG["stream_batch_size"]
+        with query_slot():
+            start_time = time.time()
+            path, row_count = "error", 0
+            try:
+                cursor = conn.cursor()
+                query = self._build_search_query(cursor, table_name, keyword, schema)
+                cursor.close()
+                if not query:
+                    path = "scan"
+                    return
+                sql, params, columns, query_path = query
+                with self._track_query(conn):
+                    stream_cursor = self._server_cursor(conn)
+                    try:
+                        self._execute_search(stream_cursor, sql, params)
+                        path = query_path
+                        while True:
+                            # 截止时间到期或被取消时停止读取，已读取的行保留为部分结果
+                            stopped = self._stopped_path()
+                            if stopped:
+                                path = stopped
+                                break
+                            rows = stream_cursor.fetchmany(batch_size)
+                            if not rows:
+                                break
+                            row_count += len(rows)
+                            yield (columns, rows)
+                    finally:
+                        stream_cursor.close()
+            except Exception as e:
+                # 单表异常只影响该表；回滚以免同一连接上后续表检索失败
+                path = self._failure_path(e)
+                print(f"检索{table_name}{'超时或已取消' if path != 'error' else '异常'}：{str(e)}")
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            finally:
+                self.table_stats[table_name] = {
+                    "path": path, "rows": row_count, "elapsed": round(time.time() - start_time, 3)
+                }
+
+    def stream_search_rows(self, keyword, enabled_tables, table_schemas=None, batch_size=None, cancel_event=None):
+        """
+        流式检索（不构建DataFrame）：单连接按enabled_tables顺序逐表检索，每读到一批即生成(表名, 列名列表, 行元组列表)
+        :param cancel_event: 可选threading.Event，置位后在下一批前停止
+        """
+        table_schemas = table_schemas or {}
+        if not enabled_tables or not self.connect()[0]:
+            return
+        try:
+            for idx, table in enumerate(enabled_tables):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                stopped = self._stopped_path()
+                if stopped:
+                    # 截止时间到期或被取消：尚未开始的表标记为超时/已取消
+                    for rest in enabled_tables[idx:]:
+                        self.table_stats[rest] = {"path": stopped, "rows": 0, "elapsed": 0.0}
+                    break
+                stream = self._stream_table_rows(self.conn, table, keyword, table_schemas.get(table), batch_size)
+                try:
+                    for columns, rows in stream:
+                        yield (table, columns, rows)
+                        if cancel_event is not None and cancel_event.is_set():
+                            break
+                finally:
+                    # 提前停止时立即关闭服务端游标并记录该表统计
+                    stream.close()
+        finally:
+            self.close()
+
+    def stream_search(self, keyword, enabled_tables, table_schemas=None, batch_size=None, cancel_event=None):
+        """
+        流式检索：单连接按enabled_tables顺序逐表检索，每读到一批即生成(表名, DataFrame（含来源列）)
+        :param cancel_event: 可选threading.Event，置位后在下一批前停止
+        """
+        stream = self.stream_search_rows(keyword, enabled_tables, table_schemas, batch_size, cancel_event)
+        try:
+            for table, columns, rows in stream:
+                yield (table, self._attach_provenance(pd.DataFrame(rows, columns=columns), table))
+        finally:
+            stream.close()
+
+    def _build_hit_branch(self, table_name, keyword, schema, limit):
+        """
+        构建单表的窄命中查询分支：表名、主键JSON、第一个命中的列及其摘要
+        :return: (sql, params, 检索路径)，表无主键/列类型时返回None（需走逐表检索）
+        """
+        if not schema or not schema.get("types") or not schema.get("primary_key"):
+            return None
+        compiler = self.predicate_compiler
+        columns = [col for col in schema["columns"] if col not in GENERATED_SEARCH_COLUMNS]
+        where_sql, where_params, path = self._compile_where(columns, schema, keyword)
+        if path == "skipped":
+            return (None, (), path)
+        clauses = compiler.compile_clauses(columns, schema["types"], keyword, set(schema.get("skip_columns") or []))
+        text_param = compiler.text_param_sql()
+        case_sql, case_params, snippet_sql, snippet_params = [], [], [], []
+        for column, kind, clause_sql, clause_params in clauses:
+            case_sql.append(f"WHEN {clause_sql} THEN {text_param}")
+            case_params.extend(clause_params + (column,))
+            column_snippet, column_snippet_params = compiler.snippet_sql(
+                column, kind, keyword, BATCH_SEARCH_CONFIG["snippet_length"]
+            )
+            snippet_sql.append(f"WHEN {clause_sql} THEN {column_snippet}")
+            snippet_params.extend(clause_params + column_snippet_params)
+        matched_sql = f"CASE {' '.join(case_sql)} END" if case_sql else "NULL"
+        snippet_expr = f"CASE {' '.join(snippet_sql)} END" if snippet_sql else "NULL"
+        sql = (f"(SELECT {text_param} AS hit_table, {compiler.pk_json_sql(schema['primary_key'])} AS hit_pk, "
+               f"{matched_sql} AS matched_column, {snippet_expr} AS snippet "
+               f"FROM {self._quote_ident(table_name)} WHERE {where_sql} LIMIT {int(limit)})")
+        return (sql, (table_name, *case_params, *snippet_params, *where_params), path)
+
+    def search_hits(self, keyword, tables, table_schemas=None, max_hits_per_table=None, tables_per_statement=None):
+        """
+        单语句批量检索：多张表合并为UNION ALL语句（每条最多tables_per_statement张表），一次往返返回窄命中格式
+        无主键/列类型未加载的表、以及所在语句执行失败的表不在此处检索，返回给调用方走逐表检索
+        :return: (命中DataFrame（HIT_COLUMNS）, 需逐表检索的表列表)
+        """
+        table_schemas = table_schemas or {}
+        max_hits_per_table = max_hits_per_table or BATCH_SEARCH_CONFIG["max_hits_per_table"]
+        tables_per_statement = tables_per_statement or BATCH_SEARCH_CONFIG["tables_per_statement"]
+        branches, fallback_tables = [], []
+        for table in tables:
+            branch = self._build_hit_branch(table, keyword, table_schemas.get(table), max_hits_per_table)
+            if branch is None:
+                fallback_tables.append(table)
+            elif branch[2] == "skipped":
+                self.table_stats[table] = {"path": "skipped", "rows": 0, "elapsed": 0.0}
+            else:
+                branches.append((table, *branch))
+        if not branches:
+            return (pd.DataFrame(columns=HIT_COLUMNS), fallback_tables)
+        if not self.connect()[0]:
+            return (pd.DataFrame(columns=HIT_COLUMNS), fallback_tables + [b[0] for b in branches])
+
+        rows = []
+        for start in range(0, len(branches), tables_per_statement):
+            chunk = branches[start:start + tables_per_statement]
+            sql = " UNION ALL ".join(branch_sql for _, branch_sql, _, _ in chunk)
+            params = [param for _, _, branch_params, _ in chunk for param in branch_params]
+            with query_slot():
+                start_time = time.time()
+                cursor = self.conn.cursor()
+                try:
+                    with self._track_query(self.conn):
+                        self._execute_search(cursor, sql, params)
+                        chunk_rows = cursor.fetchall()
+                except Exception as e:
+                    try:
+                        self.conn.rollback()
+                    except Exception:
+                        pass
+                    failure = self._failure_path(e)
+                    if failure != "error":
+                        # 超时或被取消：该组表不再逐表重试
+                        for table, _, _, _ in chunk:
+                            self.table_stats[table] = {"path": failure, "rows": 0,
+                                                       "elapsed": round(time.time() - start_time, 3)}
+                        continue
+                    # 整条语句失败时该组表退回逐表检索（单表异常只影响该表）
+                    print(f"数据库{self.db_id}批量检索失败，改为逐表检索：{str(e)}")
+                    fallback_tables.extend(table for table, _, _, _ in chunk)
+                    continue
+                finally:
+                    cursor.close()
+                elapsed = round(time.time() - start_time, 3)
+            hit_counts = {}
+            for row in chunk_rows:
+                hit_counts[row[0]] = hit_counts.get(row[0], 0) + 1
+            for table, _, _, path in chunk:
+                self.table_stats[table] = {"path": path, "rows": hit_counts.get(table, 0), "elapsed": elapsed}
+            rows.extend(chunk_rows)
+
+        # 按tables顺序排列（同表内保持数据库返回顺序）
+        table_order = {table: idx for idx, table in enumerate(tables)}
+        rows.sort(key=lambda row: table_order[row[0]])
+        hits = pd.DataFrame(rows, columns=["_table", "_pk", "_matched_column", "_snippet"])
+        hits.insert(0, "_db_alias", self.db_info.get("db_alias", self.db_id))
+        hits.insert(0, "_db_id", self.db_id)
+        return (hits[HIT_COLUMNS], fallback_tables)
+
+    def expand_hits(self, hits, table_schemas=None):
+        """
+        把窄命中展开为整行（按表分组按主键回表，只用于当前展示的页）
+        :param hits: search_hits返回格式的DataFrame（同一个库）
+        :return: {表名: DataFrame（含来源列）}
+        """
+        table_schemas = table_schemas or {}
+        expanded = {}
+        for table, group in hits.groupby("_table", sort=False, observed=True):
+            schema = table_schemas.get(table) or {}
+            pk_columns = schema.get("primary_key")
+            if not pk_columns:
+                continue
+            columns = [col for col in schema["columns"] if col not in GENERATED_SEARCH_COLUMNS]
+            pk_values = [tuple(json.loads(pk)) for pk in group["_pk"]]
+            expanded[table] = self.fetch_rows_by_pk(table, columns, pk_columns, pk_values)
+        return expanded
+
+    def get_table_stats(self, tables):
+        """按tables顺序返回本次检索各表的统计（未检索的表不返回）"""
+        return [
+            {"db_id": self.db_id, "table": table, **self.table_stats[table]}
+            for table in tables if table in self.table_stats
+        ]
+
+    def _search_tables_serial(self, keyword, tables, table_schemas, scan=None):
+        """单连接逐表检索（scan为单表检索函数，默认_scan_table）"""
+        scan = scan or self._scan_table
+        if not self.connect()[0]:
+            return []
+        return [scan(table, keyword, self.conn, table_schemas.get(table)) for table in tables]
+
+    def _search_tables_parallel(self, keyword, tables, workers, table_schemas, scan=None):
+        """
+        多连接并行检索：每个工作线程从连接池借出一个连接，从任务队列中领取表依次扫描（scan为单表检索函数，默认_scan_table）
+        :return: list - 与tables顺序一致的结果列表（未扫描的表为None）
+        """
+        scan = scan or self._scan_table
+        results = [None] * len(tables)
+        task_queue = queue.Queue()
+        for idx, table in enumerate(tables):
+            task_queue.put((idx, table))
+
+        def worker():
+            try:
+                conn = self._acquire_connection()
+            except Exception as e:
+                # 连接失败的线程直接退出，剩余表由其他线程继续领取
+                print(f"数据库{self.db_id}并行检索建立连接失败：{str(e)}")
+                return
+            try:
+                while True:
+                    try:
+                        idx, table = task_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    results[idx] = scan(table, keyword, conn, table_schemas.get(table))
+            finally:
+                self._release_connection(conn)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"cae_tbl_{self.db_id}") as executor:
+            for _ in range(workers):
+                executor.submit(worker)
+        return results
+
+    def search(self, keyword, enabled_tables, max_table_workers=None, table_schemas=None):
+        """
+        执行全表检索（仅检索启用的表）
+        :param keyword: 检索关键词
+        :param enabled_tables: 启用检索的表列表
+        :param max_table_workers: 本库并行扫描的连接数上限，None时读取SEARCH_CONCURRENCY_CONFIG，1为串行
+        :param table_schemas: 列目录缓存{table: {"columns": [], "types": {}}}，命中的表不再查询列信息
+        :return: DataFrame（按enabled_tables顺序合并）
+        """
+        all_results = self.search_tables(keyword, enabled_tables, max_table_workers, table_schemas)
+        if all_results:
+            return pd.concat(all_results, ignore_index=True)
+        return pd.DataFrame()
+
+    def search_tables(self, keyword, enabled_tables, max_table_workers=None, table_schemas=None):
+        """
+        执行全表检索，各表结果分开返回（不合并为宽表，每张表只含自己的列）
+        :return: list - 按enabled_tables顺序排列的非空结果DataFrame
+        """
+        tables = list(enabled_tables)
+        table_schemas = table_schemas or {}
+        if not tables:
+            return []
+        if max_table_workers is None:
+            max_table_workers = SEARCH_CONCURRENCY_CONFIG["max_table_workers_per_db"]
+        workers = max(1, min(max_table_workers, len(tables)))
+
+        try:
+            if workers > 1:
+                results = self._search_tables_parallel(keyword, tables, workers, table_schemas)
+            else:
+                results = self._search_tables_serial(keyword, tables, table_schemas)
+        finally:
+            self.close()
+
+        return [df for df in results if df is not None and not df.empty]
+
+    def search_keywords(self, keywords, enabled_tables, max_table_workers=None, table_schemas=None):
+        """
+        多关键词批量检索：每张表只扫描一次（各关键词条件OR合并，按标记列拆分到各关键词）
+        :param keywords: 关键词列表（建议每批不超过BATCH_SEARCH_CONFIG["keywords_per_statement"]个）
+        :return: {关键词: [各表结果DataFrame]}，各表按enabled_tables顺序排列
+        """
+        tables = list(enabled_tables)
+        table_schemas = table_schemas or {}
+        keywords = list(keywords)
+        if not tables or not keywords:
+            return {keyword: [] for keyword in keywords}
+        if max_table_workers is None:
+            max_table_workers = SEARCH_CONCURRENCY_CONFIG["max_table_workers_per_db"]
+        workers = max(1, min(max_table_workers, len(tables)))
+
+        try:
+            if workers > 1:
+                results = self._search_tables_parallel(keywords, tables, workers, table_schemas,
+                                                       scan=self._scan_table_keywords)
+            else:
+                results = self._search_tables_serial(keywords, tables, table_schemas, scan=self._scan_table_keywords)
+        finally:
+            self.close()
+
+        return {keyword: [table_results[keyword] for table_results in results
+                          if table_results and keyword in table_results]
+                for keyword in keywords}
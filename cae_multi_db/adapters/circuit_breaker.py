@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+数据库熔断器（进程级共享，按db_id区分）
+某库连接失败（主机不可达、连接超时）后熔断：检索直接跳过该库，不再每次等待connect_timeout；
+后台探测线程按退避间隔（逐次加倍，有上限）尝试建立连接，探测成功后恢复。
+状态：closed（正常）→ open（熔断，等待探测）→ half_open（探测中）→ closed / open
+"""
+import threading
+import time
+from cae_multi_db.config.db_config import CIRCUIT_BREAKER_CONFIG
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# 熔断状态（用于前端展示）
+BREAKER_STATE_LABELS = {
+    CLOSED: "🟢 正常",
+    OPEN: "🔴 不可用（已熔断）",
+    HALF_OPEN: "🟡 探测中"
+}
+
+
+class DatabaseUnavailableError(Exception):
+    """数据库处于熔断状态，未尝试连接直接失败"""
+    pass
+
+
+class CircuitBreaker:
+    """单个数据库的熔断器（线程安全）"""
+
+    def __init__(self, db_id):
+        self.db_id = db_id
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0           # 连续连接失败次数
+        self.backoff = 0.0          # 当前探测间隔（秒）
+        self.opened_at = None       # 本次熔断开始时间
+        self.next_probe_at = None   # 下次探测时间
+        self.last_error = ""
+        self.trips = 0              # 累计熔断次数
+        self._probe = None          # 探测函数：无参，建立并关闭一个连接，失败抛异常
+
+    def allow_request(self):
+        """是否允许连接该库（熔断功能关闭时始终允许；探测中不放行检索，由探测结果决定是否恢复）"""
+        if not CIRCUIT_BREAKER_CONFIG["enabled"]:
+            return True
+        with self._lock:
+            return self.state == CLOSED
+
+    def record_success(self):
+        """连接成功：清零失败计数并恢复正常"""
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"数据库{self.db_id}已恢复连接，解除熔断")
+            self.state = CLOSED
+            self.failures = 0
+            self.backoff = 0.0
+            self.opened_at = None
+            self.next_probe_at = None
+
+    def record_failure(self, error, probe=None):
+        """
+        连接失败：连续失败达到阈值时熔断
+        :param probe: 探测函数（熔断后由后台线程调用）
+        """
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if probe is not None:
+                self._probe = probe
+            if self.state == CLOSED and self.failures >= CIRCUIT_BREAKER_CONFIG["failure_threshold"]:
+                self._open(CIRCUIT_BREAKER_CONFIG["base_backoff"])
+                print(f"数据库{self.db_id}连接失败，已熔断，{self.backoff}秒后探测：{self.last_error}")
+        if self.state == OPEN:
+            _ensure_prober()
+
+    def _open(self, backoff):
+        """进入熔断状态（调用方需持有_lock）"""
+        if self.state == CLOSED:
+            self.trips += 1
+            self.opened_at = time.time()
+        self.state = OPEN
+        self.backoff = min(backoff, CIRCUIT_BREAKER_CONFIG["max_backoff"])
+        self.next_probe_at = time.time() + self.backoff
+
+    def probe_due(self):
+        """是否到了探测时间"""
+        with self._lock:
+            return self.state == OPEN and self._probe is not None and time.time() >= self.next_probe_at
+
+    def probe(self):
+        """探测一次（后台线程或“立即探测”调用）：成功则恢复，失败则加倍退避后继续熔断，返回是否成功"""
+        with self._lock:
+            if self.state != OPEN or self._probe is None:
+                return self.state == CLOSED
+            self.state = HALF_OPEN
+            probe = self._probe
+        try:
+            probe()
+        except Exception as e:
+            with self._lock:
+                self.last_error = str(e)
+                self._open(self.backoff * 2 or CIRCUIT_BREAKER_CONFIG["base_backoff"])
+            return False
+        self.record_success()
+        return True
+
+    def reset(self):
+        """手动解除熔断（如修改连接配置后重新验证）"""
+        self.record_success()
+
+    def get_status(self):
+        """当前状态（副本，用于前端展示）"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "opened_at": self.opened_at,
+                "retry_in": max(0.0, round(self.next_probe_at - time.time(), 1)) if self.next_probe_at else None,
+                "trips": self.trips
+            }
+
+
+# ====================== 进程级熔断器注册表 ======================
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+_PROBER_THREAD = None
+
+
+def get_circuit_breaker(db_id):
+    """获取（不存在则创建）指定数据库的熔断器"""
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(db_id)
+        if breaker is None:
+            breaker = CircuitBreaker(db_id)
+            _BREAKERS[db_id] = breaker
+        return breaker
+
+
+def remove_circuit_breaker(db_id):
+    """移除指定数据库的熔断器（删除数据库时调用）"""
+    with _BREAKERS_LOCK:
+        _BREAKERS.pop(db_id, None)
+
+
+def _prober_loop():
+    """后台探测线程：定期探测已熔断且到了探测时间的数据库（逐个探测，每次探测受probe_connect_timeout限制）"""
+    while True:
+        time.sleep(CIRCUIT_BREAKER_CONFIG["probe_interval"])
+        with _BREAKERS_LOCK:
+            breakers = list(_BREAKERS.values())
+        for breaker in breakers:
+            try:
+                if breaker.probe_due():
+                    breaker.probe()
+            except Exception as e:
+                print(f"数据库{breaker.db_id}探测异常：{str(e)}")
+
+
+def _ensure_prober():
+    """启动后台探测线程（进程内只启动一次）"""
+    global _PROBER_THREAD
+    with _BREAKERS_LOCK:
+        if _PROBER_THREAD is None or not _PROBER_THREAD.is_alive():
+            _PROBER_THREAD = threading.Thread(target=_prober_loop, name="cae_breaker_prober", daemon=True)
+            _PROBER_THREAD.start()
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+数据库连接池（进程级共享，跨Streamlit重跑与会话复用连接）
+按(数据库类型, db_id, 主机, 端口, 库名, 用户, 密码摘要)区分连接池，
+支持最小/最大连接数、空闲回收、取用前探活、连接泄漏检测
+"""
+import hashlib
+import threading
+import time
+import traceback
+from collections import deque
+from cae_multi_db.config.db_config import CONNECTION_POOL_CONFIG
+
+
+class PoolTimeoutError(Exception):
+    """连接池已满且等待超时"""
+    pass
+
+
+class ConnectionPool:
+    """单个数据库（同一组凭据）的连接池（线程安全）"""
+
+    def __init__(self, name, factory, ping=None, reset=None, min_size=None, max_size=None,
+                 idle_timeout=None, leak_timeout=None, acquire_timeout=None, pre_ping_idle_seconds=None):
+        """
+        :param name: 连接池名称（用于日志）
+        :param factory: 无参函数，新建一个原生连接（失败抛异常）
+        :param ping: 探活函数ping(conn) -> bool，None时不探活
+        :param reset: 归还前重置函数reset(conn)（如回滚未结束的事务），抛异常则丢弃该连接
+        其余参数为None时读取CONNECTION_POOL_CONFIG
+        """
+        self.name = name
+        self._factory = factory
+        self._ping = ping
+        self._reset = reset
+        self.min_size = CONNECTION_POOL_CONFIG["min_size"] if min_size is None else min_size
+        self.max_size = CONNECTION_POOL_CONFIG["max_size"] if max_size is None else max_size
+        self.idle_timeout = CONNECTION_POOL_CONFIG["idle_timeout"] if idle_timeout is None else idle_timeout
+        self.leak_timeout = CONNECTION_POOL_CONFIG["leak_timeout"] if leak_timeout is None else leak_timeout
+        self.acquire_timeout = CONNECTION_POOL_CONFIG["acquire_timeout"] if acquire_timeout is None else acquire_timeout
+        self.pre_ping_idle_seconds = (CONNECTION_POOL_CONFIG["pre_ping_idle_seconds"]
+                                      if pre_ping_idle_seconds is None else pre_ping_idle_seconds)
+        self._cond = threading.Condition()
+        self._idle = deque()    # 空闲连接：(conn, 上次归还时间)，右端为最近归还
+        self._in_use = {}       # 借出连接：id(conn) -> {"conn", "since", "owner", "stack", "leak_reported"}
+        self._size = 0          # 已创建（含借出、空闲、正在创建）的连接数
+        self._closed = False
+        self.last_active = time.time()
+
+    def _safe_close(self, conn):
+        """关闭原生连接（忽略异常）"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _destroy(self, conn):
+        """关闭连接并释放一个连接名额"""
+        self._safe_close(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def acquire(self, timeout=None):
+        """
+        借出一个连接：优先复用空闲连接（空闲超过阈值先探活），无空闲且未满时新建，已满则等待
+        :param timeout: 等待秒数，None时使用acquire_timeout
+        :return: 原生连接
+        """
+        wait_seconds = self.acquire_timeout if timeout is None else timeout
+        deadline = time.time() + wait_seconds
+        while True:
+            conn, idle_since, create = None, None, False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeoutError(f"连接池{self.name}已关闭")
+                    if self._idle:
+                        conn, idle_since = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(f"连接池{self.name}已满（{self.max_size}），等待{wait_seconds}秒超时")
+                    self._cond.wait(remaining)
+
+            if create:
+                try:
+                    conn = self._factory()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif self._ping and time.time() - idle_since >= self.pre_ping_idle_seconds:
+                # 取用前探活：失效连接直接丢弃，重新领取
+                if not self._safe_ping(conn):
+                    self._destroy(conn)
+                    continue
+
+            with self._cond:
+                self._in_use[id(conn)] = {
+                    "conn": conn,
+                    "since": time.time(),
+                    "owner": threading.current_thread().name,
+                    "stack": "".join(traceback.format_stack(limit=6)[:-1]),
+                    "leak_reported": False
+                }
+                self.last_active = time.time()
+            return conn
+
+    def _safe_ping(self, conn):
+        """执行探活，异常视为连接失效"""
+        try:
+            return bool(self._ping(conn))
+        except Exception:
+            return False
+
+    def release(self, conn, discard=False):
+        """
+        归还连接（先重置状态）；discard为True或重置失败时直接关闭
+        :param conn: acquire借出的连接
+        """
+        with self._cond:
+            info = self._in_use.pop(id(conn), None)
+            self.last_active = time.time()
+        if info is None:
+            # 非本池借出的连接，直接关闭
+            self._safe_close(conn)
+            return
+        if not discard and self._reset:
+            try:
+                self._reset(conn)
+            except Exception:
+                discard = True
+        if discard or self._closed:
+            self._destroy(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.time()))
+            self._cond.notify()
+
+    def evict_idle(self):
+        """回收空闲超过idle_timeout的连接（保留min_size个连接）"""
+        now = time.time()
+        to_close = []
+        with self._cond:
+            while self._idle and self._size - len(to_close) > self.min_size:
+                conn, idle_since = self._idle[0]
+                if now - idle_since < self.idle_timeout:
+                    break
+                self._idle.popleft()
+                to_close.append(conn)
+        for conn in to_close:
+            self._destroy(conn)
+        return len(to_close)
+
+    def check_leaks(self):
+        """检测借出超过leak_timeout未归还的连接，每个连接只报告一次"""
+        now = time.time()
+        leaks = []
+        with self._cond:
+            for info in self._in_use.values():
+                if not info["leak_reported"] and now - info["since"] > self.leak_timeout:
+                    info["leak_reported"] = True
+                    leaks.append(info)
+        for info in leaks:
+            print(f"⚠️ 连接池{self.name}疑似连接泄漏：线程{info['owner']}已占用"
+                  f"{int(now - info['since'])}秒未归还，借出位置：\n{info['stack']}")
+        return len(leaks)
+
+    def is_unused(self):
+        """连接池是否已无任何连接且长时间未被使用（可从注册表移除）"""
+        with self._cond:
+            return self._size == 0 and time.time() - self.last_active > self.idle_timeout
+
+    def close_all(self):
+        """关闭连接池：立即关闭空闲连接，借出的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._destroy(conn)
+
+    def stats(self):
+        """连接池状态：{"size", "idle", "in_use", "max_size"}"""
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "max_size": self.max_size
+            }
+
+
+# ====================== 进程级连接池注册表 ======================
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+_REAPER_THREAD = None
+
+
+def make_pool_key(db_type, db_id, db_info, user_auth):
+    """生成连接池键（密码只保留摘要，凭据变化即使用新池）"""
+    password_digest = hashlib.sha256(str(user_auth.get("password", "")).encode("utf-8")).hexdigest()
+    return (
+        db_type, db_id, db_info.get("host"), int(user_auth.get("port") or db_info.get("port") or 0),
+        db_info.get("database"), user_auth.get("user"), password_digest
+    )
+
+
+def _reaper_loop():
+    """后台回收线程：定期回收空闲连接、检测泄漏、移除无用连接池"""
+    while True:
+        time.sleep(CONNECTION_POOL_CONFIG["reaper_interval"])
+        with _POOLS_LOCK:
+            pools = list(_POOLS.items())
+        for key, pool in pools:
+            try:
+                pool.evict_idle()
+                pool.check_leaks()
+                if pool.is_unused():
+                    with _POOLS_LOCK:
+                        if _POOLS.get(key) is pool:
+                            del _POOLS[key]
+            except Exception as e:
+                print(f"连接池{pool.name}回收异常：{str(e)}")
+
+
+def _ensure_reaper():
+    """启动后台回收线程（进程内只启动一次，调用方需持有_POOLS_LOCK）"""
+    global _REAPER_THREAD
+    if _REAPER_THREAD is None or not _REAPER_THREAD.is_alive():
+        _REAPER_THREAD = threading.Thread(target=_reaper_loop, name="cae_pool_reaper", daemon=True)
+        _REAPER_THREAD.start()
+
+
+def get_pool(key, factory, ping=None, reset=None):
+    """获取（不存在则创建）指定键的连接池"""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(f"{key[0]}:{key[1]}", factory, ping=ping, reset=reset)
+            _POOLS[key] = pool
+            _ensure_reaper()
+        return pool
+
+
+def close_pools(db_id=None):
+    """关闭并移除连接池（db_id为None时关闭全部），用于删除数据库或修改凭据"""
+    with _POOLS_LOCK:
+        keys = [k for k in _POOLS if db_id is None or k[1] == db_id]
+        pools = [_POOLS.pop(k) for k in keys]
+    for pool in pools:
+        pool.close_all()
+
+
+def get_pool_stats(db_id):
+    """汇总指定数据库所有连接池的状态"""
+    with _POOLS_LOCK:
+        pools = [p for k, p in _POOLS.items() if k[1] == db_id]
+    total = {"size": 0, "idle": 0, "in_use": 0}
+    for pool in pools:
+        stats = pool.stats()
+        for field in total:
+            total[field] += stats[field]
+    return total
@@ -2,9 +2,11 @@
 """
 MySQL适配器（支持元信息读取+多线程安全+全列检索）
 """
+import re
 import pymysql
 import pandas as pd
 from cae_multi_db.adapters.base_adapter import BaseDBAdapter
+from cae_multi_db.adapters.predicate_compiler import MySQLPredicateCompiler
 
 class MySQLAdapter(BaseDBAdapter):
     """MySQL适配器（多线程安全，支持元信息读取）"""
@@ -15,23 +17,45 @@ class MySQLAdapter(BaseDBAdapter):
         :param db_info: 数据库基础信息（深拷贝后的）
         :param user_auth: 权限信息（深拷贝后的）
         """
-        self.db_id = db_id
-        self.db_info = db_info
-        self.user_auth = user_auth
-        self.conn = None
+        super().__init__(db_id, db_info, user_auth)
+        self.predicate_compiler = MySQLPredicateCompiler(self._quote_ident)
+
+    def _connection_params(self):
+        """MySQL连接参数"""
+        return {
+            "host": self.db_info["host"],
+            "user": self.user_auth["user"],
+            "password": self.user_auth["password"],
+            "port": int(self.user_auth["port"]),
+            "database": self.db_info["database"],
+            "charset": "utf8mb4",
+            "connect_timeout": 5
+        }
+
+    @staticmethod
+    def _open_connection(params):
+        """新建一个原生MySQL连接（失败抛异常）"""
+        return pymysql.connect(**params)
+
+    @staticmethod
+    def _ping_connection(conn):
+        """MySQL连接探活"""
+        conn.ping(reconnect=False)
+        return True
+
+    @staticmethod
+    def _set_autocommit(conn, enabled):
+        """设置自动提交模式，返回设置前的值"""
+        previous = conn.get_autocommit()
+        conn.autocommit(enabled)
+        return previous
 
     def connect(self):
-        """建立MySQL连接"""
+        """从连接池获取MySQL连接"""
         try:
-            self.conn = pymysql.connect(
-                host=self.db_info["host"],
-                user=self.user_auth["user"],
-                password=self.user_auth["password"],
-                port=int(self.user_auth["port"]),
-                database=self.db_info["database"],
-                charset="utf8mb4",
-                connect_timeout=5
-            )
+            # 已持有连接时直接复用，避免重复借出
+            if self.conn is None:
+                self.conn = self._acquire_connection()
             return (True, "连接成功")
         except Exception as e:
             error_msg = f"MySQL连接失败：{str(e)}"
@@ -39,6 +63,34 @@ class MySQLAdapter(BaseDBAdapter):
             self.close()
             return (False, error_msg)
 
+    def cancel_query(self, conn):
+        """
+        用临时新建的连接执行KILL QUERY终止conn上正在执行的语句（连接本身保留）
+        不从连接池借出、不经过熔断器：连接池耗尽或熔断打开时也能取消
+        """
+        killer = self._open_connection(self._connection_params())
+        try:
+            cursor = killer.cursor()
+            cursor.execute("KILL QUERY %s", (conn.thread_id(),))
+            cursor.close()
+        finally:
+            killer.close()
+
+    def _apply_statement_timeout(self, cursor, sql, timeout_ms):
+        """在第一个SELECT后加MAX_EXECUTION_TIME优化器提示（作用于整条语句，含UNION ALL合并语句）"""
+        return re.sub(r"^(\s*\(?\s*SELECT)\b", rf"\1 /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */", sql,
+                      count=1, flags=re.IGNORECASE)
+
+    def _is_cancel_error(self, error):
+        """1317：查询被KILL QUERY中断；3024：超过MAX_EXECUTION_TIME"""
+        return isinstance(error, pymysql.err.MySQLError) and bool(error.args) and error.args[0] in (1317, 3024)
+
+    def _is_unreachable_error(self, error):
+        """2003/2005：无法连接主机/主机名无法解析；2006/2013：连接中断"""
+        if isinstance(error, pymysql.err.OperationalError):
+            return bool(error.args) and error.args[0] in (2003, 2005, 2006, 2013)
+        return super()._is_unreachable_error(error)
+
     def get_all_tables(self):
         """获取数据库中所有表名"""
         if not self.connect()[0]:
@@ -53,88 +105,253 @@ class MySQLAdapter(BaseDBAdapter):
             print(f"获取表列表失败：{str(e)}")
             return []
 
-    def get_table_meta(self, table_name, preview_rows=5):
-        """获取表的列名和预览数据"""
+    def _fetch_columns(self, cursor, table_name):
+        """在给定游标上读取表的列名"""
+        cursor.execute(f"DESCRIBE {self._quote_ident(table_name)}")
+        return [col[0] for col in cursor.fetchall()]
+
+    @staticmethod
+    def _quote_ident(name):
+        """MySQL标识符加反引号"""
+        return "`" + str(name).replace("`", "``") + "`"
+
+    def _row_hash_sql(self, columns):
+        """行哈希：CRC32(拼接各列)"""
+        return f"CRC32(CONCAT_WS('|', {', '.join(self._quote_ident(col) for col in columns)}))"
+
+    def _bucket_sql(self, pk_columns, buckets):
+        """主键分块：CRC32(拼接主键列)对块数取模（用MOD函数，避免与参数占位符%冲突）"""
+        return f"MOD(CRC32(CONCAT_WS('|', {', '.join(self._quote_ident(col) for col in pk_columns)})), {int(buckets)})"
+
+    def get_schema_fingerprint(self):
+        """表结构指纹：当前库所有列定义和FULLTEXT索引的CRC32校验和（一次聚合查询）"""
+        if not self.connect()[0]:
+            return None
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM information_schema.COLUMNS
+                 WHERE TABLE_SCHEMA = DATABASE()),
+                (SELECT COALESCE(SUM(CRC32(CONCAT_WS(':', TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, ORDINAL_POSITION))), 0)
+                 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()),
+                (SELECT COALESCE(SUM(CRC32(CONCAT_WS(':', TABLE_NAME, INDEX_NAME, COLUMN_NAME, SEQ_IN_INDEX))), 0)
+                 FROM information_schema.STATISTICS
+                 WHERE TABLE_SCHEMA = DATABASE() AND INDEX_TYPE = 'FULLTEXT')
+        """)
+        column_count, column_checksum, index_checksum = cursor.fetchone()
+        cursor.close()
+        return f"{column_count}:{column_checksum}:{index_checksum}"
+
+    def get_columns_catalog(self):
+        """批量获取当前库所有表的列名、类型（按列顺序）和主键列"""
+        if not self.connect()[0]:
+            return {}
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """)
+        tables = {}
+        for table_name, column_name, data_type in cursor.fetchall():
+            schema = tables.setdefault(table_name, {"columns": [], "types": {}, "primary_key": []})
+            schema["columns"].append(column_name)
+            schema["types"][column_name] = data_type
+        # 主键列（按主键内顺序），供影子索引按主键回表
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME
+            FROM information_schema.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = DATABASE() AND CONSTRAINT_NAME = 'PRIMARY'
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """)
+        for table_name, column_name in cursor.fetchall():
+            if table_name in tables:
+                tables[table_name]["primary_key"].append(column_name)
+        cursor.close()
+        return tables
+
+    def get_tables_meta(self):
+        """批量获取当前库所有表的元信息：一次查询列（按列顺序）、类型和估算行数，一次查询全部索引（含主键）"""
         if not self.connect()[0]:
-            return {"columns": [], "preview_data": []}
+            return {}
+        cursor = self.conn.cursor()
         try:
-            cursor = self.conn.cursor()
-            # 获取列名
-            cursor.execute(f"DESCRIBE {table_name}")
-            columns = [col[0] for col in cursor.fetchall()]
-            # 获取预览数据
-            cursor.execute(f"SELECT * FROM {table_name} LIMIT {preview_rows}")
-            preview_data = cursor.fetchall()
-            cursor.close()
-            return {
-                "columns": columns,
-                "preview_data": preview_data
-            }
+            cursor.execute("""
+                SELECT t.TABLE_NAME, t.TABLE_ROWS, c.COLUMN_NAME, c.DATA_TYPE
+                FROM information_schema.TABLES t
+                JOIN information_schema.COLUMNS c
+                  ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+                WHERE t.TABLE_SCHEMA = DATABASE()
+                ORDER BY t.TABLE_NAME, c.ORDINAL_POSITION
+            """)
+            tables = {}
+            for table_name, row_estimate, column_name, data_type in cursor.fetchall():
+                meta = tables.setdefault(table_name, {
+                    "columns": [], "types": {}, "primary_key": [], "indexes": [],
+                    "row_estimate": None if row_estimate is None else int(row_estimate)
+                })
+                meta["columns"].append(column_name)
+                meta["types"][column_name] = data_type
+            # 函数索引的COLUMN_NAME为NULL，GROUP_CONCAT会跳过
+            cursor.execute("""
+                SELECT TABLE_NAME, INDEX_NAME, MIN(NON_UNIQUE), MIN(INDEX_TYPE),
+                       GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX SEPARATOR ',')
+                FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE()
+                GROUP BY TABLE_NAME, INDEX_NAME
+                ORDER BY TABLE_NAME, INDEX_NAME
+            """)
+            for table_name, index_name, non_unique, index_type, column_list in cursor.fetchall():
+                if table_name not in tables:
+                    continue
+                columns = column_list.split(",") if column_list else []
+                if index_name == "PRIMARY":
+                    tables[table_name]["primary_key"] = columns
+                tables[table_name]["indexes"].append({"name": index_name, "columns": columns,
+                                                      "unique": not int(non_unique), "type": str(index_type).lower()})
+            return tables
         except Exception as e:
-            print(f"获取{table_name}元信息失败：{str(e)}")
-            return {"columns": [], "preview_data": []}
-
-    def _search_single_table(self, table_name, keyword):
-        """检索单个表的所有列"""
-        if not self.conn:
-            if not self.connect()[0]:
-                return pd.DataFrame()
-        # 获取表的所有列名
-        meta = self.get_table_meta(table_name)
-        columns = meta["columns"]
-        if not columns:
-            return pd.DataFrame()
-        # 构建全列模糊检索SQL
-        col_str = ", ".join([f"IFNULL({col}, '')" for col in columns])
-        sql = f"""
-            SELECT * FROM {table_name} 
-            WHERE CONCAT_WS(' ', {col_str}) LIKE %s
+            print(f"批量获取表元信息失败：{str(e)}")
+            return {}
+        finally:
+            cursor.close()
+
+    def get_search_indexes(self, tables_catalog=None):
         """
-        search_pattern = f"%{keyword}%"
+        发现使用ngram解析器的FULLTEXT索引（默认解析器无法切分中文，不用于检索）
+        :return: {table: [{"name", "kind": "fulltext", "columns": [], "covers": [], "min_keyword_len"}]}
+                 covers为索引实际覆盖的源列（生成列上的索引为生成表达式引用的列）
+        """
+        if not self.connect()[0]:
+            return {}
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT TABLE_NAME, INDEX_NAME, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX SEPARATOR ',')
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND INDEX_TYPE = 'FULLTEXT'
+            GROUP BY TABLE_NAME, INDEX_NAME
+        """)
+        fulltext_indexes = cursor.fetchall()
+        if not fulltext_indexes:
+            cursor.close()
+            return {}
+        # ngram分词长度决定可走索引的最短关键词
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, (search_pattern,))
+            cursor.execute("SELECT @@ngram_token_size")
+            min_keyword_len = int(cursor.fetchone()[0])
+        except Exception:
+            min_keyword_len = 2
+
+        # 生成列的表达式（索引建议创建的检索文本列），用于确定索引覆盖的源列
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME, GENERATION_EXPRESSION
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND GENERATION_EXPRESSION IS NOT NULL AND GENERATION_EXPRESSION <> ''
+        """)
+        generated = {(table_name, column_name): re.findall(r"`((?:[^`]|``)+)`", expression or "")
+                     for table_name, column_name, expression in cursor.fetchall()}
+
+        indexes = {}
+        parser_cache = {}
+        for table_name, index_name, column_list in fulltext_indexes:
+            if table_name not in parser_cache:
+                # information_schema不记录解析器，从建表语句中读取
+                cursor.execute(f"SHOW CREATE TABLE {self._quote_ident(table_name)}")
+                create_sql = cursor.fetchone()[1]
+                parser_cache[table_name] = {
+                    m.group(1): (m.group(2) or "").lower()
+                    for m in re.finditer(r"FULLTEXT KEY `([^`]+)` \([^)]*\)(?:\s*/\*!\d+\s+WITH PARSER `(\w+)`)?",
+                                         create_sql)
+                }
+            if parser_cache[table_name].get(index_name) != "ngram":
+                continue
+            index_columns = column_list.split(",")
+            covers = []
+            for col in index_columns:
+                for source in generated.get((table_name, col), [col]):
+                    source = source.replace("``", "`")
+                    if source not in covers:
+                        covers.append(source)
+            indexes.setdefault(table_name, []).append({
+                "name": index_name,
+                "kind": "fulltext",
+                "columns": index_columns,
+                "covers": covers,
+                "min_keyword_len": min_keyword_len
+            })
+        cursor.close()
+        return indexes
+
+    def iter_table_rows(self, table_name, columns, batch_size=5000, where_sql="", params=()):
+        """
+        流式读取表数据（SSCursor服务端游标，不把整表读入内存），按批返回元组列表
+        :param where_sql: 可选过滤条件（不含WHERE关键字）
+        """
+        if not self.connect()[0]:
+            return
+        select_cols = ", ".join(self._quote_ident(col) for col in columns)
+        sql = f"SELECT {select_cols} FROM {self._quote_ident(table_name)}"
+        if where_sql:
+            sql += f" WHERE {where_sql}"
+        cursor = self._server_cursor(self.conn)
+        try:
+            cursor.execute(sql, params or None)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def _build_index_predicate(self, schema, keyword, text_columns, skip_columns=()):
+        """
+        ngram FULLTEXT索引覆盖全部参与检索的文本列时构建检索条件：
+        每个索引MATCH短语检索缩小范围，再对索引列做LIKE精确过滤，多个索引以OR组合
+        :return: (where_sql, params, 检索路径) 或None（无可用索引或覆盖不全，走全表扫描）
+        """
+        indexes = [idx for idx in (schema or {}).get("search_indexes", []) if idx["kind"] == "fulltext"]
+        if not indexes or not text_columns or any(len(keyword) < idx.get("min_keyword_len", 2) for idx in indexes):
+            return None
+        # 生成列上的索引覆盖生成表达式引用的列（get_search_indexes读取），普通索引覆盖索引列本身
+        covered = {col for idx in indexes for col in idx.get("covers", idx["columns"])}
+        if not set(text_columns) <= covered or covered & set(skip_columns):
+            return None
+        clauses, params = [], []
+        phrase = '"' + keyword.replace('"', " ") + '"'
+        for idx in indexes:
+            match_cols = ", ".join(self._quote_ident(col) for col in idx["columns"])
+            concat_cols = ", ".join(f"IFNULL({self._quote_ident(col)}, '')" for col in idx["columns"])
+            clauses.append(f"(MATCH({match_cols}) AGAINST (%s IN BOOLEAN MODE) "
+                           f"AND CONCAT_WS(' ', {concat_cols}) LIKE %s)")
+            params.extend([phrase, f"%{keyword}%"])
+        return ("(" + " OR ".join(clauses) + ")", tuple(params), "fulltext")
+
+    @staticmethod
+    def _server_cursor(conn):
+        """服务端游标（SSCursor，结果逐批从服务器读取）"""
+        return conn.cursor(pymysql.cursors.SSCursor)
+
+    def _search_single_table(self, table_name, keyword, conn=None, schema=None):
+        """检索单个表（有ngram FULLTEXT索引时走索引，否则全列扫描；conn为空时使用适配器自身连接）"""
+        if conn is None:
+            if not self.conn and not self.connect()[0]:
+                return (pd.DataFrame(), "error")
+            conn = self.conn
+        try:
+            cursor = conn.cursor()
+            query = self._build_search_query(cursor, table_name, keyword, schema)
+            if not query:
+                cursor.close()
+                return (pd.DataFrame(), "scan")
+            sql, params, columns, path = query
+            cursor.execute(sql, params)
             raw_data = cursor.fetchall()
+            cursor.close()
             df = pd.DataFrame(raw_data, columns=columns)
             # 添加元信息
-            df["_db_id"] = self.db_id
-            df["_db_alias"] = self.db_info.get("db_alias", self.db_id)
-            df["_table"] = table_name
-            return df
+            return (self._attach_provenance(df, table_name), path)
         except Exception as e:
             print(f"检索{table_name}失败：{str(e)}")
-            return pd.DataFrame()
-
-    def search(self, keyword, enabled_tables):
-        """
-        执行全表检索（仅检索启用的表）
-        :param keyword: 检索关键词
-        :param enabled_tables: 启用检索的表列表
-        :return: DataFrame
-        """
-        # 建立连接
-        if not self.connect()[0]:
-            return pd.DataFrame()
-        # 检索所有启用的表
-        all_results = []
-        for table in enabled_tables:
-            df = self._search_single_table(table, keyword)
-            if not df.empty:
-                all_results.append(df)
-        # 合并结果
-        if all_results:
-            combined_df = pd.concat(all_results, ignore_index=True)
-            self.close()
-            return combined_df
-        self.close()
-        return pd.DataFrame()
-
-    def close(self):
-        """关闭连接"""
-        if self.conn:
-            try:
-                self.conn.close()
-            except:
-                pass
-            finally:
-                self.conn = None
\ No newline at end of file
+            return (pd.DataFrame(), "error")
@@ -1,28 +1,124 @@
 # -*- coding: utf-8 -*-
 """PostgreSQL适配器（多线程安全+元信息读取）"""
+import os
+import re
+import socket
+import uuid
 import psycopg2
 import pandas as pd
-from cae_multi_db.adapters.base_adapter import BaseDBAdapter
+from cae_multi_db.adapters.base_adapter import BaseDBAdapter, SEARCH_TSV_COLUMN
+from cae_multi_db.config.db_config import CIRCUIT_BREAKER_CONFIG
+from cae_multi_db.adapters.predicate_compiler import PGPredicateCompiler
+
+
+def _split_top_level(text):
+    """按顶层逗号拆分索引定义（忽略括号和引号内的逗号）"""
+    parts, depth, in_quote, current = [], 0, False, []
+    for ch in text:
+        if ch == "'":
+            in_quote = not in_quote
+        elif not in_quote and ch == "(":
+            depth += 1
+        elif not in_quote and ch == ")":
+            depth -= 1
+        elif not in_quote and depth == 0 and ch == ",":
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    if current:
+        parts.append("".join(current).strip())
+    return parts
+
+
+def _parse_search_index(index_name, index_def, column_types):
+    """
+    解析pg_indexes.indexdef，识别可服务检索的GIN/GiST索引项
+    :return: list - [{"name", "kind": "trgm"/"tsvector", "expression", "config"}]（部分索引不参与）
+    """
+    match = re.search(r"USING (gin|gist) \(", index_def, re.IGNORECASE)
+    if not match:
+        return []
+    # 找到与"USING gin ("配对的右括号
+    start, depth, in_quote, pos = match.end(), 1, False, match.end()
+    while pos < len(index_def) and depth:
+        ch = index_def[pos]
+        if ch == "'":
+            in_quote = not in_quote
+        elif not in_quote and ch == "(":
+            depth += 1
+        elif not in_quote and ch == ")":
+            depth -= 1
+        pos += 1
+    if re.search(r"\bWHERE\b", index_def[pos:], re.IGNORECASE):
+        return []
+    results = []
+    for element in _split_top_level(index_def[start:pos - 1]):
+        trgm = re.match(r"^(.*?)\s+(?:\w+\.)?(?:gin|gist)_trgm_ops$", element, re.DOTALL)
+        if trgm:
+            results.append({"name": index_name, "kind": "trgm", "expression": trgm.group(1), "config": None})
+            continue
+        config = re.match(r"^to_tsvector\(('[^']+'::regconfig)", element, re.IGNORECASE)
+        if config:
+            results.append({"name": index_name, "kind": "tsvector", "expression": element, "config": config.group(1)})
+        elif column_types.get(element.strip('"')) == "tsvector":
+            # 索引建议创建的tsvector生成列固定使用simple分词配置
+            column_config = "'simple'::regconfig" if element.strip('"') == SEARCH_TSV_COLUMN else None
+            results.append({"name": index_name, "kind": "tsvector", "expression": element, "config": column_config})
+    return results
+
+def _expression_columns(expression, columns):
+    """索引表达式引用的列（去掉字符串常量后按标识符匹配表的列名）"""
+    text = re.sub(r"'(?:[^']|'')*'", " ", expression)
+    names = {quoted.replace('""', '"') if quoted else plain
+             for quoted, plain in re.findall(r'"((?:[^"]|"")+)"|([A-Za-z_][A-Za-z0-9_$]*)', text)}
+    return names & set(columns)
 
 class PGAdapter(BaseDBAdapter):
     """PostgreSQL适配器（多线程安全）"""
     def __init__(self, db_id, db_info, user_auth):
-        self.db_id = db_id
-        self.db_info = db_info
-        self.user_auth = user_auth
-        self.conn = None
+        super().__init__(db_id, db_info, user_auth)
+        self.predicate_compiler = PGPredicateCompiler(self._quote_ident)
+
+    def _connection_params(self):
+        """PostgreSQL连接参数"""
+        return {
+            "host": self.db_info["host"],
+            "user": self.user_auth["user"],
+            "password": self.user_auth["password"],
+            "port": int(self.user_auth["port"]),
+            "dbname": self.db_info["database"],
+            "connect_timeout": 5
+        }
+
+    @staticmethod
+    def _open_connection(params):
+        """新建一个原生PostgreSQL连接（失败抛异常）"""
+        return psycopg2.connect(**params)
+
+    @staticmethod
+    def _ping_connection(conn):
+        """PostgreSQL连接探活"""
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+        conn.rollback()
+        return True
+
+    @staticmethod
+    def _set_autocommit(conn, enabled):
+        """设置自动提交模式，返回设置前的值"""
+        previous = conn.autocommit
+        conn.autocommit = enabled
+        return previous
 
     def connect(self):
-        """建立连接"""
+        """从连接池获取PostgreSQL连接"""
         try:
-            self.conn = psycopg2.connect(
-                host=self.db_info["host"],
-                user=self.user_auth["user"],
-                password=self.user_auth["password"],
-                port=int(self.user_auth["port"]),
-                dbname=self.db_info["database"],
-                connect_timeout=5
-            )
+            # 已持有连接时直接复用，避免重复借出
+            if self.conn is None:
+                self.conn = self._acquire_connection()
             return (True, "连接成功")
         except Exception as e:
             error_msg = f"PostgreSQL连接失败：{str(e)}"
@@ -30,6 +126,44 @@ class PGAdapter(BaseDBAdapter):
             self.close()
             return (False, error_msg)
 
+    def cancel_query(self, conn):
+        """发送取消请求终止conn上正在执行的语句（psycopg2线程安全）"""
+        conn.cancel()
+
+    def _apply_statement_timeout(self, cursor, sql, timeout_ms):
+        """SET LOCAL statement_timeout：只在当前事务内有效，随检索结束的提交/回滚失效（命名游标不能执行SET，另开普通游标）"""
+        with cursor.connection.cursor() as timeout_cursor:
+            timeout_cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+        return sql
+
+    def _is_cancel_error(self, error):
+        """57014：query_canceled（statement_timeout到期或取消请求）"""
+        return getattr(error, "pgcode", None) == "57014"
+
+    def _is_unreachable_error(self, error):
+        """
+        带SQLSTATE的按类别判断：08（连接异常）、57P01~57P03（服务端关闭/不可用）计为不可达；
+        建立连接阶段libpq的错误不带SQLSTATE（认证失败、库不存在也一样，消息文本随服务端语言变化），
+        此时按服务端端口能否连通判断：能连通说明是服务端拒绝了本次连接，不计入熔断
+        """
+        if isinstance(error, psycopg2.OperationalError):
+            if error.pgcode is not None:
+                return error.pgcode.startswith("08") or error.pgcode in ("57P01", "57P02", "57P03")
+            return not self._server_reachable()
+        return super()._is_unreachable_error(error)
+
+    def _server_reachable(self):
+        """服务端端口（或本地套接字文件）能否连通（用探测连接超时，只建立TCP连接，不发送任何数据）"""
+        host = self.db_info.get("host") or ""
+        port = int(self.user_auth.get("port") or self.db_info.get("port") or 5432)
+        if not host or host.startswith("/"):
+            return os.path.exists(os.path.join(host or "/var/run/postgresql", f".s.PGSQL.{port}"))
+        try:
+            socket.create_connection((host, port), timeout=CIRCUIT_BREAKER_CONFIG["probe_connect_timeout"]).close()
+            return True
+        except OSError:
+            return False
+
     def get_all_tables(self):
         """获取所有表名"""
         if not self.connect()[0]:
@@ -48,82 +182,250 @@ class PGAdapter(BaseDBAdapter):
             print(f"获取表列表失败：{str(e)}")
             return []
 
-    def get_table_meta(self, table_name, preview_rows=5):
-        """获取表元信息"""
+    def _fetch_columns(self, cursor, table_name):
+        """在给定游标上读取表的列名"""
+        cursor.execute("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = %s
+            ORDER BY ordinal_position
+        """, (table_name,))
+        return [col[0] for col in cursor.fetchall()]
+
+    @staticmethod
+    def _quote_ident(name):
+        """PostgreSQL标识符加双引号（保留大小写）"""
+        return '"' + str(name).replace('"', '""') + '"'
+
+    @staticmethod
+    def _hash32_sql(text_sql):
+        """取文本MD5的前32位作为非负整数"""
+        return f"('x' || substr(md5({text_sql}), 1, 8))::bit(32)::bigint"
+
+    def _row_hash_sql(self, columns):
+        """行哈希：MD5(拼接各列)的前32位"""
+        return self._hash32_sql(f"concat_ws('|', {', '.join(self._quote_ident(col) for col in columns)})")
+
+    def _bucket_sql(self, pk_columns, buckets):
+        """主键分块：MD5(拼接主键列)的前32位 % 块数"""
+        pk_hash = self._hash32_sql(f"concat_ws('|', {', '.join(self._quote_ident(col) for col in pk_columns)})")
+        return f"mod({pk_hash}, {int(buckets)})"
+
+    def get_schema_fingerprint(self):
+        """表结构指纹：public模式下所有列定义与GIN/GiST索引定义的MD5（一次聚合查询）"""
         if not self.connect()[0]:
-            return {"columns": [], "preview_data": []}
+            return None
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM information_schema.columns WHERE table_schema = 'public'),
+                (SELECT md5(COALESCE(string_agg(
+                     table_name || ':' || column_name || ':' || data_type || ':' || ordinal_position,
+                     '|' ORDER BY table_name, ordinal_position), ''))
+                 FROM information_schema.columns WHERE table_schema = 'public'),
+                (SELECT md5(COALESCE(string_agg(indexdef, '|' ORDER BY tablename, indexname), ''))
+                 FROM pg_indexes
+                 WHERE schemaname = 'public' AND indexdef ~* 'USING (gin|gist) ')
+        """)
+        column_count, column_checksum, index_checksum = cursor.fetchone()
+        cursor.close()
+        return f"{column_count}:{column_checksum}:{index_checksum}"
+
+    def get_columns_catalog(self):
+        """批量获取public模式下所有表的列名、类型（按列顺序）和主键列"""
+        if not self.connect()[0]:
+            return {}
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT table_name, column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+            ORDER BY table_name, ordinal_position
+        """)
+        tables = {}
+        for table_name, column_name, data_type in cursor.fetchall():
+            schema = tables.setdefault(table_name, {"columns": [], "types": {}, "primary_key": []})
+            schema["columns"].append(column_name)
+            schema["types"][column_name] = data_type
+        # 主键列（按主键内顺序），供影子索引按主键回表
+        cursor.execute("""
+            SELECT kcu.table_name, kcu.column_name
+            FROM information_schema.table_constraints tc
+            JOIN information_schema.key_column_usage kcu
+              ON kcu.constraint_name = tc.constraint_name
+             AND kcu.table_schema = tc.table_schema
+             AND kcu.table_name = tc.table_name
+            WHERE tc.constraint_type = 'PRIMARY KEY' AND tc.table_schema = 'public'
+            ORDER BY kcu.table_name, kcu.ordinal_position
+        """)
+        for table_name, column_name in cursor.fetchall():
+            if table_name in tables:
+                tables[table_name]["primary_key"].append(column_name)
+        cursor.close()
+        return tables
+
+    def get_tables_meta(self):
+        """
+        批量获取public模式下所有表的元信息：一次查询列（按ordinal_position）、类型和估算行数（pg_class.reltuples），
+        一次查询全部索引（含主键，按索引内列顺序）
+        """
+        if not self.connect()[0]:
+            return {}
+        cursor = self.conn.cursor()
         try:
-            cursor = self.conn.cursor()
-            # 获取列名
-            cursor.execute(f"""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = %s
-            """, (table_name,))
-            columns = [col[0] for col in cursor.fetchall()]
-            # 获取预览数据
-            cursor.execute(f"SELECT * FROM {table_name} LIMIT {preview_rows}")
-            preview_data = cursor.fetchall()
-            cursor.close()
-            return {
-                "columns": columns,
-                "preview_data": preview_data
-            }
+            cursor.execute("""
+                SELECT c.table_name, cls.reltuples, c.column_name, c.data_type
+                FROM information_schema.columns c
+                JOIN pg_catalog.pg_namespace n ON n.nspname = c.table_schema
+                JOIN pg_catalog.pg_class cls ON cls.relnamespace = n.oid AND cls.relname = c.table_name
+                WHERE c.table_schema = 'public'
+                ORDER BY c.table_name, c.ordinal_position
+            """)
+            tables = {}
+            for table_name, reltuples, column_name, data_type in cursor.fetchall():
+                meta = tables.setdefault(table_name, {
+                    "columns": [], "types": {}, "primary_key": [], "indexes": [],
+                    # reltuples为-1表示从未ANALYZE，视为未知
+                    "row_estimate": int(reltuples) if reltuples is not None and reltuples >= 0 else None
+                })
+                meta["columns"].append(column_name)
+                meta["types"][column_name] = data_type
+            # 表达式索引的列号为0，不对应任何列
+            cursor.execute("""
+                SELECT t.relname, i.relname, ix.indisprimary, ix.indisunique, am.amname,
+                       ARRAY(SELECT a.attname::text
+                             FROM unnest(ix.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+                             JOIN pg_catalog.pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+                             ORDER BY k.ord)
+                FROM pg_catalog.pg_index ix
+                JOIN pg_catalog.pg_class t ON t.oid = ix.indrelid
+                JOIN pg_catalog.pg_class i ON i.oid = ix.indexrelid
+                JOIN pg_catalog.pg_namespace n ON n.oid = t.relnamespace
+                JOIN pg_catalog.pg_am am ON am.oid = i.relam
+                WHERE n.nspname = 'public'
+                ORDER BY t.relname, i.relname
+            """)
+            for table_name, index_name, is_primary, is_unique, index_type, columns in cursor.fetchall():
+                if table_name not in tables:
+                    continue
+                if is_primary:
+                    tables[table_name]["primary_key"] = list(columns)
+                tables[table_name]["indexes"].append({"name": index_name, "columns": list(columns),
+                                                      "unique": bool(is_unique), "type": index_type})
+            return tables
         except Exception as e:
-            print(f"获取{table_name}元信息失败：{str(e)}")
-            return {"columns": [], "preview_data": []}
-
-    def _search_single_table(self, table_name, keyword):
-        """检索单个表"""
-        if not self.conn:
-            if not self.connect()[0]:
-                return pd.DataFrame()
-        meta = self.get_table_meta(table_name)
-        columns = meta["columns"]
-        if not columns:
-            return pd.DataFrame()
-        # 构建SQL
-        col_str = ", ".join([f"COALESCE({col}::text, '')" for col in columns])
-        sql = f"""
-            SELECT * FROM {table_name} 
-            WHERE CONCAT_WS(' ', {col_str}) LIKE %s
+            print(f"批量获取表元信息失败：{str(e)}")
+            return {}
+        finally:
+            cursor.close()
+
+    def get_search_indexes(self, tables_catalog=None):
         """
-        search_pattern = f"%{keyword}%"
+        发现public模式下可服务检索的pg_trgm GIN/GiST索引与tsvector索引
+        :return: {table: [{"name", "kind", "expression", "config"}]}
+        """
+        if not self.connect()[0]:
+            return {}
+        tables_catalog = tables_catalog or {}
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT tablename, indexname, indexdef
+            FROM pg_indexes
+            WHERE schemaname = 'public' AND indexdef ~* 'USING (gin|gist) '
+        """)
+        indexes = {}
+        for table_name, index_name, index_def in cursor.fetchall():
+            column_types = tables_catalog.get(table_name, {}).get("types", {})
+            items = _parse_search_index(index_name, index_def, column_types)
+            if items:
+                indexes.setdefault(table_name, []).extend(items)
+        cursor.close()
+        return indexes
+
+    def iter_table_rows(self, table_name, columns, batch_size=5000, where_sql="", params=()):
+        """
+        流式读取表数据（命名游标即服务端游标，不把整表读入内存），按批返回元组列表
+        :param where_sql: 可选过滤条件（不含WHERE关键字）
+        """
+        if not self.connect()[0]:
+            return
+        select_cols = ", ".join(self._quote_ident(col) for col in columns)
+        sql = f"SELECT {select_cols} FROM {self._quote_ident(table_name)}"
+        if where_sql:
+            sql += f" WHERE {where_sql}"
+        cursor = self._server_cursor(self.conn)
+        cursor.itersize = batch_size
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, (search_pattern,))
+            cursor.execute(sql, params or None)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def _build_index_predicate(self, schema, keyword, text_columns, skip_columns=()):
+        """
+        pg_trgm索引表达式覆盖全部参与检索的文本类型列时构建检索条件（LIKE语义不变，多个索引表达式OR组合）；
+        需转换为text后匹配的列（布尔、uuid、interval、枚举等）未被索引覆盖时逐列OR上"列"::text LIKE，
+        结果与全表扫描一致
+        tsvector索引按分词匹配，不能保证子串检索的结果（如零件号片段），默认检索不使用
+        :return: (where_sql, params, 检索路径) 或None（无可用索引或覆盖不全，走全表扫描）
+        """
+        # lower(...)/upper(...)表达式上的索引只能服务不区分大小写的匹配，默认检索区分大小写，不使用
+        trgm_indexes = [idx for idx in (schema or {}).get("search_indexes", []) if idx["kind"] == "trgm"
+                        and not re.match(r"^\(*\s*(lower|upper)\(", idx["expression"], re.IGNORECASE)]
+        if not trgm_indexes or not text_columns:
+            return None
+        columns = set((schema or {}).get("columns") or [])
+        types = (schema or {}).get("types") or {}
+        covered = set()
+        for idx in trgm_indexes:
+            covered |= _expression_columns(idx["expression"], columns)
+        compiler = self.predicate_compiler
+        kinds = {col: compiler.classify(types.get(col)) for col in text_columns}
+        required = {col for col, kind in kinds.items() if kind == "text"}
+        if not required or not required <= covered or covered & set(skip_columns):
+            return None
+        clauses, params = [], []
+        for idx in trgm_indexes:
+            clauses.append(f"({idx['expression'].replace('%', '%%')}) LIKE %s")
+            params.append(f"%{keyword}%")
+        for col in text_columns:
+            if col not in covered:
+                clauses.append(compiler.text_clause(col, kinds[col]))
+                params.append(f"%{keyword}%")
+        return ("(" + " OR ".join(clauses) + ")", tuple(params), "trgm")
+
+    @staticmethod
+    def _server_cursor(conn):
+        """服务端游标（命名游标，结果逐批从服务器读取）"""
+        return conn.cursor(name=f"cae_stream_{uuid.uuid4().hex[:12]}")
+
+    def _search_single_table(self, table_name, keyword, conn=None, schema=None):
+        """检索单个表（有pg_trgm/tsvector索引时走索引，否则全列扫描；conn为空时使用适配器自身连接）"""
+        if conn is None:
+            if not self.conn and not self.connect()[0]:
+                return (pd.DataFrame(), "error")
+            conn = self.conn
+        try:
+            cursor = conn.cursor()
+            query = self._build_search_query(cursor, table_name, keyword, schema)
+            if not query:
+                cursor.close()
+                return (pd.DataFrame(), "scan")
+            sql, params, columns, path = query
+            cursor.execute(sql, params)
             raw_data = cursor.fetchall()
+            cursor.close()
             df = pd.DataFrame(raw_data, columns=columns)
-            df["_db_id"] = self.db_id
-            df["_db_alias"] = self.db_info.get("db_alias", self.db_id)
-            df["_table"] = table_name
-            return df
+            return (self._attach_provenance(df, table_name), path)
         except Exception as e:
-            print(f"检索{table_name}失败：{str(e)}")
-            return pd.DataFrame()
-
-    def search(self, keyword, enabled_tables):
-        """执行检索"""
-        if not self.connect()[0]:
-            return pd.DataFrame()
-        all_results = []
-        for table in enabled_tables:
-            df = self._search_single_table(table, keyword)
-            if not df.empty:
-                all_results.append(df)
-        if all_results:
-            combined_df = pd.concat(all_results, ignore_index=True)
-            self.close()
-            return combined_df
-        self.close()
-        return pd.DataFrame()
-
-    def close(self):
-        """关闭连接"""
-        if self.conn:
+            # 事务出错后需回滚，否则同一连接上的后续表检索会全部失败
             try:
-                self.conn.close()
-            except:
+                conn.rollback()
+            except Exception:
                 pass
-            finally:
-                self.conn = None
\ No newline at end of file
+            print(f"检索{table_name}失败：{str(e)}")
+            return (pd.DataFrame(), "error")
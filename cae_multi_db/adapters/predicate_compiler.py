@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+检索条件编译器（按列目录中的列类型生成检索条件，不再把每一列都转成文本拼接）
+文本类列：逐列LIKE；数值关键词：整数/定点数列等值匹配，浮点列按关键词精度做范围匹配；
+日期形关键词：日期/时间列按天（或月、分钟、秒）范围匹配；二进制、JSON、空间类型等列不参与检索
+"""
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from cae_multi_db.utils.text_utils import normalize_text
+
+_NUMBER_RE = re.compile(r"[+-]?\d+(?:\.\d+)?")
+# 日期形关键词：2026-01-03 / 2026/1/3 / 2026.01.03 / 2026年1月3日，可带时:分[:秒]；或只到月
+_DATE_RE = re.compile(
+    r"(\d{4})\s*[-/.年]\s*(\d{1,2})\s*(?:[-/.月]\s*(\d{1,2})\s*日?\s*"
+    r"(?:[ t]\s*(\d{1,2}):(\d{2})(?::(\d{2}))?)?|月?)"
+)
+
+
+def parse_number(keyword):
+    """
+    解析数值关键词
+    :return: (Decimal值, 小数位数)，不是数值时返回None
+    """
+    text = normalize_text(keyword).strip().replace(",", "")
+    if not _NUMBER_RE.fullmatch(text):
+        return None
+    decimals = len(text.split(".")[1]) if "." in text else 0
+    return (Decimal(text), decimals)
+
+
+def parse_date_range(keyword):
+    """
+    解析日期形关键词为半开区间[start, end)
+    精度随关键词变化：只到月为整月，到日为整天，带时分（秒）时为该分钟（秒）
+    :return: (datetime, datetime)，不是日期时返回None
+    """
+    match = _DATE_RE.fullmatch(normalize_text(keyword).strip())
+    if not match:
+        return None
+    year, month, day, hour, minute, second = match.groups()
+    try:
+        if day is None:
+            start = datetime(int(year), int(month), 1)
+            end = datetime(start.year + (start.month == 12), start.month % 12 + 1, 1)
+        elif hour is None:
+            start = datetime(int(year), int(month), int(day))
+            end = start + timedelta(days=1)
+        elif second is None:
+            start = datetime(int(year), int(month), int(day), int(hour), int(minute))
+            end = start + timedelta(minutes=1)
+        else:
+            start = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+            end = start + timedelta(seconds=1)
+    except ValueError:
+        return None
+    return (start, end)
+
+
+class PredicateCompiler(ABC):
+    """检索条件编译器基类（类型分类与方言差异由子类提供，方言片段未实现的子类不能实例化）"""
+
+    TEXT_TYPES = set()            # 可直接LIKE的文本列
+    INTEGER_TYPES = set()         # 整数列（等值匹配）
+    EXACT_NUMERIC_TYPES = set()   # 定点数列（等值匹配）
+    APPROX_NUMERIC_TYPES = set()  # 浮点列（范围匹配）
+    DATE_TYPES = set()            # 日期/时间列（范围匹配）
+    SKIP_TYPES = set()            # 不参与检索的列（二进制、JSON、空间类型等）
+
+    def __init__(self, quote_ident):
+        self.quote_ident = quote_ident
+
+    def classify(self, column_type):
+        """列类型分类：text/cast_text/integer/exact/approx/date/skip（未知类型按文本处理，保持可检索）"""
+        column_type = str(column_type or "").lower()
+        for kind, types in (("text", self.TEXT_TYPES), ("integer", self.INTEGER_TYPES),
+                            ("exact", self.EXACT_NUMERIC_TYPES), ("approx", self.APPROX_NUMERIC_TYPES),
+                            ("date", self.DATE_TYPES), ("skip", self.SKIP_TYPES)):
+            if column_type in types:
+                return kind
+        return "cast_text"
+
+    def text_clause(self, column, kind):
+        """文本匹配表达式（cast_text列由子类决定是否需要显式转换）"""
+        return f"{self.quote_ident(column)} LIKE %s"
+
+    def compile_clauses(self, columns, types, keyword, skip_columns=(), include_text=True):
+        """
+        逐列编译检索条件
+        :param types: 列类型{列名: 类型}，缺失时按文本处理
+        :param skip_columns: 标记为不参与检索的列
+        :param include_text: False时只编译数值/日期条件（已有文本索引时与索引条件组合）
+        :return: list - [(列名, 类型分类, 条件SQL, 参数元组)]
+        """
+        number = parse_number(keyword)
+        date_range = parse_date_range(keyword)
+        clauses = []
+        for column in columns:
+            if column in skip_columns:
+                continue
+            kind = self.classify(types.get(column))
+            col = self.quote_ident(column)
+            if kind in ("text", "cast_text"):
+                if include_text:
+                    clauses.append((column, kind, self.text_clause(column, kind), (f"%{keyword}%",)))
+            elif kind == "integer" and number and number[0] == number[0].to_integral_value():
+                clauses.append((column, kind, f"{col} = %s", (int(number[0]),)))
+            elif kind == "exact" and number:
+                clauses.append((column, kind, f"{col} = %s", (number[0],)))
+            elif kind == "approx" and number:
+                # 按关键词精度匹配：1.5匹配[1.45, 1.55)
+                half_step = Decimal(1).scaleb(-number[1]) / 2
+                clauses.append((column, kind, f"({col} >= %s AND {col} < %s)",
+                                (float(number[0] - half_step), float(number[0] + half_step))))
+            elif kind == "date" and date_range:
+                clauses.append((column, kind, f"({col} >= %s AND {col} < %s)", tuple(date_range)))
+        return clauses
+
+    def compile(self, columns, types, keyword, skip_columns=(), include_text=True):
+        """
+        编译单表检索条件（各列条件以OR连接），参数同compile_clauses
+        :return: (where_sql, params)，没有任何可匹配的列时返回None
+        """
+        clauses = self.compile_clauses(columns, types, keyword, skip_columns, include_text)
+        if not clauses:
+            return None
+        return ("(" + " OR ".join(sql for _, _, sql, _ in clauses) + ")",
+                tuple(param for _, _, _, params in clauses for param in params))
+
+    # ====================== 批量命中检索（窄结果格式）使用的方言片段 ======================
+    @abstractmethod
+    def text_param_sql(self):
+        """文本参数占位（UNION ALL各分支的列类型需一致）"""
+        pass
+
+    @abstractmethod
+    def as_text_sql(self, column):
+        """列值转文本"""
+        pass
+
+    @abstractmethod
+    def pk_json_sql(self, pk_columns):
+        """主键值编码为JSON数组文本"""
+        pass
+
+    @abstractmethod
+    def snippet_sql(self, column, kind, keyword, length):
+        """
+        命中列摘要：文本列截取关键词附近的片段，其他列取整个值的文本
+        :return: (sql, params)
+        """
+        pass
+
+
+class MySQLPredicateCompiler(PredicateCompiler):
+    """MySQL方言（information_schema.COLUMNS.DATA_TYPE）"""
+
+    TEXT_TYPES = {"char", "varchar", "tinytext", "text", "mediumtext", "longtext", "enum", "set"}
+    INTEGER_TYPES = {"tinyint", "smallint", "mediumint", "int", "integer", "bigint", "year"}
+    EXACT_NUMERIC_TYPES = {"decimal", "numeric"}
+    APPROX_NUMERIC_TYPES = {"float", "double", "real"}
+    DATE_TYPES = {"date", "datetime", "timestamp"}
+    SKIP_TYPES = {
+        "binary", "varbinary", "tinyblob", "blob", "mediumblob", "longblob", "bit", "json",
+        "geometry", "point", "linestring", "polygon", "multipoint", "multilinestring",
+        "multipolygon", "geometrycollection"
+    }
+
+    def text_param_sql(self):
+        return "CAST(%s AS CHAR)"
+
+    def as_text_sql(self, column):
+        return f"CAST({self.quote_ident(column)} AS CHAR)"
+
+    def pk_json_sql(self, pk_columns):
+        return f"CAST(JSON_ARRAY({', '.join(self.quote_ident(col) for col in pk_columns)}) AS CHAR)"
+
+    def snippet_sql(self, column, kind, keyword, length):
+        text = self.as_text_sql(column)
+        if kind in ("text", "cast_text"):
+            return (f"SUBSTRING({text}, GREATEST(1, LOCATE(%s, {text}) - {int(length) // 3}), {int(length)})",
+                    (keyword,))
+        return (text, ())
+
+
+class PGPredicateCompiler(PredicateCompiler):
+    """PostgreSQL方言（information_schema.columns.data_type）"""
+
+    TEXT_TYPES = {"text", "character varying", "character", "name", "citext"}
+    INTEGER_TYPES = {"smallint", "integer", "bigint"}
+    EXACT_NUMERIC_TYPES = {"numeric"}
+    APPROX_NUMERIC_TYPES = {"real", "double precision"}
+    DATE_TYPES = {"date", "timestamp without time zone", "timestamp with time zone"}
+    SKIP_TYPES = {"bytea", "json", "jsonb", "tsvector", "tsquery", "array", "point", "line", "lseg",
+                  "box", "path", "polygon", "circle"}
+
+    def text_param_sql(self):
+        return "CAST(%s AS text)"
+
+    def as_text_sql(self, column):
+        return f"{self.quote_ident(column)}::text"
+
+    def pk_json_sql(self, pk_columns):
+        return f"json_build_array({', '.join(self.quote_ident(col) for col in pk_columns)})::text"
+
+    def snippet_sql(self, column, kind, keyword, length):
+        text = self.as_text_sql(column)
+        if kind in ("text", "cast_text"):
+            return (f"substr({text}, greatest(1, strpos({text}, %s) - {int(length) // 3}), {int(length)})",
+                    (keyword,))
+        return (text, ())
+
+    def text_clause(self, column, kind):
+        """非文本类型（uuid、枚举、时间等）需显式转换为text后LIKE"""
+        if kind == "cast_text":
+            return f"{self.quote_ident(column)}::text LIKE %s"
+        return f"{self.quote_ident(column)} LIKE %s"
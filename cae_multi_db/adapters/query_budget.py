@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+全局查询预算（跨库并发与库内并行共享同一组查询名额，控制同时在途的查询总数）
+"""
+import threading
+from contextlib import contextmanager
+from cae_multi_db.config.db_config import SEARCH_CONCURRENCY_CONFIG
+
+# 进程级信号量：所有适配器的表检索查询都需先获取名额
+_GLOBAL_QUERY_SLOTS = threading.BoundedSemaphore(SEARCH_CONCURRENCY_CONFIG["global_query_budget"])
+
+
+@contextmanager
+def query_slot():
+    """获取一个全局查询名额（阻塞等待），退出时归还"""
+    _GLOBAL_QUERY_SLOTS.acquire()
+    try:
+        yield
+    finally:
+        _GLOBAL_QUERY_SLOTS.release()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+检索截止时间与取消（一次检索的时间预算，跨库、跨线程共享）
+每条检索语句执行前按剩余预算设置服务端语句超时（MySQL MAX_EXECUTION_TIME / PostgreSQL statement_timeout），
+正在执行的语句登记在截止时间上：预算用完或被取消（新检索、点击取消、客户端断开）时，
+用KILL QUERY / 取消请求终止这些语句，尚未开始的表不再检索，已读取的行作为部分结果返回
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from cae_multi_db.config.db_config import SEARCH_DEADLINE_CONFIG
+
+
+class SearchCancelledError(Exception):
+    """截止时间已到或检索已取消，不再执行新的语句"""
+    pass
+
+
+class _RunningQuery:
+    """登记中的语句：取消与注销互斥，避免连接归还连接池后被误终止"""
+
+    def __init__(self, adapter, conn):
+        self.adapter = adapter
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.active = True
+
+
+class SearchDeadline:
+    """一次检索的截止时间预算（timeout为None或0时不限时，但仍可取消）"""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or None
+        self.expires_at = time.monotonic() + timeout if timeout else None
+        self.reason = None  # 停止原因："timeout"或"cancelled"
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._running = set()
+        self._timer = None
+        if self.expires_at is not None:
+            # 兜底：即使服务端不支持语句超时（如MariaDB忽略MAX_EXECUTION_TIME），到期时也主动终止在途语句
+            self._timer = threading.Timer(timeout, self.cancel, args=("timeout",))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def remaining(self):
+        """剩余秒数（不限时为None）"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def remaining_ms(self):
+        """剩余毫秒数，用作服务端语句超时（不限时为None，至少为SEARCH_DEADLINE_CONFIG中的最小值）"""
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        return max(SEARCH_DEADLINE_CONFIG["min_statement_ms"], int(remaining * 1000))
+
+    def expired(self):
+        """是否已到期或已取消"""
+        if self._stopped.is_set():
+            return True
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            self.reason = self.reason or "timeout"
+            return True
+        return False
+
+    def status(self):
+        """停止后各表的检索路径：cancelled（被取消）或timeout（超时）"""
+        return "cancelled" if self.reason == "cancelled" else "timeout"
+
+    def check(self):
+        """已到期或已取消时抛出SearchCancelledError"""
+        if self.expired():
+            raise SearchCancelledError("检索已取消" if self.reason == "cancelled" else "检索超过截止时间")
+
+    @contextmanager
+    def track(self, adapter, conn):
+        """登记conn上正在执行的语句（取消时由adapter.cancel_query终止）"""
+        query = _RunningQuery(adapter, conn)
+        with self._lock:
+            self._running.add(query)
+        try:
+            yield
+        finally:
+            with query.lock:
+                query.active = False
+            with self._lock:
+                self._running.discard(query)
+
+    def cancel(self, reason="cancelled"):
+        """停止本次检索：不再开始新的语句，并终止所有在途语句（可从任意线程调用，重复调用无影响）"""
+        with self._lock:
+            if self._stopped.is_set():
+                return
+            self.reason = self.reason or reason
+            self._stopped.set()
+            running = list(self._running)
+        if self._timer is not None:
+            self._timer.cancel()
+        for query in running:
+            with query.lock:
+                if not query.active:
+                    continue
+                try:
+                    query.adapter.cancel_query(query.conn)
+                except Exception as e:
+                    print(f"终止数据库{query.adapter.db_id}上的查询失败：{str(e)}")
+
+    def close(self):
+        """检索正常结束：停止到期计时器（不终止任何语句）"""
+        if self._timer is not None:
+            self._timer.cancel()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - HTTP检索接口模块
+供其他内部工具直接调用联合检索（基于tornado，无需额外服务）
+包版本：v1.0.0
+"""
+__version__ = "1.0.0"
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - HTTP检索接口（异步，基于tornado，与Streamlit界面并行运行）
+接口：
+    GET /api/health                              服务状态（并发、各库连接池与熔断状态、结果缓存）
+    GET /api/catalog                             数据库/表/列目录（不含凭据）
+    GET /api/search?q=关键词&page=1&page_size=20  分页检索（窄命中，rows=1时附带本页整行）
+    GET /api/search/stream?q=关键词               流式检索，按NDJSON逐批返回命中整行，最后一行为{"_summary": ...}
+通用参数timeout：本请求的截止时间（秒），到期时分页接口返回已取回的部分结果（complete为false，
+stats中未完成的表检索路径为timeout），仍未返回时504；流式接口在汇总行中标记。
+并发：同时执行的检索请求数有上限，超出的请求排队，排队超时返回503；
+取消：客户端断开或超过截止时间时，终止各库在途语句（KILL QUERY/取消请求），服务端游标随之关闭
+"""
+import asyncio
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from tornado import gen, web
+from tornado.iostream import StreamClosedError
+from tornado.ioloop import IOLoop
+from tornado.locks import Semaphore
+
+from cae_multi_db.adapters.circuit_breaker import get_circuit_breaker
+from cae_multi_db.adapters.conn_pool import get_pool_stats
+from cae_multi_db.config.db_config import API_CONFIG, SEARCH_CONCURRENCY_CONFIG
+from cae_multi_db.config.user_config import get_verified_dbs
+from cae_multi_db.core.schema_catalog import make_catalog_key
+
+
+def _json_default(value):
+    """JSON序列化数据库取值：日期时间按ISO格式，Decimal转数值，其余按文本"""
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, default=_json_default)
+
+
+def _frame_records(df):
+    """DataFrame转为可JSON序列化的记录列表（空值为null，日期为ISO格式）"""
+    return json.loads(df.to_json(orient="records", date_format="iso", force_ascii=False, default_handler=str))
+
+
+class SearchApi:
+    """接口共享状态：检索服务、接口使用的会话句柄、检索线程池和并发名额"""
+
+    def __init__(self, service, session, config=None):
+        self.service = service
+        self.session = session
+        self.config = {**API_CONFIG, **(config or {})}
+        self.executor = ThreadPoolExecutor(max_workers=self.config["worker_threads"], thread_name_prefix="cae_api")
+        self.slots = Semaphore(self.config["max_concurrent_requests"])
+        self.started_at = time.time()
+        self.active_requests = 0
+        self.rejected_requests = 0
+        self.timed_out_requests = 0
+        self.cancelled_requests = 0
+
+    def create_engine(self, timeout=None):
+        """每个请求一个检索引擎（引擎记录本次检索的统计和结果，列目录/连接池/缓存共享；timeout为检索截止时间）"""
+        return self.service.create_engine(self.session, timeout=timeout)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class BaseApiHandler(web.RequestHandler):
+    """接口处理基类：JSON响应、参数解析、截止时间、客户端断开检测"""
+
+    def initialize(self, api):
+        self.api = api
+        self.cancel_event = threading.Event()  # 客户端断开或超时后置位，检索在下一批前停止
+        self.deadline = None
+        self.engine = None  # 本请求的检索引擎（取消时终止其在途语句）
+
+    def prepare(self):
+        timeout = self.get_float_argument("timeout", self.api.config["default_timeout"])
+        timeout = min(max(timeout, 0.1), self.api.config["max_timeout"])
+        self.deadline = time.monotonic() + timeout
+
+    def on_connection_close(self):
+        self.cancel_event.set()
+        self.cancel_search()
+
+    def cancel_search(self):
+        """终止本请求仍在执行的检索语句"""
+        if self.engine is not None:
+            self.engine.cancel()
+
+    def remaining(self):
+        """距截止时间的剩余秒数"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set() or time.monotonic() >= self.deadline
+
+    def get_float_argument(self, name, default):
+        value = self.get_argument(name, None)
+        if value is None or value == "":
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            raise web.HTTPError(400, f"参数{name}必须是数字")
+
+    def get_int_argument(self, name, default, min_value=1, max_value=None):
+        value = self.get_float_argument(name, default)
+        value = max(min_value, int(value))
+        return min(value, max_value) if max_value else value
+
+    def get_keyword(self):
+        keyword = self.get_argument("q", "").strip()
+        if not keyword:
+            raise web.HTTPError(400, "缺少检索关键词参数q")
+        return keyword
+
+    def write_json(self, obj, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(_dumps(obj))
+
+    def write_error(self, status_code, **kwargs):
+        """错误响应为JSON：{"error": 错误信息, "status": 状态码}（HTTP状态行只能是ASCII，中文信息放在响应体中）"""
+        error = kwargs.get("exc_info", (None, None))[1]
+        message = error.log_message if isinstance(error, web.HTTPError) and error.log_message else self._reason
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(_dumps({"error": message, "status": status_code}))
+
+    async def acquire_slot(self):
+        """占用一个检索名额（超出并发上限时排队，排队时间计入截止时间），排队超时返回503"""
+        wait = min(self.api.config["queue_timeout"], self.remaining())
+        try:
+            await self.api.slots.acquire(timeout=timedelta(seconds=wait))
+        except gen.TimeoutError:
+            self.api.rejected_requests += 1
+            self.set_header("Retry-After", "1")
+            raise web.HTTPError(503, "检索请求过多，请稍后重试")
+        self.api.active_requests += 1
+
+    def release_slot(self, _=None):
+        self.api.active_requests -= 1
+        self.api.slots.release()
+
+    def run_in_worker(self, func, *args):
+        """在检索线程池中执行阻塞调用，返回asyncio Future"""
+        return IOLoop.current().run_in_executor(self.api.executor, func, *args)
+
+
+class HealthHandler(BaseApiHandler):
+    """服务状态"""
+
+    def get(self):
+        databases = []
+        verified = set(get_verified_dbs(self.api.session))
+        with self.api.session.lock:
+            dbs = [(db["db_id"], db["db_alias"], db["db_type"]) for db in self.api.session["dynamic_dbs"]]
+        for db_id, db_alias, db_type in dbs:
+            databases.append({"db_id": db_id, "db_alias": db_alias, "db_type": db_type,
+                              "verified": db_id in verified, "pool": get_pool_stats(db_id),
+                              "breaker": get_circuit_breaker(db_id).get_status()})
+        self.write_json({
+            "status": "ok" if verified else "no_database",
+            "uptime": round(time.time() - self.api.started_at, 1),
+            "requests": {
+                "active": self.api.active_requests,
+                "max_concurrent": self.api.config["max_concurrent_requests"],
+                "rejected": self.api.rejected_requests,
+                "timed_out": self.api.timed_out_requests,
+                "cancelled": self.api.cancelled_requests
+            },
+            "databases": databases,
+            "result_cache": self.api.service.result_cache.get_stats()
+        })
+
+
+class CatalogHandler(BaseApiHandler):
+    """数据库/表/列目录：优先取列目录缓存（含列类型、主键），未加载时取表元信息中的列名"""
+
+    def get(self):
+        verified = set(get_verified_dbs(self.api.session))
+        databases = []
+        for db in self.api.session.list_dbs():
+            cached_tables = self.api.service.catalog.get_tables(make_catalog_key(db["db_id"], db)) or {}
+            tables = []
+            for table, meta in db.get("table_meta", {}).items():
+                schema = cached_tables.get(table, {})
+                tables.append({
+                    "table": table,
+                    "enable_search": meta.get("enable_search", True),
+                    "columns": schema.get("columns") or meta.get("columns", []),
+                    "types": schema.get("types", {}),
+                    "primary_key": schema.get("primary_key", []),
+                    "non_searchable_columns": meta.get("non_searchable_columns", [])
+                })
+            databases.append({"db_id": db["db_id"], "db_alias": db["db_alias"], "db_type": db["db_type"],
+                              "database": db["database"], "verified": db["db_id"] in verified, "tables": tables})
+        self.write_json({"databases": databases})
+
+
+class SearchHandler(BaseApiHandler):
+    """分页检索：完整检索（结果缓存生效）后返回指定页的窄命中；截止时间到期时返回部分结果"""
+
+    def _search(self, engine, keyword, page, page_size, with_rows):
+        """工作线程：流式检索全部库（每批之间检查客户端断开，截止时间由引擎控制），完成后取出指定页"""
+        stream = engine.stream_all_enabled_dbs(keyword)
+        try:
+            for _ in stream:
+                if self.cancel_event.is_set():
+                    return None
+        finally:
+            # 提前关闭时通知各库在下一批前停止读取
+            stream.close()
+        result = engine.last_search_result
+        hits = result.get_page(page, page_size)
+        payload = {
+            "keyword": keyword,
+            "complete": engine.is_complete(),
+            "total": len(result),
+            "db_count": int(result.db_count),
+            "page": page,
+            "page_size": page_size,
+            "pages": (len(result) + page_size - 1) // page_size,
+            "hits": [
+                {"db_id": hit["_db_id"], "db_alias": hit["_db_alias"], "table": hit["_table"],
+                 "pk": json.loads(hit["_pk"]) if isinstance(hit["_pk"], str) else None,
+                 "matched_column": hit["_matched_column"], "snippet": hit["_snippet"],
+                 "score": round(float(hit["_score"]), 3)}
+                for hit in hits.astype(object).where(hits.notna(), None).to_dict("records")
+            ],
+            "stats": engine.last_search_stats
+        }
+        if with_rows:
+            payload["rows"] = [{"db_id": db_id, "table": table, "records": _frame_records(df)}
+                               for (db_id, table), df in result.get_rows(hits).items()]
+        return payload
+
+    async def get(self):
+        keyword = self.get_keyword()
+        page = self.get_int_argument("page", 1)
+        page_size = self.get_int_argument("page_size", self.api.config["default_page_size"],
+                                          max_value=self.api.config["max_page_size"])
+        with_rows = self.get_argument("rows", "0") in ("1", "true", "yes")
+        await self.acquire_slot()
+        # 引擎按剩余时间设置截止时间，到期时终止在途语句并返回部分结果
+        self.engine = self.api.create_engine(timeout=self.remaining())
+        future = self.run_in_worker(self._search, self.engine, keyword, page, page_size, with_rows)
+        # 名额在检索线程真正结束时归还
+        future.add_done_callback(self.release_slot)
+        try:
+            payload = await gen.with_timeout(timedelta(seconds=self.remaining() + self.api.config["deadline_grace"]),
+                                             asyncio.shield(future))
+        except gen.TimeoutError:
+            self.cancel_event.set()
+            self.cancel_search()
+            self.api.timed_out_requests += 1
+            raise web.HTTPError(504, "检索超过截止时间，已取消")
+        if payload is None:
+            # 客户端已断开
+            self.api.cancelled_requests += 1
+            return
+        if not payload["complete"] and self.is_cancelled():
+            self.api.timed_out_requests += 1
+        self.write_json(payload)
+
+
+class StreamSearchHandler(BaseApiHandler):
+    """流式检索：逐库逐表用服务端游标读取命中行，每批编码为NDJSON后立即发送（写缓冲满时等待客户端读取）"""
+
+    def _iter_chunks(self, engine, keyword, batch_size, counter):
+        """工作线程中逐批执行：检索行→NDJSON文本（每行一个命中整行，附带来源库和表）"""
+        for db_alias, table, columns, rows in engine.iter_export_rows(keyword, batch_size):
+            lines = [_dumps({"_db_alias": db_alias, "_table": table, **dict(zip(columns, row))}) for row in rows]
+            counter["rows"] += len(lines)
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+    async def _close_chunks(self, chunks, pending):
+        """关闭生成器（关闭服务端游标并归还连接）后归还名额；正在读取的一批要先结束，同一生成器不能被两个线程同时执行"""
+        try:
+            if pending is not None:
+                await asyncio.wait([pending])
+            await self.run_in_worker(chunks.close)
+        except Exception as e:
+            print(f"关闭流式检索失败：{str(e)}")
+        finally:
+            self.release_slot()
+
+    async def get(self):
+        keyword = self.get_keyword()
+        batch_size = self.get_int_argument("batch_size", SEARCH_CONCURRENCY_CONFIG["stream_batch_size"],
+                                           max_value=50000)
+        await self.acquire_slot()
+        counter = {"rows": 0}
+        self.engine = self.api.create_engine()
+        chunks = self._iter_chunks(self.engine, keyword, batch_size, counter)
+        future, reason = None, "complete"
+        self.set_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        try:
+            while True:
+                if self.cancel_event.is_set():
+                    reason = "cancelled"
+                    break
+                # 生成器每次在线程池中前进一批；同一时刻只有一个线程执行它
+                future = self.run_in_worker(next, chunks, None)
+                try:
+                    chunk = await gen.with_timeout(timedelta(seconds=self.remaining()), asyncio.shield(future))
+                except gen.TimeoutError:
+                    reason = "timeout"
+                    break
+                if chunk is None:
+                    break
+                self.write(chunk)
+                await self.flush()
+        except StreamClosedError:
+            reason = "cancelled"
+        finally:
+            if reason != "complete":
+                # 终止正在读取的一批所在的语句，_close_chunks无需等它自然结束
+                self.cancel_search()
+            IOLoop.current().spawn_callback(self._close_chunks, chunks, future)
+        if reason == "timeout":
+            self.api.timed_out_requests += 1
+        elif reason == "cancelled":
+            self.api.cancelled_requests += 1
+            return
+        try:
+            self.finish(_dumps({"_summary": {"keyword": keyword, "rows": counter["rows"],
+                                             "complete": reason == "complete", "reason": reason}}) + "\n")
+        except StreamClosedError:
+            pass
+
+
+def make_app(service, session, config=None):
+    """
+    创建接口应用
+    :param service: SearchService（与界面相同的进程级检索服务）
+    :param session: 接口使用的会话句柄（凭据已验证）
+    :return: (tornado.web.Application, SearchApi)
+    """
+    api = SearchApi(service, session, config)
+    app = web.Application([
+        (r"/api/health", HealthHandler, {"api": api}),
+        (r"/api/catalog", CatalogHandler, {"api": api}),
+        (r"/api/search", SearchHandler, {"api": api}),
+        (r"/api/search/stream", StreamSearchHandler, {"api": api}),
+    ])
+    return (app, api)
@@ -3,6 +3,8 @@
 CAE多数据库检索工具 - 数据库配置模板+动态管理基础
 支持MySQL/PostgreSQL/Qdrant（计划支持），适配任意表名/列名
 """
+import os
+import tempfile
 
 # 数据库类型配置模板（定义支持的数据库类型及默认值）
 DB_TYPE_TEMPLATES = {
@@ -48,4 +50,129 @@ DEFAULT_DBS = [
         "db_id": "pg_default",
         **DB_TYPE_TEMPLATES["postgresql"]
     }
-]
\ No newline at end of file
+]
+
+# 检索并发配置（跨库并发+库内并行扫描的线程池参数）
+SEARCH_CONCURRENCY_CONFIG = {
+    "concurrent": True,     # 是否启用跨库并发检索（False则退回逐库串行）
+    "max_db_workers": 8,    # 跨库检索线程池最大线程数（同时检索的数据库数上限）
+    "max_table_workers_per_db": 4,  # 单库内并行扫描表的连接数上限（避免压垮单个数据库）
+    "global_query_budget": 16,      # 全局同时执行的表检索查询数上限（跨库+库内并行共享）
+    "stream_batch_size": 1000       # 流式检索时服务端游标每批读取的行数
+}
+
+# 检索截止时间配置（每次检索的时间预算，转换为服务端语句超时，到期或被取消时终止在途查询）
+SEARCH_DEADLINE_CONFIG = {
+    "default_timeout": 120,     # 界面每次检索的时间预算（秒），0表示不限时
+    "min_statement_ms": 100,    # 服务端语句超时的最小值（毫秒）
+    "poll_interval": 0.2        # 界面等待检索时刷新进度的间隔（秒），期间可响应取消/新检索
+}
+
+# 连接池配置（进程级共享，按db_id+凭据区分）
+CONNECTION_POOL_CONFIG = {
+    "min_size": 1,                # 空闲回收时每个连接池至少保留的连接数
+    "max_size": 8,                # 每个连接池最大连接数（需大于max_table_workers_per_db）
+    "idle_timeout": 300,          # 空闲连接回收时间（秒）
+    "leak_timeout": 120,          # 借出超过该时间未归还视为疑似泄漏（秒）
+    "acquire_timeout": 10,        # 连接池已满时等待空闲连接的最长时间（秒）
+    "pre_ping_idle_seconds": 1,   # 空闲超过该时间的连接取用前先探活（秒）
+    "reaper_interval": 30         # 后台回收线程巡检间隔（秒）
+}
+
+# 熔断配置（某库连接失败后检索直接跳过该库，后台按退避间隔探测恢复）
+CIRCUIT_BREAKER_CONFIG = {
+    "enabled": True,
+    "failure_threshold": 1,       # 连续连接失败达到该次数即熔断（连接失败本身要等待connect_timeout，不宜多次重试）
+    "base_backoff": 5,            # 首次探测间隔（秒），每次探测失败加倍
+    "max_backoff": 300,           # 探测间隔上限（秒）
+    "probe_connect_timeout": 2,   # 探测连接超时（秒）
+    "probe_interval": 1           # 后台探测线程巡检间隔（秒）
+}
+
+# 列目录缓存配置（检索只使用缓存的列信息，后台按指纹校验表结构是否变化）
+SCHEMA_CATALOG_CONFIG = {
+    "refresh_interval": 60,   # 距上次校验超过该时间（秒）时，检索会触发一次后台指纹校验
+    "refresh_workers": 2      # 后台刷新线程数
+}
+
+# 检索索引建议配置（为频繁全表扫描且无可用索引的表生成建索引DDL）
+INDEX_ADVISOR_CONFIG = {
+    "min_searches": 3,            # 累计检索次数达到该值的表才给出建议
+    "min_avg_scan_seconds": 0.5,  # 平均全表扫描耗时达到该值（秒）的表才给出建议
+    "ddl_pause_seconds": 5        # 执行DDL时相邻语句间的暂停秒数（限流）
+}
+
+# 本地数据目录（影子索引等本地文件的存放位置）
+LOCAL_DATA_DIR = os.path.join(os.path.expanduser("~"), ".cae_multi_db")
+
+# 本地影子索引配置（把启用表爬取到本地倒排索引，检索时只按主键回源取命中行）
+SHADOW_INDEX_CONFIG = {
+    "enabled": False,                 # 检索默认是否使用影子索引（前端可按会话切换）
+    "db_path": os.path.join(LOCAL_DATA_DIR, "shadow_index.sqlite3"),
+    "crawl_batch_size": 2000,         # 爬取时每批读取/写入的行数
+    "max_candidates": 20000           # 单表候选行超过该值时该表退回数据库检索
+}
+
+# 本地持久化目录配置（数据库定义、表元信息、列目录、检索统计，重启后直接恢复，不保存密码）
+CATALOG_STORE_CONFIG = {
+    "enabled": True,
+    "db_path": os.path.join(LOCAL_DATA_DIR, "catalog.sqlite3")
+}
+
+# 增量同步配置（影子索引按更新时间列水位/分块校验和只同步变化的行）
+CHANGE_SYNC_CONFIG = {
+    "updated_at_columns": ["updated_at", "update_time", "modified_at", "modify_time",
+                           "gmt_modified", "last_modified", "last_update"],  # 识别为更新时间列的列名（不区分大小写）
+    "batch_size": 2000,         # 同步时每批读取/写入的行数
+    "checksum_buckets": 256,    # 分块校验和按主键哈希分成的块数
+    "auto_sync_interval": 300,  # 使用影子索引检索时，距上次同步超过该时间（秒）的表触发后台同步
+    "sync_workers": 1           # 后台同步线程数
+}
+
+# 检索结果缓存配置（进程级共享，按关键词+数据库+访问账号+启用表+表结构版本缓存单库结果）
+RESULT_CACHE_CONFIG = {
+    "enabled": True,
+    "max_memory_mb": 256,       # 内存预算，超出时按最近最少使用（LRU）淘汰
+    "default_ttl": 600,         # 缓存有效期（秒）
+    "db_ttl": {},               # 按db_id单独设置有效期（秒），如{"db_xxx": 60}；0表示该库不缓存
+    "persist": False,           # 是否同时写入本地磁盘（进程重启后仍可命中）
+    "disk_dir": os.path.join(LOCAL_DATA_DIR, "result_cache")
+}
+
+# 单语句批量检索配置（多张表合并为一条UNION ALL语句，只返回窄命中格式，展示时再按主键取整行）
+BATCH_SEARCH_CONFIG = {
+    "tables_per_statement": 50,   # 每条UNION ALL语句包含的表数上限
+    "max_hits_per_table": 5000,   # 每张表最多返回的命中数（每个分支的LIMIT）
+    "snippet_length": 120,        # 命中摘要的最大字符数
+    "keywords_per_statement": 20,  # 多关键词批量检索（命令行批处理）时每条语句合并的关键词数
+    "max_fetched_rows": 10000      # 展示时按主键回表取得的整行最多缓存的行数（超出时按表淘汰最早取回的，导出不缓存）
+}
+
+# 表结构浏览配置（按筛选条件分页，只渲染当前页的表，详情和预览数据按需读取）
+TABLE_BROWSER_CONFIG = {
+    "page_sizes": [10, 20, 50, 100],  # 每页表数可选项
+    "default_page_size": 20,
+    "column_summary_len": 120         # 表清单中列名摘要的最大字符数（完整列名在表详情中查看）
+}
+
+# 结果导出配置（导出文件按需生成并按结果缓存，分块写入临时文件，Excel使用只写模式）
+EXPORT_CONFIG = {
+    "export_dir": os.path.join(tempfile.gettempdir(), "cae_multi_db_exports"),  # 导出文件的临时目录
+    "chunk_size": 5000,           # 分块写出时每块的行数
+    "max_cached_results": 5,      # 最多保留多少次检索结果的导出文件（更早的文件被删除）
+    "columnar_compression": "zstd"  # Parquet/Arrow IPC导出的压缩算法（zstd/lz4/snappy等，Arrow IPC只支持zstd/lz4）
+}
+
+# HTTP检索接口配置（供其他内部工具直接调用联合检索）
+API_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8600,
+    "max_concurrent_requests": 8,   # 同时执行的检索请求数上限（超出的请求排队）
+    "queue_timeout": 5,             # 排队等待的最长时间（秒），超时返回503
+    "default_timeout": 30,          # 单个请求的默认截止时间（秒），请求可用timeout参数缩短或延长
+    "max_timeout": 300,             # 请求可指定的最长截止时间（秒）
+    "deadline_grace": 2,            # 截止时间到期后等待检索返回部分结果的时间（秒），仍未返回时504
+    "default_page_size": 20,
+    "max_page_size": 500,
+    "worker_threads": 16            # 执行检索的线程数（需不小于max_concurrent_requests）
+}
@@ -1,8 +1,24 @@
 # -*- coding: utf-8 -*-
 """
 CAE多数据库检索工具 - 用户动态配置（支持元信息缓存+检索启用状态）
+st_session可以是普通字典（命令行）或检索服务的会话句柄（界面，数据库配置进程内共享）；
+带lock属性时读写都在锁内进行，多个会话同时修改共享配置是线程安全的
 """
 import copy
+import os
+from contextlib import nullcontext
+
+
+def _config_lock(st_session):
+    """共享配置的锁（普通字典没有锁，返回空上下文）"""
+    lock = getattr(st_session, "lock", None)
+    return lock if lock is not None else nullcontext()
+
+def _persist_config(st_session, db_id=None):
+    """把共享配置的变化写入本地持久化目录（普通字典和不持久化的配置没有persist，直接跳过）"""
+    persist = getattr(st_session, "persist", None)
+    if persist is not None:
+        persist(db_id)
 
 def init_dynamic_dbs():
     """初始化动态数据库列表（新增启用检索/元信息缓存字段）"""
@@ -10,14 +26,14 @@ def init_dynamic_dbs():
     default_dbs = copy.deepcopy(DEFAULT_DBS)
     for db in default_dbs:
         db["enable_search"] = True  # 默认启用检索
-        db["table_meta"] = {}       # 表元信息缓存：{table_name: {"columns": [], "preview_data": [], "enable_search": True}}
+        db["table_meta"] = {}       # 表元信息缓存：{table_name: {"columns": [], "enable_search": True}}
     return default_dbs
 
-def init_user_auth():
-    """初始化用户权限配置"""
+def init_user_auth(dynamic_dbs=None):
+    """初始化用户权限配置（dynamic_dbs为None时按默认数据库初始化）"""
     auth_dict = {}
     from cae_multi_db.config.db_config import DEFAULT_DBS
-    for db in DEFAULT_DBS:
+    for db in (DEFAULT_DBS if dynamic_dbs is None else dynamic_dbs):
         auth_dict[db["db_id"]] = {
             "user": "",
             "password": "",
@@ -29,11 +45,19 @@ def init_user_auth():
 def add_db_to_list(st_session, db_info):
     """新增数据库到动态列表（初始化新增字段）"""
     import time
-    db_id = f"{db_info['db_type']}_{int(time.time())}"
-    db_info["db_id"] = db_id
-    db_info["enable_search"] = True  # 默认启用检索
-    db_info["table_meta"] = {}       # 初始化表元信息
-    st_session["dynamic_dbs"].append(db_info)
+    with _config_lock(st_session):
+        db_id = f"{db_info['db_type']}_{int(time.time())}"
+        # 共享配置下多个会话可能在同一秒新增同类数据库
+        existing = {db["db_id"] for db in st_session["dynamic_dbs"]}
+        suffix = 1
+        while db_id in existing:
+            suffix += 1
+            db_id = f"{db_info['db_type']}_{int(time.time())}_{suffix}"
+        db_info["db_id"] = db_id
+        db_info["enable_search"] = True  # 默认启用检索
+        db_info["table_meta"] = {}       # 初始化表元信息
+        st_session["dynamic_dbs"].append(db_info)
+    _persist_config(st_session, db_id)
     # 初始化权限配置
     st_session["user_auth"][db_id] = {
         "user": "",
@@ -45,12 +69,16 @@ def add_db_to_list(st_session, db_info):
 
 def delete_db_from_list(st_session, db_id):
     """从动态列表删除数据库"""
-    st_session["dynamic_dbs"] = [db for db in st_session["dynamic_dbs"] if db["db_id"] != db_id]
+    with _config_lock(st_session):
+        st_session["dynamic_dbs"] = [db for db in st_session["dynamic_dbs"] if db["db_id"] != db_id]
+    _persist_config(st_session, db_id)
     if db_id in st_session["user_auth"]:
         del st_session["user_auth"][db_id]
 
 def update_user_db_auth(st_session, db_id, user, password, port, is_verified):
-    """更新指定数据库的权限配置"""
+    """更新指定数据库的权限配置（其他会话新增的数据库在本会话首次验证时补建权限配置）"""
+    if db_id not in st_session["user_auth"] and get_db_info_by_id(st_session, db_id):
+        st_session["user_auth"][db_id] = {"user": "", "password": "", "port": port, "is_verified": False}
     if db_id in st_session["user_auth"]:
         st_session["user_auth"][db_id].update({
             "user": user,
@@ -61,40 +89,82 @@ def update_user_db_auth(st_session, db_id, user, password, port, is_verified):
 
 def update_db_enable_search(st_session, db_id, enable):
     """更新数据库的检索启用状态"""
-    for idx, db in enumerate(st_session["dynamic_dbs"]):
-        if db["db_id"] == db_id:
-            st_session["dynamic_dbs"][idx]["enable_search"] = enable
-            break
+    with _config_lock(st_session):
+        for idx, db in enumerate(st_session["dynamic_dbs"]):
+            if db["db_id"] == db_id:
+                st_session["dynamic_dbs"][idx]["enable_search"] = enable
+                break
+    _persist_config(st_session, db_id)
 
 def update_table_enable_search(st_session, db_id, table_name, enable):
     """更新表的检索启用状态"""
-    for idx, db in enumerate(st_session["dynamic_dbs"]):
-        if db["db_id"] == db_id:
-            if table_name in db["table_meta"]:
-                db["table_meta"][table_name]["enable_search"] = enable
-            break
+    with _config_lock(st_session):
+        for idx, db in enumerate(st_session["dynamic_dbs"]):
+            if db["db_id"] == db_id:
+                if table_name in db["table_meta"]:
+                    db["table_meta"][table_name]["enable_search"] = enable
+                break
+    _persist_config(st_session, db_id)
+
+def update_tables_enable_search(st_session, db_id, table_names, enable):
+    """批量更新多张表的检索启用状态（只写入一次本地持久化目录）"""
+    with _config_lock(st_session):
+        for db in st_session["dynamic_dbs"]:
+            if db["db_id"] == db_id:
+                for table_name in table_names:
+                    if table_name in db["table_meta"]:
+                        db["table_meta"][table_name]["enable_search"] = enable
+                break
+    _persist_config(st_session, db_id)
+
+def update_table_search_index(st_session, db_id, table_name, proposal):
+    """记录表上已创建的检索索引方案（proposal为None表示已回滚）"""
+    with _config_lock(st_session):
+        for idx, db in enumerate(st_session["dynamic_dbs"]):
+            if db["db_id"] == db_id:
+                if table_name in db["table_meta"]:
+                    if proposal:
+                        db["table_meta"][table_name]["search_index_ddl"] = proposal
+                    else:
+                        db["table_meta"][table_name].pop("search_index_ddl", None)
+                break
+    _persist_config(st_session, db_id)
+
+def update_table_non_searchable_columns(st_session, db_id, table_name, columns):
+    """更新表中不参与检索的列"""
+    with _config_lock(st_session):
+        for idx, db in enumerate(st_session["dynamic_dbs"]):
+            if db["db_id"] == db_id:
+                if table_name in db["table_meta"]:
+                    db["table_meta"][table_name]["non_searchable_columns"] = list(columns)
+                break
+    _persist_config(st_session, db_id)
 
 def save_table_meta(st_session, db_id, table_meta):
     """保存数据库的表元信息"""
-    for idx, db in enumerate(st_session["dynamic_dbs"]):
-        if db["db_id"] == db_id:
-            db["table_meta"] = table_meta
-            break
+    with _config_lock(st_session):
+        for idx, db in enumerate(st_session["dynamic_dbs"]):
+            if db["db_id"] == db_id:
+                db["table_meta"] = table_meta
+                break
+    _persist_config(st_session, db_id)
 
 def get_verified_dbs(st_session):
     """获取所有验证通过且启用检索的数据库ID"""
     verified = []
-    for db in st_session["dynamic_dbs"]:
-        db_id = db["db_id"]
-        if db["enable_search"] and st_session["user_auth"].get(db_id, {}).get("is_verified", False):
-            verified.append(db_id)
+    with _config_lock(st_session):
+        for db in st_session["dynamic_dbs"]:
+            db_id = db["db_id"]
+            if db["enable_search"] and st_session["user_auth"].get(db_id, {}).get("is_verified", False):
+                verified.append(db_id)
     return verified
 
 def get_db_info_by_id(st_session, db_id):
     """根据ID获取数据库基础信息（深拷贝，避免子线程修改）"""
-    for db in st_session["dynamic_dbs"]:
-        if db["db_id"] == db_id:
-            return copy.deepcopy(db)
+    with _config_lock(st_session):
+        for db in st_session["dynamic_dbs"]:
+            if db["db_id"] == db_id:
+                return copy.deepcopy(db)
     return None
 
 def get_db_auth_by_id(st_session, db_id):
@@ -112,4 +182,38 @@ def get_enabled_tables(st_session, db_id):
         for table_name, meta in db_info["table_meta"].items():
             if meta.get("enable_search", True):
                 enabled_tables.append(table_name)
-    return enabled_tables
\ No newline at end of file
+    return enabled_tables
+
+
+def build_session_from_config(config):
+    """
+    由数据库配置文件（JSON，命令行批量检索和HTTP检索接口使用）构建与界面会话结构一致的字典（dynamic_dbs + user_auth）
+    配置项：databases列表，每项含db_type/db_alias/host/port/database/user，密码为password或password_env（环境变量名），
+    可选tables（不写时检索库中所有表）和non_searchable_columns（{表名: [列名]}）
+    :return: (session, {db_id: (用户名, 密码, 端口)})
+    """
+    session = {"dynamic_dbs": [], "user_auth": {}}
+    credentials = {}
+    for idx, db in enumerate(config.get("databases", [])):
+        db_id = db.get("db_id") or f"{db['db_type']}_{idx + 1}"
+        password = os.environ.get(db["password_env"], "") if db.get("password_env") else db.get("password", "")
+        port = int(db.get("port", 3306 if db["db_type"] == "mysql" else 5432))
+        skip_columns = db.get("non_searchable_columns", {})
+        session["dynamic_dbs"].append({
+            "db_id": db_id,
+            "db_type": db["db_type"],
+            "db_alias": db.get("db_alias", db_id),
+            "host": db.get("host", "localhost"),
+            "port": port,
+            "database": db["database"],
+            "description": db.get("description", ""),
+            "enable_search": True,
+            "table_meta": {
+                table: {"columns": [], "enable_search": True,
+                        **({"non_searchable_columns": skip_columns[table]} if table in skip_columns else {})}
+                for table in db.get("tables", [])
+            }
+        })
+        session["user_auth"][db_id] = {"user": "", "password": "", "port": port, "is_verified": False}
+        credentials[db_id] = (db.get("user", ""), password, port)
+    return (session, credentials)
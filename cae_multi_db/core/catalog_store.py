@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 本地持久化目录（SQLite，进程级共享）
+保存数据库定义、表元信息（列、检索启用、索引、同步水位等）、列目录（含表结构指纹）和检索统计，
+重启后直接从本地恢复，无需逐库重新连接、加载元信息即可检索（凭据不保存，仍需各会话验证）。
+写入是增量的：只写发生变化的库/表记录；列目录按库在首次使用时才读取，
+恢复的列目录标记为待校验，检索时后台按表结构指纹校验，指纹变化时重新加载
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from cae_multi_db.config.db_config import CATALOG_STORE_CONFIG
+
+# 不持久化的表元信息字段（预览数据是样本行，体积大且会过期；现已保存在各会话中，旧配置中可能仍有该字段）
+_TRANSIENT_META_FIELDS = ("preview_data",)
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _encode_key(key):
+    """列目录键（元组）编码为文本"""
+    return _dumps(list(key))
+
+
+class CatalogStore:
+    """本地持久化目录（读操作可并发，写操作串行）"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or CATALOG_STORE_CONFIG["db_path"]
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._write_lock = threading.Lock()
+        # 已写入的记录（用于增量写入）：{db_id: (定义JSON, {表名: 元信息JSON})}
+        self._written = {}
+        self._init_schema()
+
+    def _connect(self):
+        """每次操作使用独立的SQLite连接（sqlite3连接不能跨线程共享）"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self):
+        """建表（WAL模式下读写互不阻塞，界面与接口服务可同时使用）"""
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS dbs (
+                    db_id TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    definition TEXT NOT NULL,
+                    updated_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS table_meta (
+                    db_id TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    meta TEXT NOT NULL,
+                    PRIMARY KEY (db_id, table_name)
+                );
+                CREATE TABLE IF NOT EXISTS schema_catalog (
+                    catalog_key TEXT PRIMARY KEY,
+                    db_id TEXT NOT NULL,
+                    fingerprint TEXT,
+                    tables TEXT NOT NULL,
+                    checked_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS search_stats (
+                    db_id TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    stats TEXT NOT NULL,
+                    PRIMARY KEY (db_id, table_name)
+                );
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ====================== 数据库定义与表元信息 ======================
+    @staticmethod
+    def _split_db(db):
+        """拆分为(定义JSON, {表名: 元信息JSON})，不含不持久化的字段"""
+        definition = {key: value for key, value in db.items() if key != "table_meta"}
+        tables = {
+            table: _dumps({key: value for key, value in meta.items() if key not in _TRANSIENT_META_FIELDS})
+            for table, meta in db.get("table_meta", {}).items()
+        }
+        return (_dumps(definition), tables)
+
+    def load_dbs(self):
+        """
+        读取保存的数据库列表（按保存时的顺序）
+        :return: list - 与dynamic_dbs结构一致；未保存过时返回None
+        """
+        conn = self._connect()
+        try:
+            db_rows = conn.execute("SELECT db_id, definition FROM dbs ORDER BY position").fetchall()
+            if not db_rows:
+                return None
+            table_rows = conn.execute(
+                "SELECT db_id, table_name, meta FROM table_meta ORDER BY db_id, position"
+            ).fetchall()
+        finally:
+            conn.close()
+        tables_by_db = {}
+        for db_id, table_name, meta_json in table_rows:
+            tables_by_db.setdefault(db_id, {})[table_name] = meta_json
+        dbs = []
+        with self._write_lock:
+            for db_id, definition_json in db_rows:
+                db = json.loads(definition_json)
+                table_jsons = tables_by_db.get(db_id, {})
+                db["table_meta"] = {table: json.loads(meta_json) for table, meta_json in table_jsons.items()}
+                dbs.append(db)
+                self._written[db_id] = (definition_json, dict(table_jsons))
+        return dbs
+
+    def save_dbs(self, dynamic_dbs, db_id=None):
+        """
+        增量保存数据库列表：只写入定义或元信息有变化的库和表，删除已不存在的库
+        :param dynamic_dbs: 当前完整的数据库列表（调用方需持有配置锁或传入快照）
+        :param db_id: 只比较该库（其余库只检查顺序和删除），None时比较全部
+        """
+        current_ids = [db["db_id"] for db in dynamic_dbs]
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                for db_id_removed in [d for d in self._written if d not in current_ids]:
+                    cursor.execute("DELETE FROM dbs WHERE db_id = ?", (db_id_removed,))
+                    cursor.execute("DELETE FROM table_meta WHERE db_id = ?", (db_id_removed,))
+                    del self._written[db_id_removed]
+                for position, db in enumerate(dynamic_dbs):
+                    if db_id is not None and db["db_id"] != db_id and db["db_id"] in self._written:
+                        cursor.execute("UPDATE dbs SET position = ? WHERE db_id = ?", (position, db["db_id"]))
+                        continue
+                    self._save_db(cursor, position, db)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _save_db(self, cursor, position, db):
+        """写入单个库发生变化的部分（调用方持有_write_lock）"""
+        definition_json, table_jsons = self._split_db(db)
+        old_definition, old_tables = self._written.get(db["db_id"], (None, {}))
+        if definition_json != old_definition:
+            cursor.execute("INSERT OR REPLACE INTO dbs (db_id, position, definition, updated_at) VALUES (?, ?, ?, ?)",
+                           (db["db_id"], position, definition_json, time.time()))
+        else:
+            cursor.execute("UPDATE dbs SET position = ? WHERE db_id = ?", (position, db["db_id"]))
+        removed = [table for table in old_tables if table not in table_jsons]
+        cursor.executemany("DELETE FROM table_meta WHERE db_id = ? AND table_name = ?",
+                           [(db["db_id"], table) for table in removed])
+        # 已写入记录的表顺序即保存时的顺序：新增或删除表后其后各表的位置都会变化，元信息未变的表只更新位置
+        old_positions = {table: position for position, table in enumerate(old_tables)}
+        changed, moved = [], []
+        for table_position, (table, meta_json) in enumerate(table_jsons.items()):
+            if old_tables.get(table) != meta_json:
+                changed.append((db["db_id"], table, table_position, meta_json))
+            elif old_positions[table] != table_position:
+                moved.append((table_position, db["db_id"], table))
+        cursor.executemany(
+            "INSERT OR REPLACE INTO table_meta (db_id, table_name, position, meta) VALUES (?, ?, ?, ?)", changed
+        )
+        cursor.executemany("UPDATE table_meta SET position = ? WHERE db_id = ? AND table_name = ?", moved)
+        self._written[db["db_id"]] = (definition_json, table_jsons)
+
+    # ====================== 列目录 ======================
+    def load_catalog(self, key):
+        """读取某库保存的列目录：(指纹, {table: {...}})，未保存返回None"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT fingerprint, tables FROM schema_catalog WHERE catalog_key = ?",
+                               (_encode_key(key),)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return (row[0], json.loads(row[1]))
+
+    def save_catalog(self, key, fingerprint, tables):
+        """保存某库的列目录（表结构指纹变化时调用）"""
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO schema_catalog (catalog_key, db_id, fingerprint, tables, checked_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (_encode_key(key), key[1], fingerprint, _dumps(tables), time.time())
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def delete_catalog(self, key=None):
+        """删除保存的列目录（key为None时删除全部）"""
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                if key is None:
+                    conn.execute("DELETE FROM schema_catalog")
+                else:
+                    conn.execute("DELETE FROM schema_catalog WHERE catalog_key = ?", (_encode_key(key),))
+                conn.commit()
+            finally:
+                conn.close()
+
+    # ====================== 检索统计 ======================
+    def load_stats(self):
+        """读取保存的检索统计：{(db_id, 表名): {...}}"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT db_id, table_name, stats FROM search_stats").fetchall()
+        finally:
+            conn.close()
+        return {(db_id, table_name): json.loads(stats) for db_id, table_name, stats in rows}
+
+    def save_stats(self, entries):
+        """保存发生变化的检索统计：{(db_id, 表名): {...}}"""
+        if not entries:
+            return
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO search_stats (db_id, table_name, stats) VALUES (?, ?, ?)",
+                    [(db_id, table_name, _dumps(entry)) for (db_id, table_name), entry in entries.items()]
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def delete_stats(self, db_id=None):
+        """删除保存的检索统计（db_id为None时删除全部）"""
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                if db_id is None:
+                    conn.execute("DELETE FROM search_stats")
+                else:
+                    conn.execute("DELETE FROM search_stats WHERE db_id = ?", (db_id,))
+                conn.commit()
+            finally:
+                conn.close()
+
+
+# 进程级单例（跨Streamlit重跑与会话共享）
+_CATALOG_STORE = None
+_CATALOG_STORE_LOCK = threading.Lock()
+
+
+def get_catalog_store():
+    """获取进程级本地持久化目录（CATALOG_STORE_CONFIG中未启用时返回None）"""
+    global _CATALOG_STORE
+    if not CATALOG_STORE_CONFIG["enabled"]:
+        return None
+    with _CATALOG_STORE_LOCK:
+        if _CATALOG_STORE is None:
+            _CATALOG_STORE = CatalogStore()
+        return _CATALOG_STORE
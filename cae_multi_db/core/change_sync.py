@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 增量变更捕获（保持影子索引新鲜，避免反复全量重爬）
+按表自动选择代价最低的变更检测方式：
+updated_at：按更新时间列水位读取变化的行
+checksum：按主键哈希分块，在数据库端聚合每块行哈希，只重读校验和变化的块
+（没有更新时间列的表不能只按自增主键水位同步：那样只能发现新增的行，已有行的修改会一直漏掉）
+删除的行统一通过"源表行数≠本地文档数"触发主键比对来清除
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cae_multi_db.adapters.base_adapter import GENERATED_SEARCH_COLUMNS
+from cae_multi_db.config.db_config import CHANGE_SYNC_CONFIG
+from cae_multi_db.core.result_cache import get_result_cache
+from cae_multi_db.core.shadow_index import get_shadow_index, encode_pk
+
+# 变更检测方式（用于前端展示）
+SYNC_STRATEGY_LABELS = {
+    "updated_at": "更新时间列水位",
+    "checksum": "分块校验和"
+}
+
+TIMESTAMP_TYPE_PREFIXES = ("timestamp", "datetime")
+
+
+def detect_sync_strategy(schema):
+    """
+    根据表结构选择变更检测方式
+    :param schema: 列目录中的表结构{"columns", "types", "primary_key"}
+    :return: (strategy, sync_column)
+    """
+    types = {col: str(col_type).lower() for col, col_type in schema.get("types", {}).items()}
+    candidates = {name.lower() for name in CHANGE_SYNC_CONFIG["updated_at_columns"]}
+    for col in schema.get("columns", []):
+        if col.lower() in candidates and types.get(col, "").startswith(TIMESTAMP_TYPE_PREFIXES):
+            return ("updated_at", col)
+    return ("checksum", None)
+
+
+def _search_columns(schema):
+    """影子索引中参与索引的列（排除检索辅助列）"""
+    return [col for col in schema.get("columns", []) if col not in GENERATED_SEARCH_COLUMNS]
+
+
+def capture_sync_baseline(adapter, table_name, schema):
+    """
+    在全量爬取前记录同步基线（供ShadowIndex.crawl_table的baseline_fn使用）
+    水位取爬取前的最大值，爬取期间变化的行会在下次同步时重复写入（按主键覆盖，结果幂等）
+    :return: sync_state字段字典
+    """
+    strategy, sync_column = detect_sync_strategy(schema)
+    baseline = {"strategy": strategy, "sync_column": sync_column, "synced_at": time.time()}
+    if strategy == "checksum":
+        baseline["checksums"] = adapter.get_chunk_checksums(
+            table_name, _search_columns(schema), schema["primary_key"], CHANGE_SYNC_CONFIG["checksum_buckets"]
+        )
+    else:
+        watermark = adapter.get_max_value(table_name, sync_column)
+        baseline["watermark"] = watermark
+        # 记录水位行的主键：首次同步按>=读到它们时不计为变化（否则爬取后第一次同步总会使缓存失效）
+        pk_columns = list(schema["primary_key"])
+        baseline["watermark_pks"] = [] if watermark is None else sorted(
+            encode_pk(row)
+            for rows in adapter.iter_table_rows(table_name, pk_columns, CHANGE_SYNC_CONFIG["batch_size"],
+                                                f"{adapter._quote_ident(sync_column)} = %s", (watermark,))
+            for row in rows
+        )
+    return baseline
+
+
+class ChangeSync:
+    """影子索引增量同步（同一个库同时只有一个同步任务）"""
+
+    def __init__(self, shadow_index=None, sync_workers=None):
+        self.shadow_index = shadow_index or get_shadow_index()
+        self._lock = threading.Lock()
+        self._syncing = set()
+        self._executor = ThreadPoolExecutor(
+            max_workers=sync_workers or CHANGE_SYNC_CONFIG["sync_workers"],
+            thread_name_prefix="cae_sync"
+        )
+
+    def sync_table(self, adapter, db_id, table_name, schema):
+        """
+        同步单表：只读取变化的行写入影子索引，并清除源表已删除的行
+        未建索引、缺少同步基线、列结构已变化或同步方式已变化（如旧版本的自增主键水位）时改为全量重爬
+        :return: (bool, msg)
+        """
+        index = self.shadow_index
+        state = index.get_table_states(db_id).get(table_name)
+        sync_state = index.get_sync_states(db_id).get(table_name)
+        columns = _search_columns(schema)
+        if (not state or state["status"] != "ready" or not sync_state
+                or sync_state["strategy"] != detect_sync_strategy(schema)[0]
+                or state["columns"] != columns or state["pk_columns"] != list(schema.get("primary_key") or [])):
+            is_ok, msg = index.crawl_table(adapter, db_id, table_name, schema, baseline_fn=capture_sync_baseline)
+            get_result_cache().invalidate(db_id)
+            return (is_ok, f"{msg}（全量重爬）")
+
+        pk_columns = state["pk_columns"]
+        batch_size = CHANGE_SYNC_CONFIG["batch_size"]
+        started_at = time.time()
+        try:
+            changed, new_state = self._apply_changes(adapter, db_id, table_name, columns, pk_columns,
+                                                     sync_state, batch_size)
+            deleted = self._apply_deletes(adapter, db_id, table_name, columns, pk_columns, batch_size)
+        except Exception as e:
+            index.set_sync_state(db_id, table_name, **{**self._state_fields(sync_state),
+                                                       "message": f"同步失败：{str(e)}"})
+            return (False, f"{table_name}同步失败：{str(e)}")
+        # synced_at取本次开始时间：开始之后的变更由下次同步补齐
+        index.set_sync_state(db_id, table_name, **new_state, synced_at=started_at,
+                             last_changes=changed + deleted, message="")
+        if changed or deleted:
+            # 同步到变更说明源表数据已变化，该库的缓存结果不再可信
+            get_result_cache().invalidate(db_id)
+        return (True, f"{table_name}同步完成：更新{changed}行，删除{deleted}行")
+
+    @staticmethod
+    def _state_fields(sync_state):
+        """get_sync_states的结果转换为set_sync_state的参数"""
+        return {key: sync_state[key] for key in ("strategy", "sync_column", "watermark", "watermark_pks",
+                                                 "checksums", "synced_at", "last_changes")}
+
+    def _apply_changes(self, adapter, db_id, table_name, columns, pk_columns, sync_state, batch_size):
+        """
+        按同步方式读取变化的行并写入索引
+        :return: (写入行数, 新的同步状态字段)
+        """
+        q = adapter._quote_ident
+        strategy, sync_column = sync_state["strategy"], sync_state["sync_column"]
+        new_state = {"strategy": strategy, "sync_column": sync_column}
+        changed = 0
+
+        if strategy == "updated_at":
+            watermark = sync_state["watermark"]
+            if watermark is None:
+                where_sql, params = "", ()
+            else:
+                # 用>=而不是>：同一时刻的多次更新不会因水位相等而漏掉（重复写入按主键覆盖）
+                where_sql, params = f"{q(sync_column)} >= %s", (watermark,)
+            position = columns.index(sync_column)
+            pk_positions = [columns.index(col) for col in pk_columns]
+            # 上次已写入的水位行（更新时间等于水位）每次都会被>=重新读到，跳过它们，只计真正变化的行；
+            # 水位以JSON文本保存，日期时间按str()比较
+            seen_pks = set(sync_state.get("watermark_pks") or [])
+            watermark_text = None if watermark is None else str(watermark)
+            max_value, max_pks = None, set()
+            for rows in adapter.iter_table_rows(table_name, columns, batch_size, where_sql, params):
+                fresh = []
+                for row in rows:
+                    value = row[position]
+                    pk_json = encode_pk(row[i] for i in pk_positions)
+                    if value is not None and str(value) == watermark_text and pk_json in seen_pks:
+                        continue
+                    fresh.append(row)
+                    if value is None:
+                        continue
+                    if max_value is None or value > max_value:
+                        max_value, max_pks = value, {pk_json}
+                    elif value == max_value:
+                        max_pks.add(pk_json)
+                if fresh:
+                    self.shadow_index.index_rows(db_id, table_name, columns, pk_columns, fresh)
+                    changed += len(fresh)
+            if max_value is None or str(max_value) == watermark_text:
+                # 水位未前进：已知的水位行加上本次新读到的同一时刻的行
+                new_state["watermark"] = watermark if max_value is None else max_value
+                new_state["watermark_pks"] = sorted(seen_pks | max_pks)
+            else:
+                new_state["watermark"] = max_value
+                new_state["watermark_pks"] = sorted(max_pks)
+            return (changed, new_state)
+
+        buckets = CHANGE_SYNC_CONFIG["checksum_buckets"]
+        old_checksums = sync_state["checksums"]
+        checksums = adapter.get_chunk_checksums(table_name, columns, pk_columns, buckets)
+        # 本地保存的块号经过JSON后是字符串
+        changed_buckets = [bucket for bucket, value in checksums.items() if old_checksums.get(str(bucket)) != value]
+        bucket_sql = adapter._bucket_sql(pk_columns, buckets)
+        for start in range(0, len(changed_buckets), 500):
+            chunk = changed_buckets[start:start + 500]
+            where_sql = f"{bucket_sql} IN ({', '.join(['%s'] * len(chunk))})"
+            for rows in adapter.iter_table_rows(table_name, columns, batch_size, where_sql, tuple(chunk)):
+                self.shadow_index.index_rows(db_id, table_name, columns, pk_columns, rows)
+                changed += len(rows)
+        new_state["checksums"] = checksums
+        return (changed, new_state)
+
+    def _apply_deletes(self, adapter, db_id, table_name, columns, pk_columns, batch_size):
+        """
+        源表行数与本地文档数不一致时，比对主键清除已删除的行
+        :return: 删除行数
+        """
+        row_count = adapter.get_row_count(table_name)
+        doc_count = self.shadow_index.get_table_states(db_id)[table_name]["doc_count"]
+        if row_count is None or row_count == doc_count:
+            return 0
+        source_pks = set()
+        for rows in adapter.iter_table_rows(table_name, pk_columns, batch_size):
+            source_pks.update(encode_pk(row) for row in rows)
+        deleted = self.shadow_index.get_table_pks(db_id, table_name) - source_pks
+        if deleted:
+            self.shadow_index.index_rows(db_id, table_name, columns, pk_columns, [],
+                                         deleted_pks=[tuple(json.loads(pk)) for pk in deleted])
+        return len(deleted)
+
+    def sync_tables(self, adapter, db_id, tables, catalog_tables):
+        """逐表同步，返回[(表名, bool, msg)]（结束时归还连接）"""
+        results = []
+        try:
+            for table_name in tables:
+                schema = (catalog_tables or {}).get(table_name)
+                if not schema:
+                    continue
+                is_ok, msg = self.sync_table(adapter, db_id, table_name, schema)
+                print(msg)
+                results.append((table_name, is_ok, msg))
+        finally:
+            adapter.close()
+        return results
+
+    def sync_tables_async(self, adapter_factory, db_id, tables, catalog_tables):
+        """
+        后台同步多张表（同一个库同时只有一个同步任务，正在全量爬取的库不同步）
+        :param adapter_factory: 无参函数，返回新的适配器实例（在后台线程中调用）
+        :return: bool - 是否已启动
+        """
+        with self._lock:
+            if db_id in self._syncing or self.shadow_index.is_crawling(db_id):
+                return False
+            self._syncing.add(db_id)
+
+        def task():
+            try:
+                adapter = adapter_factory()
+                if adapter:
+                    self.sync_tables(adapter, db_id, tables, catalog_tables)
+            except Exception as e:
+                print(f"数据库{db_id}增量同步异常：{str(e)}")
+            finally:
+                with self._lock:
+                    self._syncing.discard(db_id)
+
+        self._executor.submit(task)
+        return True
+
+    def is_syncing(self, db_id):
+        """该库是否正在后台同步"""
+        with self._lock:
+            return db_id in self._syncing
+
+    def get_sync_lag(self, db_id):
+        """各表同步延迟（秒）：{table: 距上次成功同步的秒数}"""
+        now = time.time()
+        return {
+            table: round(now - state["synced_at"], 1)
+            for table, state in self.shadow_index.get_sync_states(db_id).items() if state["synced_at"]
+        }
+
+    def get_stale_tables(self, db_id, tables, max_lag=None):
+        """已建索引且同步延迟超过max_lag的表"""
+        max_lag = CHANGE_SYNC_CONFIG["auto_sync_interval"] if max_lag is None else max_lag
+        lags = self.get_sync_lag(db_id)
+        return [table for table in tables if table in lags and lags[table] > max_lag]
+
+
+# 进程级单例（跨Streamlit重跑与会话共享）
+_CHANGE_SYNC = None
+_CHANGE_SYNC_LOCK = threading.Lock()
+
+
+def get_change_sync():
+    """获取进程级增量同步器"""
+    global _CHANGE_SYNC
+    with _CHANGE_SYNC_LOCK:
+        if _CHANGE_SYNC is None:
+            _CHANGE_SYNC = ChangeSync()
+        return _CHANGE_SYNC
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 检索索引建议与创建
+针对频繁全表扫描且没有可用检索索引的表，生成服务端检索结构的DDL：
+MySQL：STORED生成列拼接可检索列 + ngram解析器FULLTEXT索引
+PostgreSQL：表达式GIN pg_trgm索引，或STORED tsvector生成列 + GIN索引
+DDL需用户确认后执行（语句间限流），并可回滚
+"""
+import threading
+from cae_multi_db.adapters.base_adapter import SEARCH_TEXT_COLUMN, SEARCH_TSV_COLUMN, GENERATED_SEARCH_COLUMNS
+from cae_multi_db.adapters.mysql_adapter import MySQLAdapter
+from cae_multi_db.adapters.pg_adapter import PGAdapter
+from cae_multi_db.adapters.predicate_compiler import PGPredicateCompiler
+from cae_multi_db.config.db_config import INDEX_ADVISOR_CONFIG
+
+# 不适合拼接进检索文本的MySQL列类型
+MYSQL_UNSEARCHABLE_TYPES = {
+    "blob", "tinyblob", "mediumblob", "longblob", "binary", "varbinary", "bit", "json",
+    "geometry", "point", "linestring", "polygon", "multipoint", "multilinestring",
+    "multipolygon", "geometrycollection"
+}
+# PostgreSQL索引表达式必须是IMMUTABLE：文本类型列直接拼接，以下类型转换为text的结果不随会话设置变化，
+# 以::text拼接；其余需转换的列（interval、time、枚举等）不进索引，检索时逐列OR匹配
+PG_IMMUTABLE_CAST_TYPES = {"boolean", "uuid", "inet", "cidr", "macaddr", "bit", "bit varying"}
+
+# 同一数据库同一时间只执行一个DDL任务
+_DDL_LOCKS = {}
+_DDL_LOCKS_GUARD = threading.Lock()
+
+
+def _get_ddl_lock(db_id):
+    """获取数据库级DDL锁"""
+    with _DDL_LOCKS_GUARD:
+        return _DDL_LOCKS.setdefault(db_id, threading.Lock())
+
+
+def _pg_index_name(prefix, table_name):
+    """PostgreSQL索引名（模式内唯一，最长63字节）"""
+    return f"{prefix}_{table_name}"[:63]
+
+
+def build_search_index_proposal(db_type, table_name, schema, pg_kind="trgm"):
+    """
+    为单表生成检索索引方案
+    :param schema: 列目录中的表结构{"columns": [], "types": {}, "skip_columns": []}（不参与检索的列不拼接）
+    :param pg_kind: PostgreSQL方案："trgm"（表达式trigram索引）或"tsvector"（生成列+GIN）
+    :return: dict - {"table", "kind", "columns", "ddl": [], "rollback": [], "description"}，无可检索列时返回None
+    """
+    types = schema.get("types", {})
+    skip_columns = set(schema.get("skip_columns") or [])
+    columns = [col for col in schema.get("columns", [])
+               if col not in GENERATED_SEARCH_COLUMNS and col not in skip_columns]
+
+    if db_type == "mysql":
+        q = MySQLAdapter._quote_ident
+        search_cols = [col for col in columns if str(types.get(col, "")).lower() not in MYSQL_UNSEARCHABLE_TYPES]
+        if not search_cols:
+            return None
+        concat = ", ".join(f"IFNULL({q(col)}, '')" for col in search_cols)
+        index_name = "ft_cae_search"
+        return {
+            "table": table_name,
+            "kind": "fulltext",
+            "columns": search_cols,
+            "ddl": [
+                f"ALTER TABLE {q(table_name)} ADD COLUMN {q(SEARCH_TEXT_COLUMN)} LONGTEXT "
+                f"GENERATED ALWAYS AS (CONCAT_WS(' ', {concat})) STORED",
+                f"ALTER TABLE {q(table_name)} ADD FULLTEXT INDEX {q(index_name)} ({q(SEARCH_TEXT_COLUMN)}) WITH PARSER ngram"
+            ],
+            "rollback": [
+                f"ALTER TABLE {q(table_name)} DROP INDEX {q(index_name)}",
+                f"ALTER TABLE {q(table_name)} DROP COLUMN {q(SEARCH_TEXT_COLUMN)}"
+            ],
+            "description": "新增STORED生成列拼接可检索列，并建立ngram FULLTEXT索引（建列会重建表）"
+        }
+
+    if db_type == "postgresql":
+        q = PGAdapter._quote_ident
+        # 与PGAdapter._build_index_predicate的覆盖判断使用同一分类：文本类型列必须全部进入索引表达式
+        compiler = PGPredicateCompiler(q)
+        kinds = {col: compiler.classify(types.get(col)) for col in columns}
+        if "text" not in kinds.values():
+            return None
+        search_cols = [col for col in columns if kinds[col] == "text" or (
+            kinds[col] == "cast_text" and str(types.get(col, "")).lower() in PG_IMMUTABLE_CAST_TYPES)]
+        expression = " || ' ' || ".join(
+            f"COALESCE({q(col)}, '')" if kinds[col] == "text" else f"COALESCE({q(col)}::text, '')"
+            for col in search_cols)
+        if pg_kind == "tsvector":
+            index_name = _pg_index_name("idx_cae_tsv", table_name)
+            return {
+                "table": table_name,
+                "kind": "tsvector",
+                "columns": search_cols,
+                "ddl": [
+                    f"ALTER TABLE {q(table_name)} ADD COLUMN IF NOT EXISTS {q(SEARCH_TSV_COLUMN)} tsvector "
+                    f"GENERATED ALWAYS AS (to_tsvector('simple', {expression})) STORED",
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {q(index_name)} ON {q(table_name)} "
+                    f"USING gin ({q(SEARCH_TSV_COLUMN)})"
+                ],
+                "rollback": [
+                    f"DROP INDEX CONCURRENTLY IF EXISTS {q(index_name)}",
+                    f"ALTER TABLE {q(table_name)} DROP COLUMN IF EXISTS {q(SEARCH_TSV_COLUMN)}"
+                ],
+                "description": "新增STORED tsvector生成列并建立GIN索引（分词匹配，默认的子串检索不使用该索引；建列会重写表）"
+            }
+        index_name = _pg_index_name("idx_cae_trgm", table_name)
+        return {
+            "table": table_name,
+            "kind": "trgm",
+            "columns": search_cols,
+            "ddl": [
+                "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {q(index_name)} ON {q(table_name)} "
+                f"USING gin (({expression}) gin_trgm_ops)"
+            ],
+            "rollback": [
+                f"DROP INDEX CONCURRENTLY IF EXISTS {q(index_name)}"
+            ],
+            "description": "在文本列拼接表达式上并发创建GIN trigram索引（不锁写，保持LIKE语义）"
+        }
+    return None
+
+
+def suggest_search_indexes(db_type, table_meta, catalog_tables, db_stats, show_all=False, pg_kind="trgm"):
+    """
+    从table_meta中的启用表出发，给出检索索引建议（按累计全表扫描耗时降序）
+    :param catalog_tables: 列目录缓存{table: {"columns", "types", "search_indexes"}}
+    :param db_stats: SearchStatsStore.get_db_stats的结果
+    :param show_all: 为True时忽略检索次数/耗时阈值，列出所有无可用索引的表
+    :return: list - 方案字典（额外包含searches、scans、avg_scan_seconds、scan_time）
+    """
+    proposals = []
+    for table_name, meta in table_meta.items():
+        if not meta.get("enable_search", True):
+            continue
+        schema = (catalog_tables or {}).get(table_name)
+        # 列类型未加载或已有检索索引的表不给建议（tsvector分词索引不服务默认的子串检索，仍给建议）
+        if not schema or not schema.get("types") or any(
+                idx["kind"] != "tsvector" for idx in schema.get("search_indexes") or []):
+            continue
+        stat = db_stats.get(table_name, {})
+        searches, scans, scan_time = stat.get("searches", 0), stat.get("scans", 0), stat.get("scan_time", 0.0)
+        avg_scan_seconds = scan_time / scans if scans else 0.0
+        if not show_all and (searches < INDEX_ADVISOR_CONFIG["min_searches"]
+                             or avg_scan_seconds < INDEX_ADVISOR_CONFIG["min_avg_scan_seconds"]):
+            continue
+        proposal = build_search_index_proposal(
+            db_type, table_name, {**schema, "skip_columns": meta.get("non_searchable_columns", [])}, pg_kind)
+        if proposal:
+            proposal.update({
+                "searches": searches,
+                "scans": scans,
+                "scan_time": round(scan_time, 3),
+                "avg_scan_seconds": round(avg_scan_seconds, 3)
+            })
+            proposals.append(proposal)
+    proposals.sort(key=lambda p: p["scan_time"], reverse=True)
+    return proposals
+
+
+def apply_search_index(adapter, proposal, pause_seconds=None):
+    """
+    执行方案DDL（语句间限流）；任一语句失败时自动回滚已执行部分
+    :param adapter: 已配置凭据的适配器实例（结束时归还连接）
+    :return: (bool, msg)
+    """
+    if pause_seconds is None:
+        pause_seconds = INDEX_ADVISOR_CONFIG["ddl_pause_seconds"]
+    lock = _get_ddl_lock(adapter.db_id)
+    if not lock.acquire(blocking=False):
+        return (False, "该数据库已有DDL任务在执行，请稍后再试")
+    try:
+        is_ok, msg = adapter.execute_ddl(proposal["ddl"], pause_seconds)
+        if not is_ok:
+            _run_rollback(adapter, proposal)
+            return (False, f"{msg}，已回滚已执行的部分")
+        return (True, f"{proposal['table']}检索索引创建完成（{msg}）")
+    finally:
+        adapter.close()
+        lock.release()
+
+
+def _run_rollback(adapter, proposal):
+    """逐条执行回滚语句（单条失败不影响后续语句，兼容部分执行的情况）"""
+    messages = []
+    for sql in proposal["rollback"]:
+        is_ok, msg = adapter.execute_ddl([sql])
+        if not is_ok:
+            messages.append(msg)
+    return messages
+
+
+def rollback_search_index(adapter, proposal):
+    """
+    回滚已创建的检索索引
+    :return: (bool, msg)
+    """
+    lock = _get_ddl_lock(adapter.db_id)
+    if not lock.acquire(blocking=False):
+        return (False, "该数据库已有DDL任务在执行，请稍后再试")
+    try:
+        errors = _run_rollback(adapter, proposal)
+        if len(errors) == len(proposal["rollback"]):
+            return (False, f"回滚失败：{'；'.join(errors)}")
+        return (True, f"{proposal['table']}检索索引已回滚")
+    finally:
+        adapter.close()
+        lock.release()
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 分页检索（LIMIT/keyset分页下推到数据库）
+每张启用表维护自己的游标状态（上一页最后一行的主键），只在需要时向该表取下一页；
+多表、多库的结果按(数据库顺序, 表顺序, 表内顺序)依次串接成全局页：前一张表读完才开始读下一张表，
+翻到第N页只会查询到达第N页所经过的表（不会为首页向每张启用表各发一次查询）。总数由独立的、可取消的COUNT查询在后台统计
+"""
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+
+class TableCursor:
+    """单表分页游标：记录下一页的起点（主键keyset或OFFSET）和是否已读完"""
+
+    def __init__(self, db_order, table_order, adapter, table_name, schema):
+        self.db_order = db_order
+        self.table_order = table_order
+        self.adapter = adapter
+        self.table_name = table_name
+        self.schema = schema
+        self.next_key = None
+        self.exhausted = False
+        self.fetched_rows = 0
+        self.path = None
+
+    def iter_rows(self, keyword, fetch_size):
+        """按需逐页读取本表命中行，生成行字典；每页读取后立即归还连接"""
+        while not self.exhausted:
+            try:
+                df, self.next_key, self.path = self.adapter.fetch_search_page(
+                    self.table_name, keyword, self.schema, self.next_key, fetch_size
+                )
+            except Exception as e:
+                print(f"分页检索{self.table_name}失败：{str(e)}")
+                self.path, self.exhausted = "error", True
+                break
+            finally:
+                self.adapter.close()
+            self.fetched_rows += len(df)
+            if len(df) < fetch_size:
+                self.exhausted = True
+            yield from df.to_dict("records")
+
+
+class PagedSearch:
+    """一次分页检索会话（保存在会话状态中，翻页时只读取需要的行）"""
+
+    def __init__(self, keyword, snapshots, adapter_factory, page_size=10):
+        """
+        :param snapshots: 检索快照列表（按数据库顺序）
+        :param adapter_factory: adapter_factory(snapshot)返回该库的适配器实例
+        """
+        self.keyword = keyword
+        self.page_size = page_size
+        self.snapshots = snapshots
+        self.adapter_factory = adapter_factory
+        self.cursors = []
+        for db_order, snapshot in enumerate(snapshots):
+            adapter = adapter_factory(snapshot)
+            if not adapter:
+                continue
+            for table_order, table in enumerate(snapshot.enabled_tables):
+                self.cursors.append(TableCursor(db_order, table_order, adapter, table,
+                                                snapshot.table_schemas.get(table)))
+        # 每张表每次只取一页大小（LIMIT下推）；按表顺序惰性串接，未到达的表不查询
+        self._merged = itertools.chain.from_iterable(cursor.iter_rows(keyword, page_size)
+                                                     for cursor in self.cursors)
+        self.pages = []
+        self.finished = not self.cursors
+        # 后台计数状态
+        self._count_lock = threading.Lock()
+        self._count_cancel = threading.Event()
+        self._count_running = {}
+        self.table_counts = {}
+        self.count_started = False
+        self.count_finished = False
+
+    # ====================== 翻页 ======================
+    def get_page(self, page_no):
+        """
+        获取第page_no页（从1开始）：已读取的页直接返回，向后翻页时只读取补齐该页所需的行
+        :return: DataFrame（超出结果范围时为空）
+        """
+        while len(self.pages) < page_no and not self.finished:
+            items = list(itertools.islice(self._merged, self.page_size))
+            if len(items) < self.page_size:
+                self.finished = True
+            if items:
+                self.pages.append(pd.DataFrame(items))
+        if page_no <= len(self.pages):
+            return self.pages[page_no - 1]
+        return pd.DataFrame()
+
+    def has_next_page(self, page_no):
+        """第page_no页之后是否可能还有数据"""
+        return page_no < len(self.pages) or not self.finished
+
+    def loaded_rows(self):
+        """已翻页读取的行数"""
+        return sum(len(page) for page in self.pages)
+
+    def get_table_stats(self):
+        """各表分页读取统计（与检索统计格式一致，rows为已读取行数）"""
+        return [
+            {"db_id": self.snapshots[cursor.db_order].db_id, "table": cursor.table_name,
+             "path": cursor.path or "scan", "rows": cursor.fetched_rows, "elapsed": 0.0}
+            for cursor in self.cursors if cursor.path
+        ]
+
+    # ====================== 后台计数 ======================
+    def start_count(self, max_workers=4):
+        """在后台统计各表命中总数（每个库一个线程、一个独立连接，逐表COUNT）"""
+        if self.count_started:
+            return
+        self.count_started = True
+        snapshots = [s for s in self.snapshots if s.enabled_tables]
+        if not snapshots:
+            self.count_finished = True
+            return
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(snapshots))),
+                                      thread_name_prefix="cae_count")
+        futures = [executor.submit(self._count_db, snapshot) for snapshot in snapshots]
+
+        def wait_all():
+            for future in futures:
+                future.exception()
+            executor.shutdown(wait=False)
+            self.count_finished = True
+
+        threading.Thread(target=wait_all, name="cae_count_wait", daemon=True).start()
+
+    def _count_db(self, snapshot):
+        """统计单个库各启用表的命中数（取消后停止）"""
+        adapter = self.adapter_factory(snapshot)
+        if not adapter:
+            return
+        try:
+            if not adapter.connect()[0]:
+                return
+            for table in snapshot.enabled_tables:
+                if self._count_cancel.is_set():
+                    break
+                with self._count_lock:
+                    self._count_running[snapshot.db_id] = (adapter, adapter.conn)
+                try:
+                    count = adapter.count_search_matches(table, self.keyword, snapshot.table_schemas.get(table))
+                except Exception as e:
+                    if not self._count_cancel.is_set():
+                        print(f"统计{table}命中数失败：{str(e)}")
+                    count = None
+                finally:
+                    with self._count_lock:
+                        self._count_running.pop(snapshot.db_id, None)
+                with self._count_lock:
+                    self.table_counts[(snapshot.db_id, table)] = count
+        finally:
+            adapter.close()
+
+    def cancel_count(self):
+        """取消后台计数：不再开始新的COUNT，并终止正在执行的COUNT语句"""
+        self._count_cancel.set()
+        with self._count_lock:
+            running = list(self._count_running.values())
+        for adapter, conn in running:
+            try:
+                adapter.cancel_query(conn)
+            except Exception as e:
+                print(f"取消计数失败：{str(e)}")
+
+    def get_count_status(self):
+        """
+        计数进度
+        :return: {"total": 已统计的命中数之和, "done": 已统计表数, "tables": 表总数, "finished", "cancelled"}
+        """
+        with self._count_lock:
+            counts = dict(self.table_counts)
+        return {
+            "total": sum(count for count in counts.values() if count),
+            "done": len(counts),
+            "tables": len(self.cursors),
+            "finished": self.count_finished,
+            "cancelled": self._count_cancel.is_set()
+        }
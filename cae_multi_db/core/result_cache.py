@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 检索结果缓存（进程级共享，跨Streamlit会话）
+以单个数据库为粒度缓存结果：键为(关键词, db_id, 启用表集合, 表结构指纹, 是否使用影子索引, 访问身份摘要)，
+不同账号的结果互不复用（账号的可见范围可能不同），
+内存按LRU淘汰并受内存预算约束，每个库可单独设置有效期，可选持久化到本地磁盘；
+表结构变化、元信息刷新、影子索引同步到变更以及用户手动清空时按库失效
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from cae_multi_db.config.db_config import RESULT_CACHE_CONFIG
+
+
+def make_result_key(keyword, db_id, tables, schema_version, use_shadow_index=False, identity=None):
+    """
+    生成结果缓存键（关键词去除首尾空白，启用表与顺序无关）
+    :param identity: 访问身份（连接池键：主机、库、用户、密码摘要）。不同数据库账号的可见范围可能不同
+                     （行级安全、列权限），缓存结果只给同一身份复用；键中只保留其摘要
+    """
+    return (keyword.strip(), db_id, tuple(sorted(tables)), schema_version, bool(use_shadow_index),
+            None if identity is None else _digest(identity))
+
+
+def _digest(value):
+    """生成文件名用的摘要"""
+    return hashlib.sha1(repr(value).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """LRU+TTL结果缓存（线程安全）：{键: {"frames", "stats", "size", "expires_at"}}，frames为按表分开的结果列表"""
+
+    def __init__(self, max_memory_mb=None, default_ttl=None, db_ttl=None, persist=None, disk_dir=None):
+        self.max_bytes = int((max_memory_mb or RESULT_CACHE_CONFIG["max_memory_mb"]) * 1024 * 1024)
+        self.default_ttl = RESULT_CACHE_CONFIG["default_ttl"] if default_ttl is None else default_ttl
+        self.db_ttl = dict(RESULT_CACHE_CONFIG["db_ttl"] if db_ttl is None else db_ttl)
+        self.persist = RESULT_CACHE_CONFIG["persist"] if persist is None else persist
+        self.disk_dir = disk_dir or RESULT_CACHE_CONFIG["disk_dir"]
+        if self.persist:
+            os.makedirs(self.disk_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_ttl(self, db_id):
+        """某库的缓存有效期（秒）"""
+        return self.db_ttl.get(db_id, self.default_ttl)
+
+    def _disk_path(self, key):
+        """磁盘文件路径（文件名以库摘要开头，便于按库清除）"""
+        return os.path.join(self.disk_dir, f"{_digest(key[1])[:12]}_{_digest(key)}.pkl")
+
+    def _drop(self, key):
+        """移除一个内存条目（调用方持有锁）"""
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._total_bytes -= entry["size"]
+
+    def _insert(self, key, entry):
+        """写入内存并按LRU淘汰到预算以内（调用方持有锁）"""
+        self._drop(key)
+        self._entries[key] = entry
+        self._total_bytes += entry["size"]
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest_key = next(iter(self._entries))
+            self._drop(oldest_key)
+
+    def get(self, key):
+        """
+        读取缓存（命中时移到LRU队尾；内存未命中且开启持久化时尝试读取磁盘）
+        :return: ([DataFrame], stats)，未命中返回None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # 浅拷贝：调用方增删列不影响缓存
+                return self._copy_entry(entry)
+            if entry:
+                self._drop(key)
+
+        if self.persist:
+            entry = self._load_from_disk(key, now)
+            if entry:
+                with self._lock:
+                    self._insert(key, entry)
+                    self.hits += 1
+                return self._copy_entry(entry)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    @staticmethod
+    def _copy_entry(entry):
+        """返回条目的浅拷贝"""
+        return ([df.copy(deep=False) for df in entry["frames"]], [dict(stat) for stat in entry["stats"]])
+
+    @staticmethod
+    def _frames_size(frames):
+        """结果占用内存（字节）"""
+        return int(sum(df.memory_usage(index=True, deep=True).sum() for df in frames))
+
+    def put(self, key, frames, stats):
+        """写入缓存（有效期为0的库、超过预算1/4的大结果不缓存）"""
+        ttl = self.get_ttl(key[1])
+        if not ttl:
+            return
+        frames = list(frames)
+        size = self._frames_size(frames)
+        if size > self.max_bytes // 4:
+            return
+        entry = {"frames": frames, "stats": [dict(stat) for stat in stats], "size": size,
+                 "expires_at": time.time() + ttl}
+        with self._lock:
+            self._insert(key, entry)
+        if self.persist:
+            self._save_to_disk(key, entry)
+
+    def _save_to_disk(self, key, entry):
+        """写入磁盘（先写临时文件再替换，避免读到半个文件）"""
+        path = self._disk_path(key)
+        try:
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump({"key": key, "frames": entry["frames"], "stats": entry["stats"],
+                             "expires_at": entry["expires_at"]}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            print(f"写入结果缓存文件失败：{str(e)}")
+
+    def _load_from_disk(self, key, now):
+        """读取磁盘缓存（过期或键不一致时删除文件），返回内存条目或None"""
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except Exception as e:
+            print(f"读取结果缓存文件失败：{str(e)}")
+            data = None
+        if not data or data.get("key") != key or "frames" not in data or data["expires_at"] <= now:
+            self._remove_file(path)
+            return None
+        return {"frames": data["frames"], "stats": data["stats"], "size": self._frames_size(data["frames"]),
+                "expires_at": data["expires_at"]}
+
+    @staticmethod
+    def _remove_file(path):
+        """删除缓存文件（忽略已被其他进程删除的情况）"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def invalidate(self, db_id=None):
+        """清除缓存（db_id为None时清除全部，包括磁盘文件）"""
+        with self._lock:
+            keys = [key for key in self._entries if db_id is None or key[1] == db_id]
+            for key in keys:
+                self._drop(key)
+        if self.persist and os.path.isdir(self.disk_dir):
+            prefix = f"{_digest(db_id)[:12]}_" if db_id is not None else ""
+            for name in os.listdir(self.disk_dir):
+                if name.startswith(prefix) and name.endswith(".pkl"):
+                    self._remove_file(os.path.join(self.disk_dir, name))
+
+    def get_stats(self):
+        """缓存概况：条目数、占用内存（MB）、命中/未命中次数"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_mb": round(self._total_bytes / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# 进程级单例（跨Streamlit重跑与会话共享）
+_RESULT_CACHE = None
+_RESULT_CACHE_LOCK = threading.Lock()
+
+
+def get_result_cache():
+    """获取进程级结果缓存"""
+    global _RESULT_CACHE
+    with _RESULT_CACHE_LOCK:
+        if _RESULT_CACHE is None:
+            _RESULT_CACHE = ResultCache()
+        return _RESULT_CACHE
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 列目录缓存（进程级共享，带表结构指纹）
+检索路径只读取缓存的列名/类型，不再逐表查询列信息和预览数据；
+后台用廉价的表结构指纹（information_schema列校验和）判断是否需要重新加载。
+列目录同时写入本地持久化目录：重启后某库首次使用时从本地读取（标记为待校验），无需立即逐库重新加载
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cae_multi_db.config.db_config import SCHEMA_CATALOG_CONFIG
+from cae_multi_db.core.catalog_store import get_catalog_store
+from cae_multi_db.core.result_cache import get_result_cache
+
+
+def make_catalog_key(db_id, db_info):
+    """生成列目录键（与凭据无关，同一数据库的所有会话共享）"""
+    return (db_info.get("db_type"), db_id, db_info.get("host"), str(db_info.get("port")), db_info.get("database"))
+
+
+class SchemaCatalog:
+    """列目录缓存（线程安全）：{键: {"fingerprint", "tables", "checked_at"}}"""
+
+    def __init__(self, refresh_interval=None, refresh_workers=None):
+        self.refresh_interval = (SCHEMA_CATALOG_CONFIG["refresh_interval"]
+                                 if refresh_interval is None else refresh_interval)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loaded = set()  # 已尝试从本地持久化目录读取的键
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(
+            max_workers=refresh_workers or SCHEMA_CATALOG_CONFIG["refresh_workers"],
+            thread_name_prefix="cae_catalog"
+        )
+
+    def _get_entry(self, key):
+        """
+        获取列目录条目（调用方需持有_lock）：内存中没有时从本地持久化目录读取一次，
+        读取的条目校验时间为0，首次检索即触发后台指纹校验
+        """
+        entry = self._entries.get(key)
+        if entry is not None or key in self._loaded:
+            return entry
+        self._loaded.add(key)
+        store = get_catalog_store()
+        if store is None:
+            return None
+        try:
+            saved = store.load_catalog(key)
+        except Exception as e:
+            print(f"读取{key[1]}本地列目录失败：{str(e)}")
+            return None
+        if saved is None:
+            return None
+        fingerprint, tables = saved
+        entry = {"fingerprint": fingerprint, "tables": tables, "checked_at": 0.0}
+        self._entries[key] = entry
+        return entry
+
+    def get_tables(self, key):
+        """获取某库的列目录：{table: {"columns": [], "types": {}, "search_indexes": []}}，未加载返回None"""
+        with self._lock:
+            entry = self._get_entry(key)
+            return entry["tables"] if entry else None
+
+    def get_fingerprint(self, key):
+        """获取某库的表结构指纹（未加载返回None），跨进程稳定，用作结果缓存键中的表结构版本"""
+        with self._lock:
+            entry = self._get_entry(key)
+            return entry["fingerprint"] if entry else None
+
+    def update(self, key, fingerprint, tables):
+        """写入列目录（同时写入本地持久化目录），指纹变化时清除该库的结果缓存；返回是否发生变化"""
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry and entry["fingerprint"] == fingerprint:
+                entry["checked_at"] = time.time()
+                return False
+            self._entries[key] = {
+                "fingerprint": fingerprint,
+                "tables": tables,
+                "checked_at": time.time()
+            }
+        store = get_catalog_store()
+        if store is not None:
+            try:
+                store.save_catalog(key, fingerprint, tables)
+            except Exception as e:
+                print(f"写入{key[1]}本地列目录失败：{str(e)}")
+        get_result_cache().invalidate(key[1])
+        return True
+
+    def invalidate(self, key=None):
+        """清除列目录（含本地持久化的列目录）及对应库的结果缓存（key为None时清除全部）"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            # 本地列目录随之删除，不再读取
+            if key is None:
+                self._loaded.clear()
+            else:
+                self._loaded.add(key)
+        store = get_catalog_store()
+        if store is not None:
+            try:
+                store.delete_catalog(key)
+            except Exception as e:
+                print(f"删除本地列目录失败：{str(e)}")
+        get_result_cache().invalidate(None if key is None else key[1])
+
+    def is_stale(self, key):
+        """列目录是否未加载或距上次校验已超过refresh_interval"""
+        with self._lock:
+            entry = self._get_entry(key)
+            return entry is None or time.time() - entry["checked_at"] > self.refresh_interval
+
+    def refresh(self, key, adapter, force=False):
+        """
+        同步刷新：先取表结构指纹，未变化则只更新校验时间，变化时批量重新加载列目录和可用检索索引
+        :param adapter: 已配置凭据的适配器实例（本方法结束时归还其连接）
+        :param force: 为True时指纹未变化也重新加载（用户手动重新加载表元信息时，刷新检索索引的覆盖列等信息）
+        :return: bool - 表结构是否发生变化
+        """
+        try:
+            fingerprint = adapter.get_schema_fingerprint()
+            if fingerprint is None:
+                return False
+            with self._lock:
+                entry = self._get_entry(key)
+                if entry and entry["fingerprint"] == fingerprint and not force:
+                    entry["checked_at"] = time.time()
+                    return False
+            tables = adapter.get_columns_catalog()
+            try:
+                search_indexes = adapter.get_search_indexes(tables)
+            except Exception as e:
+                # 索引发现失败不影响列目录，相关表退回全表扫描
+                print(f"发现{key[1]}检索索引失败：{str(e)}")
+                search_indexes = {}
+            for table_name, items in search_indexes.items():
+                if table_name in tables:
+                    tables[table_name]["search_indexes"] = items
+            if force:
+                # 清空已有指纹，update按变化处理（写入本地目录、清除结果缓存）
+                with self._lock:
+                    entry = self._get_entry(key)
+                    if entry:
+                        entry["fingerprint"] = None
+            return self.update(key, fingerprint, tables)
+        except Exception as e:
+            print(f"刷新列目录{key[1]}失败：{str(e)}")
+            return False
+        finally:
+            adapter.close()
+
+    def refresh_async(self, key, adapter_factory):
+        """
+        后台刷新（同一个库同时只有一个刷新任务）
+        :param adapter_factory: 无参函数，返回新的适配器实例（在后台线程中调用）
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def task():
+            try:
+                adapter = adapter_factory()
+                if adapter:
+                    self.refresh(key, adapter)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(task)
+
+
+# 进程级单例（跨Streamlit重跑与会话共享）
+_SCHEMA_CATALOG = None
+_SCHEMA_CATALOG_LOCK = threading.Lock()
+
+
+def get_schema_catalog():
+    """获取进程级列目录缓存"""
+    global _SCHEMA_CATALOG
+    with _SCHEMA_CATALOG_LOCK:
+        if _SCHEMA_CATALOG is None:
+            _SCHEMA_CATALOG = SchemaCatalog()
+        return _SCHEMA_CATALOG
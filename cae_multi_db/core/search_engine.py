@@ -1,25 +1,73 @@
 # -*- coding: utf-8 -*-
 """
-检索引擎核心（使用单线程避免SessionState访问问题）
+检索引擎核心（主线程构建配置快照，子线程并发检索，避免SessionState访问问题）
 """
+import copy
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 from cae_multi_db.adapters.mysql_adapter import MySQLAdapter
 from cae_multi_db.adapters.pg_adapter import PGAdapter
-from cae_multi_db.config.user_config import get_db_info_by_id, get_db_auth_by_id, get_enabled_tables
+from cae_multi_db.adapters.base_adapter import GENERATED_SEARCH_COLUMNS, HIT_COLUMNS
+from cae_multi_db.adapters.circuit_breaker import get_circuit_breaker
+from cae_multi_db.adapters.conn_pool import make_pool_key
+from cae_multi_db.adapters.query_deadline import SearchDeadline
+from cae_multi_db.config.db_config import (
+    SEARCH_CONCURRENCY_CONFIG, SHADOW_INDEX_CONFIG, RESULT_CACHE_CONFIG, SEARCH_DEADLINE_CONFIG
+)
+from cae_multi_db.config.user_config import (
+    get_db_info_by_id, get_db_auth_by_id, get_enabled_tables, get_verified_dbs
+)
+from cae_multi_db.core.schema_catalog import get_schema_catalog, make_catalog_key
+from cae_multi_db.core.search_stats import get_search_stats_store
+from cae_multi_db.core.shadow_index import get_shadow_index
+from cae_multi_db.core.change_sync import get_change_sync
+from cae_multi_db.core.result_cache import get_result_cache, make_result_key
+from cae_multi_db.core.paged_search import PagedSearch
+from cae_multi_db.core.search_result import PROVENANCE_COLUMNS, SearchResult
+from cae_multi_db.utils.text_utils import normalize_text
+
+# 单个数据库的检索快照（主线程构建，子线程只读）
+DBSearchSnapshot = namedtuple("DBSearchSnapshot", ["db_id", "db_info", "user_auth", "enabled_tables", "table_schemas",
+                                                   "schema_version"])
+
+# 结果不完整的检索路径（含这些路径的单库结果不写入结果缓存）
+INCOMPLETE_PATHS = ("error", "timeout", "cancelled", "unavailable")
 
 
 class CAESearchEngine:
-    """多数据库检索引擎（单线程版本）"""
+    """多数据库检索引擎（支持跨库并发检索）"""
 
-    def __init__(self, st_session):
+    def __init__(self, st_session, concurrent=None, max_workers=None, use_cache=None, timeout=None):
+        """
+        :param st_session: 会话（检索服务的会话句柄或同结构的字典，仅在主线程读取）
+        :param concurrent: 是否并发检索，None时读取SEARCH_CONCURRENCY_CONFIG
+        :param max_workers: 跨库检索线程池大小，None时读取SEARCH_CONCURRENCY_CONFIG
+        :param use_cache: 是否使用结果缓存，None时读取RESULT_CACHE_CONFIG
+        :param timeout: 每次检索的截止时间（秒），None时读取SEARCH_DEADLINE_CONFIG，0为不限时
+        """
         self.st_session = st_session
+        self.catalog = get_schema_catalog()
+        self.result_cache = get_result_cache()
+        self.use_cache = RESULT_CACHE_CONFIG["enabled"] if use_cache is None else use_cache
+        self.last_search_stats = []  # 最近一次检索各表的检索路径/命中行数/耗时
+        self.last_search_result = SearchResult("")  # 最近一次流式检索的完整结果
+        self._hit_snapshots = {}  # 最近一次批量命中检索的快照（展开命中行时复用）
+        self.concurrent = SEARCH_CONCURRENCY_CONFIG["concurrent"] if concurrent is None else concurrent
+        self.max_workers = max_workers or SEARCH_CONCURRENCY_CONFIG["max_db_workers"]
+        self.timeout = SEARCH_DEADLINE_CONFIG["default_timeout"] if timeout is None else timeout
+        self.deadline = None  # 当前（最近一次）检索的截止时间，cancel()通过它终止在途语句
         self.adapter_map = {
             "mysql": MySQLAdapter,
             "postgresql": PGAdapter
         }
 
-    def _get_adapter_instance(self, db_id):
-        """获取数据库适配器实例（单线程安全）"""
+    def _build_snapshot(self, db_id):
+        """在主线程构建数据库检索快照（深拷贝配置和权限，子线程不再访问SessionState）"""
         db_info = get_db_info_by_id(self.st_session, db_id)
         if not db_info:
             return None
@@ -28,56 +76,523 @@ class CAESearchEngine:
         if not user_auth or not user_auth.get("is_verified", False):
             return None
 
-        db_type = db_info["db_type"]
-        adapter_class = self.adapter_map.get(db_type)
+        enabled_tables = tuple(get_enabled_tables(self.st_session, db_id))
+        table_schemas = self._get_table_schemas(db_id, db_info, enabled_tables)
+        schema_version = self.catalog.get_fingerprint(make_catalog_key(db_id, db_info))
+        return DBSearchSnapshot(db_id, db_info, user_auth, enabled_tables, table_schemas, schema_version)
+
+    def _get_table_schemas(self, db_id, db_info, enabled_tables):
+        """
+        从列目录缓存取启用表的列信息（未加载时退回table_meta中保存的列名），并附加table_meta中标记的不参与检索的列，
+        列目录过期时触发后台指纹校验，检索本身不等待刷新
+        """
+        catalog_key = make_catalog_key(db_id, db_info)
+        cached_tables = self.catalog.get_tables(catalog_key) or {}
+        table_meta = db_info.get("table_meta", {})
+        table_schemas = {}
+        for table in enabled_tables:
+            if table in cached_tables:
+                table_schemas[table] = cached_tables[table]
+            elif table_meta.get(table, {}).get("columns"):
+                table_schemas[table] = {"columns": list(table_meta[table]["columns"]), "types": {}}
+            else:
+                continue
+            # 用户标记为不参与检索的列（不修改共享的列目录）
+            skip_columns = table_meta.get(table, {}).get("non_searchable_columns")
+            if skip_columns:
+                table_schemas[table] = {**table_schemas[table], "skip_columns": list(skip_columns)}
+
+        if self.catalog.is_stale(catalog_key):
+            db_info_copy = copy.deepcopy(db_info)
+            user_auth_copy = get_db_auth_by_id(self.st_session, db_id)
+            adapter_class = self.adapter_map.get(db_info["db_type"])
+            if adapter_class and user_auth_copy:
+                self.catalog.refresh_async(
+                    catalog_key, lambda: adapter_class(db_id, db_info_copy, user_auth_copy)
+                )
+        return table_schemas
+
+    def _get_adapter_instance(self, snapshot, deadline=None):
+        """根据快照创建数据库适配器实例（每个线程独立实例；deadline为本次检索的截止时间）"""
+        adapter_class = self.adapter_map.get(snapshot.db_info["db_type"])
         if not adapter_class:
             return None
+        # 再次深拷贝，避免适配器修改快照内容
+        adapter = adapter_class(snapshot.db_id, copy.deepcopy(snapshot.db_info), copy.deepcopy(snapshot.user_auth))
+        adapter.deadline = deadline
+        return adapter
+
+    @staticmethod
+    def _unavailable_stats(snapshot):
+        """数据库已熔断时返回各表统计（检索路径为unavailable，不尝试连接），未熔断时返回None"""
+        if get_circuit_breaker(snapshot.db_id).allow_request():
+            return None
+        return [{"db_id": snapshot.db_id, "table": table, "path": "unavailable", "rows": 0, "elapsed": 0.0}
+                for table in snapshot.enabled_tables]
 
-        return adapter_class(db_id, db_info, user_auth)
+    def _start_search(self, timeout=None):
+        """开始一次检索：创建截止时间（timeout为None时使用引擎的timeout）"""
+        self.deadline = SearchDeadline(self.timeout if timeout is None else timeout)
+        return self.deadline
 
-    def _single_db_search(self, db_id, keyword):
-        """单个数据库检索（单线程执行）"""
-        adapter = self._get_adapter_instance(db_id)
+    def cancel(self):
+        """取消当前检索（可从其他线程调用）：终止各库在途语句，尚未开始的表不再检索，已取回的结果保留"""
+        deadline = self.deadline
+        if deadline is not None:
+            deadline.cancel()
+
+    def is_complete(self):
+        """最近一次检索是否完整（没有超时、被取消或失败的表）"""
+        return not any(stat["path"] in INCOMPLETE_PATHS for stat in self.last_search_stats)
+
+    def _search_shadow(self, adapter, snapshot, keyword, tables):
+        """
+        影子索引检索：本地求候选主键后按主键回源取行，并按关键词复核（索引可能滞后于源库）
+        :return: (结果列表, 统计列表, 仍需数据库检索的表)
+        """
+        candidates = get_shadow_index().search(keyword, snapshot.db_id, tables)
+        if candidates is None:
+            return ([], [], tables)
+
+        needle = normalize_text(keyword)
+        frames, stats, live_tables = [], [], []
+        for table in tables:
+            item = candidates.get(table)
+            schema = snapshot.table_schemas.get(table)
+            # 未建索引、候选超限或列结构已变化的表走数据库检索
+            if not item or (schema and [c for c in schema["columns"]
+                                        if c not in GENERATED_SEARCH_COLUMNS] != item["columns"]):
+                live_tables.append(table)
+                continue
+            start_time = time.time()
+            try:
+                df = adapter.fetch_rows_by_pk(table, item["columns"], item["pk_columns"], item["pks"])
+            except Exception as e:
+                print(f"影子索引回表{table}失败：{str(e)}")
+                live_tables.append(table)
+                continue
+            if not df.empty:
+                row_texts = df[item["columns"]].apply(
+                    lambda row: normalize_text(" ".join(str(v) for v in row if v is not None)), axis=1
+                )
+                df = df[row_texts.str.contains(needle, regex=False)]
+            frames.append(df)
+            stats.append({"db_id": snapshot.db_id, "table": table, "path": "shadow",
+                          "rows": len(df), "elapsed": round(time.time() - start_time, 3)})
+        return (frames, stats, live_tables)
+
+    def _sync_stale_tables(self, snapshot, tables):
+        """同步延迟超过阈值的影子索引表在后台增量同步（本次检索仍使用当前索引，结果会按关键词复核）"""
+        stale_tables = [
+            table for table in get_change_sync().get_stale_tables(snapshot.db_id, tables)
+            if (snapshot.table_schemas.get(table) or {}).get("primary_key")
+        ]
+        if stale_tables:
+            get_change_sync().sync_tables_async(
+                lambda: self._get_adapter_instance(snapshot), snapshot.db_id, stale_tables, snapshot.table_schemas
+            )
+
+    def _search_snapshot(self, snapshot, keyword, use_shadow_index=False):
+        """
+        按快照检索单个数据库（可在子线程执行，不访问SessionState；异常只影响本库）
+        :param use_shadow_index: 是否先用本地影子索引回答已建索引的表
+        :return: ([各表结果DataFrame], 各表统计列表)
+        """
+        if not snapshot.enabled_tables:
+            return ([], [])
+        unavailable = self._unavailable_stats(snapshot)
+        if unavailable:
+            return ([], unavailable)
+
+        adapter = self._get_adapter_instance(snapshot, self.deadline)
         if not adapter:
-            return pd.DataFrame()
+            return ([], [])
 
+        tables = list(snapshot.enabled_tables)
+        frames, stats, live_tables = [], [], tables
         try:
-            # 获取启用的表
-            enabled_tables = get_enabled_tables(self.st_session, db_id)
-            if not enabled_tables:
-                return pd.DataFrame()
-
-            # 执行检索
-            result_df = adapter.search(keyword, enabled_tables)
-            return result_df
+            if use_shadow_index:
+                frames, stats, live_tables = self._search_shadow(adapter, snapshot, keyword, tables)
+                adapter.close()
+                self._sync_stale_tables(snapshot, tables)
+            if live_tables:
+                frames.extend(adapter.search_tables(keyword, live_tables, table_schemas=snapshot.table_schemas))
         except Exception as e:
-            print(f"数据库{db_id}检索异常：{str(e)}")
-            return pd.DataFrame()
+            print(f"数据库{snapshot.db_id}检索异常：{str(e)}")
         finally:
-            if adapter:
+            adapter.close()
+        stats = stats + adapter.get_table_stats(live_tables)
+        unavailable = self._unavailable_stats(snapshot)
+        if unavailable:
+            # 本次检索中连接失败触发熔断：未检索的表标记为不可用
+            searched = {stat["table"] for stat in stats}
+            stats += [stat for stat in unavailable if stat["table"] not in searched]
+        return self._order_db_result(tables, frames, stats)
+
+    @staticmethod
+    def _order_db_result(tables, frames, stats):
+        """
+        单库结果（影子索引与数据库检索、或流式的多批）按启用表顺序排列，同一张表的多批合并，不同表不合并
+        :return: ([各表结果DataFrame], 各表统计列表)
+        """
+        table_order = {table: idx for idx, table in enumerate(tables)}
+        stats.sort(key=lambda stat: table_order[stat["table"]])
+        table_frames = {}
+        for df in frames:
+            if not df.empty:
+                table_frames.setdefault(df["_table"].iat[0], []).append(df)
+        ordered = [
+            parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+            for _, parts in sorted(table_frames.items(), key=lambda item: table_order[item[0]])
+        ]
+        return (ordered, stats)
+
+    @staticmethod
+    def _cache_identity(snapshot):
+        """结果缓存的访问身份：与连接池键一致（同一库、同一账号和密码才共享缓存结果）"""
+        return make_pool_key(snapshot.db_info.get("db_type"), snapshot.db_id, snapshot.db_info, snapshot.user_auth)
+
+    def _search_snapshot_cached(self, snapshot, keyword, use_shadow_index=False):
+        """
+        先查结果缓存，未命中再检索并写入缓存（列目录未加载或有表检索失败时不缓存）
+        :return: ([各表结果DataFrame], 各表统计列表) - 命中缓存时各表检索路径为cache
+        """
+        if not self.use_cache or snapshot.schema_version is None:
+            return self._search_snapshot(snapshot, keyword, use_shadow_index)
+        start_time = time.time()
+        key = make_result_key(keyword, snapshot.db_id, snapshot.enabled_tables, snapshot.schema_version,
+                              use_shadow_index, self._cache_identity(snapshot))
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            frames, cached_stats = cached
+            elapsed = round(time.time() - start_time, 3)
+            return (frames, [{**stat, "path": "cache", "elapsed": elapsed} for stat in cached_stats])
+        frames, stats = self._search_snapshot(snapshot, keyword, use_shadow_index)
+        if not any(stat["path"] in INCOMPLETE_PATHS for stat in stats):
+            self.result_cache.put(key, frames, stats)
+        return (frames, stats)
+
+    def _stream_snapshot(self, snapshot, keyword, use_shadow_index, out_queue, cancel_event, batch_size=None):
+        """
+        子线程：流式检索单个数据库，每批放入("batch", db_id, 表名, DataFrame)，
+        结束时放入("done", db_id, 按表排序的各表结果列表, 各表统计)；命中结果缓存时按表分批放入缓存结果
+        """
+        tables = list(snapshot.enabled_tables)
+        frames, stats = [], []
+        cache_key, cached = None, None
+        if self.use_cache and snapshot.schema_version is not None:
+            cache_key = make_result_key(keyword, snapshot.db_id, snapshot.enabled_tables, snapshot.schema_version,
+                                        use_shadow_index, self._cache_identity(snapshot))
+        try:
+            cached = self.result_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                cached_frames, cached_stats = cached
+                stats = [{**stat, "path": "cache", "elapsed": 0.0} for stat in cached_stats]
+                for df in cached_frames:
+                    out_queue.put(("batch", snapshot.db_id, df["_table"].iat[0], df))
+                    frames.append(df)
+                return
+
+            unavailable = self._unavailable_stats(snapshot)
+            if unavailable:
+                stats = unavailable
+                return
+            adapter = self._get_adapter_instance(snapshot, self.deadline)
+            if not adapter or not tables:
+                return
+            live_tables = tables
+            try:
+                if use_shadow_index:
+                    shadow_frames, stats, live_tables = self._search_shadow(adapter, snapshot, keyword, tables)
+                    adapter.close()
+                    self._sync_stale_tables(snapshot, tables)
+                    for df in shadow_frames:
+                        if not df.empty:
+                            out_queue.put(("batch", snapshot.db_id, df["_table"].iat[0], df))
+                            frames.append(df)
+                for table, df in adapter.stream_search(keyword, live_tables, snapshot.table_schemas,
+                                                       batch_size, cancel_event):
+                    out_queue.put(("batch", snapshot.db_id, table, df))
+                    frames.append(df)
+            finally:
                 adapter.close()
+                stats = stats + adapter.get_table_stats(live_tables)
+        except Exception as e:
+            print(f"数据库{snapshot.db_id}流式检索异常：{str(e)}")
+        finally:
+            frames, stats = self._order_db_result(tables, frames, stats)
+            if (cache_key and cached is None and not cancel_event.is_set()
+                    and not any(stat["path"] in INCOMPLETE_PATHS for stat in stats)):
+                self.result_cache.put(cache_key, frames, stats)
+            out_queue.put(("done", snapshot.db_id, frames, stats))
+
+    def stream_all_enabled_dbs(self, keyword, batch_size=None, heartbeat=None):
+        """
+        流式检索所有启用的数据库：各库在子线程中用服务端游标逐批读取，按到达顺序生成(db_id, 表名, DataFrame)；
+        全部生成完毕后，last_search_result/last_search_stats与search_all_enabled_dbs的结果一致（按数据库、表顺序合并）。
+        提前关闭生成器时终止各库在途语句；截止时间到期时各库停止读取，已读取的批次保留为部分结果
+        :param heartbeat: 秒数，超过该时间没有新批次时生成None（调用方借此检查是否需要取消），None为不生成
+        """
+        snapshots = [s for s in (self._build_snapshot(db_id) for db_id in self._get_verified_db_ids()) if s]
+        use_shadow_index = self.st_session.get("use_shadow_index", SHADOW_INDEX_CONFIG["enabled"])
+        self.last_search_stats = []
+        self.last_search_result = SearchResult(keyword)
+        if not snapshots:
+            return
+
+        deadline = self._start_search()
+        out_queue = queue.Queue()
+        cancel_event = threading.Event()
+        workers = max(1, min(self.max_workers, len(snapshots))) if self.concurrent else 1
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cae_db_stream")
+        for snapshot in snapshots:
+            executor.submit(self._stream_snapshot, snapshot, keyword, use_shadow_index, out_queue, cancel_event,
+                            batch_size)
+        results = {}
+        try:
+            while len(results) < len(snapshots):
+                try:
+                    item = out_queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield None
+                    continue
+                if item[0] == "done":
+                    results[item[1]] = (item[2], item[3])
+                else:
+                    yield item[1:]
+        finally:
+            if len(results) < len(snapshots):
+                # 生成器被提前关闭（调用方取消或出错）：终止各库在途语句
+                deadline.cancel()
+            deadline.close()
+            cancel_event.set()
+            executor.shutdown(wait=False)
+
+        # 按数据库顺序汇总各表统计，合并结果
+        ordered = [results[s.db_id] for s in snapshots]
+        self.last_search_stats = [stat for _, stats in ordered for stat in stats]
+        get_search_stats_store().record(self.last_search_stats)
+        self.last_search_result = self._make_result(keyword, snapshots, [df for frames, _ in ordered for df in frames])
+
+    def _make_result(self, keyword, snapshots, frames, hits=None):
+        """由各表结果（及批量检索的窄命中）构建检索结果模型，需回表的命中按主键经expand_hits取整行"""
+        pk_columns = {
+            (snapshot.db_id, table): schema["primary_key"]
+            for snapshot in snapshots for table, schema in snapshot.table_schemas.items()
+            if schema.get("primary_key")
+        }
+        table_order = [(snapshot.db_id, table) for snapshot in snapshots for table in snapshot.enabled_tables]
+        # 回表取得的整行的列（与BaseDBAdapter.expand_hits一致），导出时据此对齐列而不必先取回整行
+        table_columns = {
+            (snapshot.db_id, table): [col for col in schema["columns"] if col not in GENERATED_SEARCH_COLUMNS]
+                                     + PROVENANCE_COLUMNS
+            for snapshot in snapshots for table, schema in snapshot.table_schemas.items()
+            if schema.get("columns")
+        }
+        return SearchResult.from_frames(keyword, frames, pk_columns, hits, row_fetcher=self.expand_hits,
+                                        table_order=table_order, table_columns=table_columns)
+
+    def iter_export_rows(self, keyword, batch_size=None):
+        """
+        流式导出用的检索：逐库逐表用服务端游标读取命中行，直接生成行元组（不构建DataFrame，不使用影子索引和结果缓存）；
+        全部生成完毕后last_search_stats为各表统计
+        :return: 生成器(db_alias, 表名, 列名列表, 行元组列表)
+        """
+        snapshots = [s for s in (self._build_snapshot(db_id) for db_id in self._get_verified_db_ids()) if s]
+        self.last_search_stats = []
+        # 导出不限时（完整导出可能远超检索截止时间），但仍可通过cancel()终止
+        deadline = self._start_search(timeout=0)
+        try:
+            for snapshot in snapshots:
+                unavailable = self._unavailable_stats(snapshot)
+                if unavailable:
+                    self.last_search_stats.extend(unavailable)
+                    continue
+                adapter = self._get_adapter_instance(snapshot, deadline)
+                if not adapter or not snapshot.enabled_tables:
+                    continue
+                db_alias = snapshot.db_info.get("db_alias", snapshot.db_id)
+                stream = adapter.stream_search_rows(keyword, list(snapshot.enabled_tables), snapshot.table_schemas,
+                                                    batch_size)
+                try:
+                    for table, columns, rows in stream:
+                        yield (db_alias, table, columns, rows)
+                finally:
+                    stream.close()
+                    self.last_search_stats.extend(adapter.get_table_stats(list(snapshot.enabled_tables)))
+        finally:
+            deadline.close()
+
+    def paged_search(self, keyword, page_size=10):
+        """
+        创建分页检索会话：每张启用表按LIMIT/主键keyset分页，翻页时才向数据库读取所需的行
+        （分页模式直接查询数据库，不使用影子索引和结果缓存；每页只读取少量行，不设检索截止时间）
+        :return: PagedSearch
+        """
+        snapshots = [s for s in (self._build_snapshot(db_id) for db_id in self._get_verified_db_ids()) if s]
+        return PagedSearch(keyword, snapshots, self._get_adapter_instance, page_size)
+
+    def _search_hits_snapshot(self, snapshot, keyword):
+        """
+        单语句批量检索单个数据库（子线程执行）：可批量的表返回窄命中，其余表逐表检索返回整行
+        :return: (命中DataFrame, [各表整行DataFrame], 各表统计列表)
+        """
+        tables = list(snapshot.enabled_tables)
+        unavailable = self._unavailable_stats(snapshot)
+        if unavailable:
+            return (pd.DataFrame(columns=HIT_COLUMNS), [], unavailable)
+        adapter = self._get_adapter_instance(snapshot, self.deadline)
+        if not adapter or not tables:
+            return (pd.DataFrame(columns=HIT_COLUMNS), [], [])
+        hits, frames = pd.DataFrame(columns=HIT_COLUMNS), []
+        try:
+            hits, fallback_tables = adapter.search_hits(keyword, tables, snapshot.table_schemas)
+            if fallback_tables:
+                frames = adapter.search_tables(keyword, fallback_tables, table_schemas=snapshot.table_schemas)
+        except Exception as e:
+            print(f"数据库{snapshot.db_id}批量检索异常：{str(e)}")
+        finally:
+            adapter.close()
+        table_order = {table: idx for idx, table in enumerate(tables)}
+        stats = sorted(adapter.get_table_stats(tables), key=lambda stat: table_order[stat["table"]])
+        return (hits, frames, stats)
+
+    def search_hits_all_enabled_dbs(self, keyword):
+        """
+        单语句批量检索所有启用的数据库：每个库按UNION ALL分组一次往返取回窄命中（表、主键、命中列、摘要），
+        无主键等无法批量的表退回逐表检索并直接返回整行
+        :return: SearchResult - 批量检索表的整行在展示时按主键回表
+        """
+        snapshots = [s for s in (self._build_snapshot(db_id) for db_id in self._get_verified_db_ids()) if s]
+        self.last_search_stats = []
+        self._hit_snapshots = {s.db_id: s for s in snapshots}
+        if not snapshots:
+            return SearchResult(keyword)
+        deadline = self._start_search()
+        try:
+            if self.concurrent and len(snapshots) > 1:
+                workers = max(1, min(self.max_workers, len(snapshots)))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cae_db_hits") as executor:
+                    results = list(executor.map(lambda s: self._search_hits_snapshot(s, keyword), snapshots))
+            else:
+                results = [self._search_hits_snapshot(s, keyword) for s in snapshots]
+        finally:
+            deadline.close()
+
+        self.last_search_stats = [stat for _, _, stats in results for stat in stats]
+        get_search_stats_store().record(self.last_search_stats)
+        hit_frames = [hits for hits, _, _ in results if not hits.empty]
+        hits = pd.concat(hit_frames, ignore_index=True) if hit_frames else None
+        return self._make_result(keyword, snapshots, [df for _, frames, _ in results for df in frames], hits)
+
+    def expand_hits(self, hits):
+        """
+        按主键把一页窄命中展开为整行（主线程执行，使用最近一次批量检索的快照）
+        :return: {(db_id, 表名): DataFrame}，按命中顺序排列
+        """
+        expanded = {}
+        for db_id, group in hits.groupby("_db_id", sort=False, observed=True):
+            snapshot = self._hit_snapshots.get(db_id) or self._build_snapshot(db_id)
+            adapter = self._get_adapter_instance(snapshot) if snapshot else None
+            if not adapter:
+                continue
+            try:
+                for table, df in adapter.expand_hits(group, snapshot.table_schemas).items():
+                    expanded[(db_id, table)] = df
+            except Exception as e:
+                print(f"数据库{db_id}展开命中行失败：{str(e)}")
+            finally:
+                adapter.close()
+        return expanded
+
+    def _search_keywords_snapshot(self, snapshot, keywords):
+        """
+        多关键词批量检索单个数据库（子线程执行）：每张表一条语句检索全部关键词
+        :return: ({关键词: [各表结果DataFrame]}, 各表统计列表)
+        """
+        unavailable = self._unavailable_stats(snapshot)
+        if unavailable:
+            return ({}, unavailable)
+        adapter = self._get_adapter_instance(snapshot, self.deadline)
+        if not adapter or not snapshot.enabled_tables:
+            return ({}, [])
+        frames = {}
+        try:
+            frames = adapter.search_keywords(keywords, snapshot.enabled_tables, table_schemas=snapshot.table_schemas)
+        except Exception as e:
+            print(f"数据库{snapshot.db_id}批量检索异常：{str(e)}")
+        finally:
+            adapter.close()
+        return (frames, adapter.get_table_stats(list(snapshot.enabled_tables)))
+
+    def search_keywords(self, keywords):
+        """
+        多关键词批量检索所有启用的数据库（命令行批处理用，不使用影子索引和结果缓存）：
+        每张表只扫描一次，各关键词条件OR合并，按每个关键词的命中标记拆分结果
+        :return: {关键词: SearchResult}（关键词去重，保持原顺序）
+        """
+        keywords = list(dict.fromkeys(keywords))
+        snapshots = [s for s in (self._build_snapshot(db_id) for db_id in self._get_verified_db_ids()) if s]
+        self.last_search_stats = []
+        if not snapshots or not keywords:
+            return {keyword: SearchResult(keyword) for keyword in keywords}
+        deadline = self._start_search()
+        try:
+            if self.concurrent and len(snapshots) > 1:
+                workers = max(1, min(self.max_workers, len(snapshots)))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cae_db_batch") as executor:
+                    results = list(executor.map(lambda s: self._search_keywords_snapshot(s, keywords), snapshots))
+            else:
+                results = [self._search_keywords_snapshot(s, keywords) for s in snapshots]
+        finally:
+            deadline.close()
+
+        self.last_search_stats = [stat for _, stats in results for stat in stats]
+        get_search_stats_store().record(self.last_search_stats)
+        return {
+            keyword: self._make_result(keyword, snapshots, [df for frames, _ in results for df in frames.get(keyword, [])])
+            for keyword in keywords
+        }
+
+    def _get_verified_db_ids(self):
+        """获取所有启用且验证通过的数据库ID（按数据库列表顺序）"""
+        return get_verified_dbs(self.st_session)
 
     def search_all_enabled_dbs(self, keyword):
-        """检索所有启用且验证通过的数据库（单线程版本）"""
-        # 获取所有验证通过的数据库
-        verified_dbs = [
-            db["db_id"] for db in self.st_session.get("dynamic_dbs", [])
-            if db.get("enable_search", False)
-               and self.st_session.get("user_auth", {}).get(db["db_id"], {}).get("is_verified", False)
-        ]
+        """
+        检索所有启用且验证通过的数据库（并发模式下各库同时检索，结果按数据库列表顺序合并）
+        会话中use_shadow_index为True时，已建影子索引的表由本地索引回答，只按主键回源取命中行；
+        各库结果优先取自进程级结果缓存
+        :return: SearchResult - 窄命中表+按表保存的整行（不合并为宽表）
+        """
+        # 主线程构建所有快照，子线程只接触快照
+        snapshots = [s for s in (self._build_snapshot(db_id) for db_id in self._get_verified_db_ids()) if s]
+        use_shadow_index = self.st_session.get("use_shadow_index", SHADOW_INDEX_CONFIG["enabled"])
+        self.last_search_stats = []
+        if not snapshots:
+            return SearchResult(keyword)
+
+        deadline = self._start_search()
+        try:
+            if self.concurrent and len(snapshots) > 1:
+                workers = max(1, min(self.max_workers, len(snapshots)))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cae_db_search") as executor:
+                    futures = [executor.submit(self._search_snapshot_cached, s, keyword, use_shadow_index)
+                               for s in snapshots]
+                    # 按提交顺序收集结果，保证合并顺序确定
+                    results = []
+                    for snapshot, future in zip(snapshots, futures):
+                        try:
+                            results.append(future.result())
+                        except Exception as e:
+                            print(f"数据库{snapshot.db_id}检索异常：{str(e)}")
+                            results.append(([], []))
+            else:
+                results = [self._search_snapshot_cached(s, keyword, use_shadow_index) for s in snapshots]
+        finally:
+            deadline.close()
 
-        if not verified_dbs:
-            return pd.DataFrame()
-
-        # 单线程依次检索每个数据库
-        all_results = []
-        for db_id in verified_dbs:
-            result_df = self._single_db_search(db_id, keyword)
-            if not result_df.empty:
-                all_results.append(result_df)
-
-        # 合并结果
-        if all_results:
-            combined_df = pd.concat(all_results, ignore_index=True)
-            return combined_df
-        return pd.DataFrame()
\ No newline at end of file
+        # 按数据库顺序汇总各表统计，合并结果
+        self.last_search_stats = [stat for _, stats in results for stat in stats]
+        get_search_stats_store().record(self.last_search_stats)
+        return self._make_result(keyword, snapshots, [df for frames, _ in results for df in frames])
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 检索结果模型
+异构表的结果不再合并成一张宽表（列为所有表列名的并集，绝大部分为空值），而是拆成两部分：
+1. 窄命中表：每条命中一行（库、表、主键、命中列、摘要、得分），库/表/命中列为分类类型；
+2. 整行：按(db_id, 表)分别保存，每张表只包含自己的列；批量命中模式下整行按主键按需回表。
+内存占用随命中条数增长，与所有表列名的并集无关；界面和导出都从该模型读取
+"""
+import json
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+from cae_multi_db.adapters.base_adapter import HIT_COLUMNS
+from cae_multi_db.config.db_config import BATCH_SEARCH_CONFIG
+from cae_multi_db.utils.text_utils import normalize_text
+
+# 窄命中表的列：_row为整行在所属表结果中的位置（-1表示整行需按主键回表），_score为命中得分
+RESULT_HIT_COLUMNS = HIT_COLUMNS + ["_row", "_score"]
+# 整行结果中的来源列（不参与命中列判断）
+PROVENANCE_COLUMNS = ["_db_id", "_db_alias", "_table"]
+# 取值重复度高的列按分类类型保存
+_CATEGORY_COLUMNS = ["_db_id", "_db_alias", "_table", "_matched_column"]
+
+
+def format_pk(values):
+    """主键值格式化为JSON数组文本（与批量检索语句返回的主键格式一致）"""
+    return json.dumps([value.item() if hasattr(value, "item") else value for value in values],
+                      ensure_ascii=False, default=str)
+
+
+def _normalize_series(texts):
+    """向量化文本归一化（与normalize_text一致：NFKC+小写）"""
+    return texts.astype(str).str.normalize("NFKC").str.lower()
+
+
+def score_hits(texts, keyword):
+    """
+    命中得分（向量化）：归一化后与关键词完全相同1.0，以关键词开头0.8，包含关键词0.6，
+    文本不含关键词（数值/日期等类型化匹配）0.5
+    :param texts: 命中列的取值（或摘要）Series
+    """
+    needle = normalize_text(keyword).strip()
+    scores = pd.Series(0.5, index=texts.index, dtype="float32")
+    present = texts.notna()
+    if not needle or not present.any():
+        return scores
+    normalized = _normalize_series(texts[present]).str.strip()
+    scores[normalized.index[normalized.str.contains(needle, regex=False)]] = 0.6
+    scores[normalized.index[normalized.str.startswith(needle)]] = 0.8
+    scores[normalized.index[normalized == needle]] = 1.0
+    return scores
+
+
+def _make_snippet(text, normalized, needle, length):
+    """截取关键词附近的摘要（与批量检索语句的截取规则一致：关键词前保留length/3个字符）"""
+    pos = max(0, normalized.find(needle))
+    start = max(0, pos - length // 3)
+    return text[start:start + length]
+
+
+def build_table_hits(df, keyword, pk_columns=None, snippet_length=None):
+    """
+    由单张表的整行结果生成窄命中表：命中列为第一个（按列顺序）归一化后包含关键词的列
+    :param df: 单张表的整行结果（含来源列）
+    :param pk_columns: 主键列，为空时命中行的主键为None
+    :return: DataFrame（RESULT_HIT_COLUMNS）
+    """
+    snippet_length = snippet_length or BATCH_SEARCH_CONFIG["snippet_length"]
+    needle = normalize_text(keyword)
+    data_columns = [col for col in df.columns if col not in PROVENANCE_COLUMNS]
+    matched = pd.Series(None, index=df.index, dtype=object)
+    snippets = pd.Series(None, index=df.index, dtype=object)
+    values_matched = pd.Series(None, index=df.index, dtype=object)
+    for col in data_columns:
+        pending = matched.isna()
+        if not pending.any():
+            break
+        values = df.loc[pending, col]
+        values = values[values.notna()].astype(str)
+        if values.empty or not needle:
+            continue
+        normalized = _normalize_series(values)
+        found = normalized.str.contains(needle, regex=False)
+        found_idx = found.index[found]
+        if found_idx.empty:
+            continue
+        matched[found_idx] = col
+        values_matched[found_idx] = values[found_idx]
+        snippets[found_idx] = [
+            _make_snippet(text, norm, needle, snippet_length)
+            for text, norm in zip(values[found_idx], normalized[found_idx])
+        ]
+
+    if pk_columns and all(col in df.columns for col in pk_columns):
+        pks = [format_pk(row) for row in df[list(pk_columns)].itertuples(index=False, name=None)]
+    else:
+        pks = [None] * len(df)
+    first = df.iloc[0] if not df.empty else {}
+    return pd.DataFrame({
+        "_db_id": first.get("_db_id"),
+        "_db_alias": first.get("_db_alias"),
+        "_table": first.get("_table"),
+        "_pk": pks,
+        "_matched_column": matched.values,
+        "_snippet": snippets.values,
+        "_row": range(len(df)),
+        "_score": score_hits(values_matched, keyword).values
+    }, columns=RESULT_HIT_COLUMNS)
+
+
+def compact_hits(hits):
+    """窄命中表压缩：来源列和命中列转为分类类型，行号int32，得分float32"""
+    hits = hits.reset_index(drop=True)
+    for col in _CATEGORY_COLUMNS:
+        hits[col] = hits[col].astype("category")
+    hits["_row"] = hits["_row"].astype("int32")
+    hits["_score"] = hits["_score"].astype("float32")
+    return hits
+
+
+class SearchResult:
+    """
+    检索结果（窄命中表+按表保存的整行）
+    hits: DataFrame（RESULT_HIT_COLUMNS），按数据库、表顺序排列
+    frames: {(db_id, 表名): DataFrame} - 已取回的整行（每张表只含自己的列）
+    row_fetcher: 按命中取整行的函数 hits -> {(db_id, 表名): DataFrame}，用于_row为-1的命中
+    pk_columns: {(db_id, 表名): 主键列}，用于把回表取得的整行对应到命中
+    table_columns: {(db_id, 表名): 整行的列（含来源列）}，来自列目录，导出时不必先取回整行即可确定列
+    """
+
+    def __init__(self, keyword, hits=None, frames=None, row_fetcher=None, pk_columns=None, table_columns=None):
+        self.result_id = uuid.uuid4().hex  # 结果标识（界面缓存、导出缓存以此为键）
+        self.keyword = keyword
+        self.hits = compact_hits(hits if hits is not None else pd.DataFrame(columns=RESULT_HIT_COLUMNS))
+        self.frames = dict(frames or {})
+        self.row_fetcher = row_fetcher
+        self.pk_columns = dict(pk_columns or {})
+        self.table_columns = dict(table_columns or {})
+        # 展示时回表取得的整行：{(db_id, 表名): 按_pk索引的DataFrame}，总行数不超过max_fetched_rows
+        self._fetched = OrderedDict()
+
+    @classmethod
+    def from_frames(cls, keyword, frames, pk_columns=None, hits=None, row_fetcher=None, table_order=None,
+                    table_columns=None):
+        """
+        由各表整行结果构建（可同时并入批量检索返回的窄命中）
+        :param frames: [DataFrame] - 每个DataFrame为单张表的结果（含来源列），按数据库、表顺序排列
+        :param hits: 批量检索返回的窄命中（HIT_COLUMNS），整行需回表
+        :param table_order: [(db_id, 表名)] - 同时有整行和窄命中时命中的排列顺序
+        :param table_columns: {(db_id, 表名): 整行的列}，需回表的表导出时使用
+        """
+        pk_columns = dict(pk_columns or {})
+        table_frames, hit_frames = {}, []
+        for df in frames:
+            if df is None or df.empty:
+                continue
+            key = (df["_db_id"].iat[0], df["_table"].iat[0])
+            df = df.reset_index(drop=True)
+            table_frames[key] = df
+            hit_frames.append(build_table_hits(df, keyword, pk_columns.get(key)))
+        if hits is not None and not hits.empty:
+            hits = hits.assign(_row=-1, _score=score_hits(hits["_snippet"], keyword))
+            hit_frames.append(hits[RESULT_HIT_COLUMNS])
+        if not hit_frames:
+            return cls(keyword, None, table_frames, row_fetcher, pk_columns, table_columns)
+
+        all_hits = pd.concat(hit_frames, ignore_index=True)
+        if table_order and len(hit_frames) > 1:
+            rank = {key: idx for idx, key in enumerate(table_order)}
+            order = [rank.get(key, len(rank)) for key in zip(all_hits["_db_id"], all_hits["_table"])]
+            all_hits = all_hits.iloc[pd.Series(order).argsort(kind="stable").values]
+        return cls(keyword, all_hits, table_frames, row_fetcher, pk_columns, table_columns)
+
+    def __len__(self):
+        return len(self.hits)
+
+    @property
+    def empty(self):
+        return self.hits.empty
+
+    @property
+    def db_count(self):
+        """涉及的数据库数"""
+        return self.hits["_db_id"].nunique()
+
+    def get_page(self, page_no, page_size):
+        """取一页窄命中"""
+        start = (page_no - 1) * page_size
+        return self.hits.iloc[start:start + page_size]
+
+    def memory_usage(self):
+        """结果占用内存（字节）：窄命中表+已取回的整行"""
+        frames = list(self.frames.values()) + list(self._fetched.values())
+        return int(self.hits.memory_usage(index=True, deep=True).sum()
+                   + sum(df.memory_usage(index=True, deep=True).sum() for df in frames))
+
+    def _fetch_rows(self, key, hits, cache=True):
+        """
+        按主键回表取整行（已缓存的主键不再重复读取）
+        :param cache: 为False时新取回的行不进入缓存（导出逐批读取全部命中，不能都留在内存里）
+        :return: 按_pk索引的DataFrame（无法回表时为None）
+        """
+        pk_columns = self.pk_columns.get(key)
+        if not self.row_fetcher or not pk_columns:
+            return None
+        cached = self._fetched.get(key)
+        missing = hits if cached is None else hits[~hits["_pk"].isin(cached.index)]
+        if missing.empty:
+            return cached
+        parts = [] if cached is None else [cached]
+        for fetched_key, df in self.row_fetcher(missing).items():
+            if fetched_key != key or df.empty:
+                continue
+            parts.append(df.set_index(pd.Index(
+                [format_pk(row) for row in df[list(pk_columns)].itertuples(index=False, name=None)], name="_pk"
+            )))
+        if not parts:
+            return None
+        rows = pd.concat(parts) if len(parts) > 1 else parts[0]
+        rows = rows[~rows.index.duplicated(keep="last")]
+        if cache:
+            self._store_fetched(key, rows)
+        return rows
+
+    def _store_fetched(self, key, rows):
+        """缓存回表取得的整行：总行数超过max_fetched_rows时淘汰最早取回的表（单表超出时只保留最近的行）"""
+        limit = BATCH_SEARCH_CONFIG["max_fetched_rows"]
+        self._fetched[key] = rows.iloc[-limit:] if len(rows) > limit else rows
+        self._fetched.move_to_end(key)
+        total = sum(len(df) for df in self._fetched.values())
+        while total > limit and len(self._fetched) > 1:
+            _, evicted = self._fetched.popitem(last=False)
+            total -= len(evicted)
+
+    def get_rows(self, hits=None, cache=True):
+        """
+        取命中对应的整行（默认全部命中），每张表一个DataFrame
+        :param cache: 为False时回表取得的整行不进入缓存（导出用）
+        :return: {(db_id, 表名): DataFrame}，按命中的首次出现顺序排列
+        """
+        hits = self.hits if hits is None else hits
+        rows = {}
+        for (db_id, table), group in hits.groupby(["_db_id", "_table"], sort=False, observed=True):
+            key = (db_id, table)
+            local = group[group["_row"] >= 0]
+            parts = []
+            if not local.empty and key in self.frames:
+                parts.append(self.frames[key].iloc[local["_row"].values])
+            remote = group[group["_row"] < 0]
+            if not remote.empty:
+                fetched = self._fetch_rows(key, remote, cache)
+                if fetched is not None:
+                    parts.append(fetched.reindex(remote["_pk"]).dropna(how="all").reset_index(drop=True))
+            if parts:
+                rows[key] = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+        return rows
+
+    def iter_table_rows(self, chunk_size=1000):
+        """
+        按表依次生成全部命中的整行（导出用）：每次只取回一张表的一批，回表取得的行不进入缓存，
+        内存不随表数量和命中条数增长
+        :return: 生成器((db_id, 表名), DataFrame)
+        """
+        for key, batches in self.iter_tables(chunk_size):
+            for df in batches:
+                yield (key, df)
+
+    def iter_tables(self, chunk_size=1000):
+        """
+        按表生成该表整行批次的生成器（导出用）：批次在迭代到时才回表读取，回表取得的行不进入缓存
+        :return: 生成器((db_id, 表名), DataFrame生成器)
+        """
+        for key, group in self.hits.groupby(["_db_id", "_table"], sort=False, observed=True):
+            yield (key, self._iter_group_rows(key, group, chunk_size))
+
+    def _iter_group_rows(self, key, group, chunk_size):
+        """逐批取单张表命中的整行"""
+        for start in range(0, len(group), chunk_size):
+            chunk_rows = self.get_rows(group.iloc[start:start + chunk_size], cache=False)
+            if key in chunk_rows:
+                yield chunk_rows[key]
+
+    def get_columns(self):
+        """
+        导出用的列顺序：各表列按首次出现顺序合并
+        已取回整行的表取结果中的列，需回表的表取列目录中的列（不为确定列而预先读取整行）
+        """
+        columns = []
+        for key, group in self.hits.groupby(["_db_id", "_table"], sort=False, observed=True):
+            if key in self.frames:
+                table_columns = list(self.frames[key].columns)
+            elif key in self.table_columns:
+                table_columns = self.table_columns[key]
+            else:
+                # 列目录中没有该表（极少见）：只取回一行确定列
+                table_columns = list(next(iter(self.get_rows(group.iloc[:1], cache=False).values()),
+                                          pd.DataFrame()).columns)
+            columns.extend(col for col in table_columns if col not in columns)
+        return columns
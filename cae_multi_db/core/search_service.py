@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 进程级检索服务
+数据库配置（含表元信息）、列目录、连接池、结果缓存、影子索引在进程内只有一份，所有浏览器会话共享：
+某个会话加载过的表元信息，其他会话直接可见，不再各自重复加载。
+每个会话只持有一个轻量的会话句柄（本会话的数据库凭据+共享配置的引用），凭据不在会话之间共享。
+界面通过st.cache_resource持有服务实例，命令行等非界面场景可直接使用普通字典作为会话
+"""
+import copy
+import threading
+
+from cae_multi_db.adapters.conn_pool import close_pools
+from cae_multi_db.config.db_config import SHADOW_INDEX_CONFIG
+from cae_multi_db.config.user_config import init_dynamic_dbs, init_user_auth
+from cae_multi_db.core.auth_manager import DBAuthManager
+from cae_multi_db.core.catalog_store import get_catalog_store
+from cae_multi_db.core.change_sync import get_change_sync
+from cae_multi_db.core.result_cache import get_result_cache
+from cae_multi_db.core.schema_catalog import get_schema_catalog, make_catalog_key
+from cae_multi_db.core.search_engine import CAESearchEngine
+from cae_multi_db.core.search_stats import get_search_stats_store
+from cae_multi_db.core.shadow_index import get_shadow_index
+
+
+class ConfigStore:
+    """
+    共享的数据库配置（线程安全）：dynamic_dbs的所有读写都应在lock内进行（user_config中的函数会自动加锁）
+    未传入dynamic_dbs（界面）时从本地持久化目录恢复上次的配置和表元信息，修改后增量写回；
+    传入dynamic_dbs（命令行、HTTP接口按配置文件构建）时不读写本地目录
+    """
+
+    def __init__(self, dynamic_dbs=None):
+        self.lock = threading.RLock()
+        self.catalog_store = get_catalog_store() if dynamic_dbs is None else None
+        self.persistent = self.catalog_store is not None
+        if dynamic_dbs is None:
+            restored = self._restore()
+            dynamic_dbs = init_dynamic_dbs() if restored is None else restored
+        self.dynamic_dbs = dynamic_dbs
+
+    def _restore(self):
+        """从本地持久化目录读取配置（未保存过或读取失败时返回None）"""
+        if self.catalog_store is None:
+            return None
+        try:
+            return self.catalog_store.load_dbs()
+        except Exception as e:
+            print(f"读取本地持久化配置失败，使用默认配置：{str(e)}")
+            return None
+
+    def persist(self, db_id=None):
+        """把配置的变化增量写入本地持久化目录（db_id不为None时只比较该库的定义和表元信息）"""
+        if not self.persistent:
+            return
+        with self.lock:
+            try:
+                self.catalog_store.save_dbs(self.dynamic_dbs, db_id)
+            except Exception as e:
+                print(f"写入本地持久化配置失败：{str(e)}")
+
+    def snapshot(self):
+        """数据库配置的深拷贝（界面渲染用，渲染过程中其他会话修改配置不受影响）"""
+        with self.lock:
+            return copy.deepcopy(self.dynamic_dbs)
+
+
+class SessionHandle:
+    """
+    会话句柄：按字典方式访问，与原先的Streamlit会话状态结构一致，可直接传给user_config中的函数、
+    CAESearchEngine和DBAuthManager
+    "dynamic_dbs" - 共享配置（所有会话同一份）；其余键（"user_auth"凭据、"use_shadow_index"等检索选项）只属于本会话
+    """
+
+    def __init__(self, store, user_auth=None):
+        self.store = store
+        self._values = {
+            "user_auth": init_user_auth(store.snapshot()) if user_auth is None else user_auth,
+            "use_shadow_index": SHADOW_INDEX_CONFIG["enabled"]
+        }
+        self._active_engine = None  # 本会话正在执行检索的引擎（新检索开始时取消它）
+
+    @property
+    def lock(self):
+        return self.store.lock
+
+    def __getitem__(self, key):
+        if key == "dynamic_dbs":
+            return self.store.dynamic_dbs
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        if key == "dynamic_dbs":
+            self.store.dynamic_dbs = value
+        else:
+            self._values[key] = value
+
+    def __contains__(self, key):
+        return key == "dynamic_dbs" or key in self._values
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def list_dbs(self):
+        """共享数据库配置的快照（界面渲染用）"""
+        return self.store.snapshot()
+
+    def persist(self, db_id=None):
+        """共享配置修改后写入本地持久化目录（由user_config中的函数调用）"""
+        self.store.persist(db_id)
+
+    def supersede(self, engine):
+        """本会话开始新检索：取消上一次仍在执行的检索（终止其在途语句），并登记新的检索引擎"""
+        with self.store.lock:
+            previous, self._active_engine = self._active_engine, engine
+        if previous is not None and previous is not engine:
+            previous.cancel()
+
+
+class SearchService:
+    """进程级检索服务：持有共享配置，并引用进程内唯一的列目录、结果缓存、影子索引、增量同步和检索统计"""
+
+    def __init__(self, dynamic_dbs=None):
+        self.store = ConfigStore(dynamic_dbs)
+        self.catalog = get_schema_catalog()
+        self.result_cache = get_result_cache()
+        self.shadow_index = get_shadow_index()
+        self.change_sync = get_change_sync()
+        self.search_stats = get_search_stats_store()
+
+    def open_session(self, user_auth=None):
+        """为新的浏览器会话创建会话句柄（user_auth为None时凭据为空，需在本会话中验证）"""
+        return SessionHandle(self.store, user_auth)
+
+    def create_engine(self, session, **kwargs):
+        """创建绑定到会话句柄的检索引擎（引擎本身很轻，只记录本次检索的统计和结果）"""
+        return CAESearchEngine(session, **kwargs)
+
+    def create_auth_manager(self, session):
+        """创建绑定到会话句柄的权限验证管理器"""
+        return DBAuthManager(session)
+
+    def close(self):
+        """关闭全部连接池（进程退出或服务被清除时调用）"""
+        close_pools()
+
+
+def prepare_databases(session, credentials, engine=None):
+    """
+    非界面场景（命令行、HTTP接口）启动时验证各库权限、补全表列表并加载列目录（列类型/主键用于类型化检索条件）
+    :param session: build_session_from_config返回的会话（或会话句柄）
+    :param credentials: {db_id: (用户名, 密码, 端口)}
+    :return: 验证通过的库数
+    """
+    engine = engine or CAESearchEngine(session)
+    auth_manager = DBAuthManager(session)
+    verified = 0
+    for db in session["dynamic_dbs"]:
+        user, password, port = credentials[db["db_id"]]
+        ok, msg = auth_manager.verify_db_auth(db["db_id"], user, password, port)
+        if not ok:
+            print(f"❌ 数据库{db['db_alias']}验证失败，已跳过：{msg}")
+            continue
+        adapter_class = engine.adapter_map.get(db["db_type"])
+        adapter = adapter_class(db["db_id"], db, session["user_auth"][db["db_id"]])
+        try:
+            if not db["table_meta"]:
+                db["table_meta"] = {table: {"columns": [], "enable_search": True}
+                                    for table in adapter.get_all_tables()}
+            get_schema_catalog().refresh(make_catalog_key(db["db_id"], db), adapter)
+        finally:
+            adapter.close()
+        verified += 1
+        print(f"✅ 数据库{db['db_alias']}：{len(db['table_meta'])}张表")
+    return verified
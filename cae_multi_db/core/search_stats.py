@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 检索统计（进程级共享）
+累计每张表的检索次数、全表扫描次数和耗时，供索引建议等功能使用；
+统计写入本地持久化目录，重启后继续累计
+"""
+import threading
+import time
+from cae_multi_db.core.catalog_store import get_catalog_store
+
+
+class SearchStatsStore:
+    """按(db_id, 表名)累计检索统计（线程安全）"""
+
+    def __init__(self, catalog_store=None):
+        self._lock = threading.Lock()
+        self._catalog_store = catalog_store
+        self._tables = {}
+        if catalog_store is not None:
+            try:
+                self._tables = catalog_store.load_stats()
+            except Exception as e:
+                print(f"读取本地检索统计失败：{str(e)}")
+
+    def record(self, table_stats):
+        """
+        记录一次检索的各表统计
+        :param table_stats: CAESearchEngine.last_search_stats格式的列表
+        """
+        now = time.time()
+        changed = {}
+        with self._lock:
+            for stat in table_stats:
+                entry = self._tables.setdefault((stat["db_id"], stat["table"]), {
+                    "searches": 0, "scans": 0, "scan_time": 0.0,
+                    "last_path": None, "last_elapsed": 0.0, "last_searched_at": None
+                })
+                entry["searches"] += 1
+                if stat["path"] == "scan":
+                    entry["scans"] += 1
+                    entry["scan_time"] += stat["elapsed"]
+                entry["last_path"] = stat["path"]
+                entry["last_elapsed"] = stat["elapsed"]
+                entry["last_searched_at"] = now
+                changed[(stat["db_id"], stat["table"])] = dict(entry)
+        self._save(changed)
+
+    def _save(self, changed):
+        """把本次变化的统计写入本地持久化目录"""
+        if self._catalog_store is None or not changed:
+            return
+        try:
+            self._catalog_store.save_stats(changed)
+        except Exception as e:
+            print(f"写入本地检索统计失败：{str(e)}")
+
+    def get_db_stats(self, db_id):
+        """获取某库所有表的累计统计：{table: {...}}（副本）"""
+        with self._lock:
+            return {table: dict(entry) for (entry_db, table), entry in self._tables.items() if entry_db == db_id}
+
+    def clear(self, db_id=None):
+        """清除统计（db_id为None时清除全部）"""
+        with self._lock:
+            if db_id is None:
+                self._tables.clear()
+            else:
+                self._tables = {k: v for k, v in self._tables.items() if k[0] != db_id}
+        if self._catalog_store is not None:
+            try:
+                self._catalog_store.delete_stats(db_id)
+            except Exception as e:
+                print(f"删除本地检索统计失败：{str(e)}")
+
+
+# 进程级单例（跨Streamlit重跑与会话共享，首次使用时读取本地持久化的统计）
+_SEARCH_STATS_STORE = None
+_SEARCH_STATS_STORE_LOCK = threading.Lock()
+
+
+def get_search_stats_store():
+    """获取进程级检索统计"""
+    global _SEARCH_STATS_STORE
+    with _SEARCH_STATS_STORE_LOCK:
+        if _SEARCH_STATS_STORE is None:
+            _SEARCH_STATS_STORE = SearchStatsStore(get_catalog_store())
+        return _SEARCH_STATS_STORE
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 本地影子索引（SQLite倒排索引，进程级共享）
+把启用表逐行爬取为倒排表：postings(分词 -> 文档)，docs(文档 -> db_id/表/主键)，
+检索时先在本地求候选主键，再按主键回源数据库取回命中行，避免每次全表扫描生产库
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from cae_multi_db.adapters.base_adapter import GENERATED_SEARCH_COLUMNS
+from cae_multi_db.config.db_config import SHADOW_INDEX_CONFIG
+from cae_multi_db.utils.text_utils import tokenize_for_index, tokenize_keyword
+
+
+def _row_text(row, text_positions):
+    """拼接一行中可检索的值（跳过空值和二进制）"""
+    return " ".join(
+        str(row[i]) for i in text_positions
+        if row[i] is not None and not isinstance(row[i], (bytes, bytearray, memoryview))
+    )
+
+
+def encode_pk(values):
+    """主键值编码为JSON文本（日期、Decimal等转为字符串）"""
+    return json.dumps(list(values), ensure_ascii=False, default=str)
+
+
+class ShadowIndex:
+    """本地影子索引（读操作可并发，写操作串行）"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or SHADOW_INDEX_CONFIG["db_path"]
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._crawling = set()
+        self._state_lock = threading.Lock()
+        self._init_schema()
+
+    def _connect(self):
+        """每次操作使用独立的SQLite连接（sqlite3连接不能跨线程共享）"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self):
+        """建表（WAL模式下读写互不阻塞）"""
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    doc_id INTEGER PRIMARY KEY,
+                    db_id TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    pk TEXT NOT NULL,
+                    UNIQUE (db_id, table_name, pk)
+                );
+                CREATE TABLE IF NOT EXISTS postings (
+                    token TEXT NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    PRIMARY KEY (token, doc_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc_id);
+                CREATE TABLE IF NOT EXISTS table_state (
+                    db_id TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    pk_columns TEXT,
+                    columns TEXT,
+                    doc_count INTEGER DEFAULT 0,
+                    crawled_at REAL,
+                    status TEXT,
+                    message TEXT,
+                    PRIMARY KEY (db_id, table_name)
+                );
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    db_id TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    strategy TEXT,
+                    sync_column TEXT,
+                    watermark TEXT,
+                    watermark_pks TEXT,
+                    checksums TEXT,
+                    synced_at REAL,
+                    last_changes INTEGER DEFAULT 0,
+                    message TEXT,
+                    PRIMARY KEY (db_id, table_name)
+                );
+            """)
+            # 旧版本建立的sync_state没有watermark_pks列
+            sync_columns = {row[1] for row in conn.execute("PRAGMA table_info(sync_state)")}
+            if "watermark_pks" not in sync_columns:
+                conn.execute("ALTER TABLE sync_state ADD COLUMN watermark_pks TEXT")
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ====================== 写入 ======================
+    @staticmethod
+    def _upsert_doc(cursor, db_id, table_name, pk_json, tokens):
+        """写入/更新一个文档及其分词（已存在时先清除旧分词）"""
+        cursor.execute("SELECT doc_id FROM docs WHERE db_id = ? AND table_name = ? AND pk = ?",
+                       (db_id, table_name, pk_json))
+        found = cursor.fetchone()
+        if found:
+            doc_id = found[0]
+            cursor.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        else:
+            cursor.execute("INSERT INTO docs (db_id, table_name, pk) VALUES (?, ?, ?)", (db_id, table_name, pk_json))
+            doc_id = cursor.lastrowid
+        cursor.executemany("INSERT OR IGNORE INTO postings (token, doc_id) VALUES (?, ?)",
+                           [(token, doc_id) for token in tokens])
+
+    @staticmethod
+    def _delete_doc(cursor, db_id, table_name, pk_json):
+        """删除一个文档及其分词"""
+        cursor.execute("SELECT doc_id FROM docs WHERE db_id = ? AND table_name = ? AND pk = ?",
+                       (db_id, table_name, pk_json))
+        found = cursor.fetchone()
+        if found:
+            cursor.execute("DELETE FROM postings WHERE doc_id = ?", (found[0],))
+            cursor.execute("DELETE FROM docs WHERE doc_id = ?", (found[0],))
+
+    def _set_state(self, conn, db_id, table_name, status, message="", pk_columns=None, columns=None,
+                   doc_count=None, crawled_at=None):
+        """更新表的索引状态（未传入的字段保持原值）"""
+        conn.execute("""
+            INSERT INTO table_state (db_id, table_name, status, message) VALUES (?, ?, ?, ?)
+            ON CONFLICT (db_id, table_name) DO UPDATE SET status = excluded.status, message = excluded.message
+        """, (db_id, table_name, status, message))
+        updates = {"pk_columns": json.dumps(pk_columns) if pk_columns is not None else None,
+                   "columns": json.dumps(columns) if columns is not None else None,
+                   "doc_count": doc_count, "crawled_at": crawled_at}
+        for field, value in updates.items():
+            if value is not None:
+                conn.execute(f"UPDATE table_state SET {field} = ? WHERE db_id = ? AND table_name = ?",
+                             (value, db_id, table_name))
+        conn.commit()
+
+    def index_rows(self, db_id, table_name, columns, pk_columns, rows, deleted_pks=()):
+        """
+        增量写入：按主键更新一批行并删除已删除的行（供增量同步使用）
+        :param rows: 与columns对应的元组列表
+        :param deleted_pks: 已删除行的主键值元组列表
+        """
+        pk_positions = [columns.index(col) for col in pk_columns]
+        text_positions = [i for i, col in enumerate(columns) if col not in GENERATED_SEARCH_COLUMNS]
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                for row in rows:
+                    pk_json = encode_pk(row[i] for i in pk_positions)
+                    self._upsert_doc(cursor, db_id, table_name, pk_json, tokenize_for_index(_row_text(row, text_positions)))
+                for pk_values in deleted_pks:
+                    self._delete_doc(cursor, db_id, table_name, encode_pk(pk_values))
+                conn.execute("""
+                    UPDATE table_state
+                    SET doc_count = (SELECT COUNT(*) FROM docs WHERE db_id = ? AND table_name = ?)
+                    WHERE db_id = ? AND table_name = ?
+                """, (db_id, table_name, db_id, table_name))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def crawl_table(self, adapter, db_id, table_name, schema, batch_size=None, baseline_fn=None):
+        """
+        全量爬取单表（先清空该表旧索引，再用服务端游标分批读取写入）
+        :param schema: 列目录中的表结构（需包含primary_key）
+        :param baseline_fn: 可选，baseline_fn(adapter, table_name, schema)在爬取前记录增量同步基线（水位/校验和），
+                            爬取成功后写入sync_state，爬取期间的变更由下次同步补齐
+        :return: (bool, msg)
+        """
+        batch_size = batch_size or SHADOW_INDEX_CONFIG["crawl_batch_size"]
+        pk_columns = list(schema.get("primary_key") or [])
+        columns = [col for col in schema.get("columns", []) if col not in GENERATED_SEARCH_COLUMNS]
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                if not pk_columns:
+                    self._set_state(conn, db_id, table_name, "no_pk", "表没有主键，无法按主键回表")
+                    return (False, f"{table_name}没有主键，跳过")
+                self._set_state(conn, db_id, table_name, "crawling")
+                conn.execute("DELETE FROM sync_state WHERE db_id = ? AND table_name = ?", (db_id, table_name))
+                baseline = baseline_fn(adapter, table_name, schema) if baseline_fn else None
+                conn.execute("""
+                    DELETE FROM postings WHERE doc_id IN
+                        (SELECT doc_id FROM docs WHERE db_id = ? AND table_name = ?)
+                """, (db_id, table_name))
+                conn.execute("DELETE FROM docs WHERE db_id = ? AND table_name = ?", (db_id, table_name))
+                conn.commit()
+
+                pk_positions = [columns.index(col) for col in pk_columns]
+                text_positions = list(range(len(columns)))
+                doc_count = 0
+                cursor = conn.cursor()
+                for rows in adapter.iter_table_rows(table_name, columns, batch_size):
+                    for row in rows:
+                        pk_json = encode_pk(row[i] for i in pk_positions)
+                        self._upsert_doc(cursor, db_id, table_name, pk_json,
+                                         tokenize_for_index(_row_text(row, text_positions)))
+                    doc_count += len(rows)
+                    conn.commit()
+                self._set_state(conn, db_id, table_name, "ready", "", pk_columns, columns, doc_count, time.time())
+                if baseline:
+                    self._write_sync_state(conn, db_id, table_name, **baseline)
+                return (True, f"{table_name}已索引{doc_count}行")
+            except Exception as e:
+                conn.rollback()
+                self._set_state(conn, db_id, table_name, "error", str(e))
+                return (False, f"{table_name}爬取失败：{str(e)}")
+            finally:
+                conn.close()
+
+    def crawl_tables_async(self, adapter_factory, db_id, tables, catalog_tables, baseline_fn=None):
+        """
+        后台爬取多张表（同一个库同时只有一个爬取任务）
+        :param adapter_factory: 无参函数，返回新的适配器实例
+        :param baseline_fn: 见crawl_table
+        :return: bool - 是否已启动
+        """
+        with self._state_lock:
+            if db_id in self._crawling:
+                return False
+            self._crawling.add(db_id)
+
+        def task():
+            adapter = adapter_factory()
+            try:
+                for table_name in tables:
+                    schema = (catalog_tables or {}).get(table_name)
+                    if schema:
+                        is_ok, msg = self.crawl_table(adapter, db_id, table_name, schema, baseline_fn=baseline_fn)
+                        print(msg)
+            finally:
+                adapter.close()
+                with self._state_lock:
+                    self._crawling.discard(db_id)
+
+        threading.Thread(target=task, name=f"cae_shadow_{db_id}", daemon=True).start()
+        return True
+
+    @staticmethod
+    def _write_sync_state(conn, db_id, table_name, strategy, sync_column=None, watermark=None, watermark_pks=None,
+                          checksums=None, synced_at=None, last_changes=0, message=""):
+        """写入单表增量同步状态（水位、水位上的行主键、分块校验和等整体覆盖）"""
+        conn.execute("""
+            INSERT OR REPLACE INTO sync_state
+                (db_id, table_name, strategy, sync_column, watermark, watermark_pks, checksums,
+                 synced_at, last_changes, message)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (db_id, table_name, strategy, sync_column,
+              json.dumps(watermark, ensure_ascii=False, default=str) if watermark is not None else None,
+              json.dumps(list(watermark_pks), ensure_ascii=False) if watermark_pks else None,
+              json.dumps(checksums) if checksums is not None else None,
+              synced_at or time.time(), last_changes, message))
+        conn.commit()
+
+    def set_sync_state(self, db_id, table_name, **sync_state):
+        """保存单表增量同步状态（字段见_write_sync_state）"""
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                self._write_sync_state(conn, db_id, table_name, **sync_state)
+            finally:
+                conn.close()
+
+    def is_crawling(self, db_id):
+        """该库是否正在后台爬取"""
+        with self._state_lock:
+            return db_id in self._crawling
+
+    def drop_db(self, db_id):
+        """删除某库的全部索引"""
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM postings WHERE doc_id IN (SELECT doc_id FROM docs WHERE db_id = ?)", (db_id,))
+                conn.execute("DELETE FROM docs WHERE db_id = ?", (db_id,))
+                conn.execute("DELETE FROM table_state WHERE db_id = ?", (db_id,))
+                conn.execute("DELETE FROM sync_state WHERE db_id = ?", (db_id,))
+                conn.commit()
+            finally:
+                conn.close()
+
+    # ====================== 读取 ======================
+    def get_table_states(self, db_id):
+        """获取某库各表的索引状态：{table: {"status", "message", "pk_columns", "columns", "doc_count", "crawled_at"}}"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT table_name, status, message, pk_columns, columns, doc_count, crawled_at
+                FROM table_state WHERE db_id = ?
+            """, (db_id,)).fetchall()
+        finally:
+            conn.close()
+        return {
+            row[0]: {
+                "status": row[1], "message": row[2],
+                "pk_columns": json.loads(row[3]) if row[3] else [],
+                "columns": json.loads(row[4]) if row[4] else [],
+                "doc_count": row[5] or 0, "crawled_at": row[6]
+            }
+            for row in rows
+        }
+
+    def get_sync_states(self, db_id):
+        """
+        获取某库各表的增量同步状态：
+        {table: {"strategy", "sync_column", "watermark", "watermark_pks", "checksums", "synced_at", ...}}
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT table_name, strategy, sync_column, watermark, watermark_pks, checksums,
+                       synced_at, last_changes, message
+                FROM sync_state WHERE db_id = ?
+            """, (db_id,)).fetchall()
+        finally:
+            conn.close()
+        return {
+            row[0]: {
+                "strategy": row[1], "sync_column": row[2],
+                "watermark": json.loads(row[3]) if row[3] else None,
+                "watermark_pks": json.loads(row[4]) if row[4] else [],
+                "checksums": json.loads(row[5]) if row[5] else {},
+                "synced_at": row[6], "last_changes": row[7] or 0, "message": row[8] or ""
+            }
+            for row in rows
+        }
+
+    def get_table_pks(self, db_id, table_name):
+        """获取单表已索引的全部主键（JSON编码文本的集合）"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT pk FROM docs WHERE db_id = ? AND table_name = ?", (db_id, table_name))
+            return {row[0] for row in rows}
+        finally:
+            conn.close()
+
+    def search(self, keyword, db_id, tables, max_candidates=None):
+        """
+        在本地索引中查找候选行
+        :return: {table: {"pk_columns", "columns", "pks": [主键值元组]}}（只包含已就绪且候选未超限的表）；
+                 关键词无法由索引回答（如单个汉字）时返回None
+        """
+        tokens = sorted(tokenize_keyword(keyword))
+        if not tokens:
+            return None
+        max_candidates = max_candidates or SHADOW_INDEX_CONFIG["max_candidates"]
+        states = self.get_table_states(db_id)
+        ready_tables = [t for t in tables if states.get(t, {}).get("status") == "ready"]
+        if not ready_tables:
+            return {}
+
+        conn = self._connect()
+        try:
+            intersect_sql = " INTERSECT ".join(["SELECT doc_id FROM postings WHERE token = ?"] * len(tokens))
+            table_placeholders = ", ".join(["?"] * len(ready_tables))
+            rows = conn.execute(f"""
+                SELECT table_name, pk FROM docs
+                WHERE db_id = ? AND table_name IN ({table_placeholders}) AND doc_id IN ({intersect_sql})
+            """, [db_id, *ready_tables, *tokens]).fetchall()
+        finally:
+            conn.close()
+
+        result = {
+            table: {"pk_columns": states[table]["pk_columns"], "columns": states[table]["columns"], "pks": []}
+            for table in ready_tables
+        }
+        for table_name, pk_json in rows:
+            result[table_name]["pks"].append(tuple(json.loads(pk_json)))
+        # 候选过多的表回退到数据库检索
+        return {table: item for table, item in result.items() if len(item["pks"]) <= max_candidates}
+
+
+# 进程级单例（跨Streamlit重跑与会话共享）
+_SHADOW_INDEX = None
+_SHADOW_INDEX_LOCK = threading.Lock()
+
+
+def get_shadow_index():
+    """获取进程级影子索引（首次调用时创建本地索引文件）"""
+    global _SHADOW_INDEX
+    with _SHADOW_INDEX_LOCK:
+        if _SHADOW_INDEX is None:
+            _SHADOW_INDEX = ShadowIndex()
+        return _SHADOW_INDEX
@@ -5,77 +5,652 @@
 """
 import streamlit as st
 import pandas as pd
+import copy
+import os
 import time
-from cae_multi_db.core.auth_manager import DBAuthManager
-from cae_multi_db.core.search_engine import CAESearchEngine
-from cae_multi_db.config.db_config import DB_TYPE_TEMPLATES
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from cae_multi_db.core.search_service import SearchService
+from cae_multi_db.core.schema_catalog import get_schema_catalog, make_catalog_key
+from cae_multi_db.core.search_stats import get_search_stats_store
+from cae_multi_db.core.index_advisor import suggest_search_indexes, apply_search_index, rollback_search_index
+from cae_multi_db.core.shadow_index import get_shadow_index
+from cae_multi_db.core.change_sync import get_change_sync, capture_sync_baseline, SYNC_STRATEGY_LABELS
+from cae_multi_db.core.result_cache import get_result_cache
+from cae_multi_db.config.db_config import (
+    DB_TYPE_TEMPLATES, INDEX_ADVISOR_CONFIG, SHADOW_INDEX_CONFIG, SEARCH_DEADLINE_CONFIG, TABLE_BROWSER_CONFIG
+)
 from cae_multi_db.config.user_config import (
-    init_dynamic_dbs, init_user_auth, add_db_to_list, delete_db_from_list,
-    update_db_enable_search, update_table_enable_search, save_table_meta,
-    get_enabled_tables
+    add_db_to_list, delete_db_from_list,
+    update_db_enable_search, update_tables_enable_search, save_table_meta,
+    get_enabled_tables, update_table_search_index,
+    update_table_non_searchable_columns, get_db_info_by_id, get_db_auth_by_id
 )
 from cae_multi_db.adapters.mysql_adapter import MySQLAdapter
 from cae_multi_db.adapters.pg_adapter import PGAdapter
-from cae_multi_db.utils.export_utils import export_to_csv, export_to_excel
+from cae_multi_db.adapters.conn_pool import close_pools
+from cae_multi_db.adapters.circuit_breaker import get_circuit_breaker, remove_circuit_breaker, BREAKER_STATE_LABELS
+from cae_multi_db.adapters.base_adapter import SEARCH_PATH_LABELS
+from cae_multi_db.utils.export_utils import (
+    get_export_cache, get_result_export, get_result_formats, export_table_stream, EXPORT_FORMATS
+)
 from cae_multi_db.utils.log_utils import init_logger, add_log, clear_log
+from cae_multi_db.utils.text_utils import highlight_frame
+
+# ====================== 进程级检索服务（所有会话共享） ======================
+@st.cache_resource(show_spinner=False)
+def get_shared_search_service():
+    """进程内唯一的检索服务：数据库配置、列目录、连接池、结果缓存由所有浏览器会话共享"""
+    return SearchService()
+
+
+search_service = get_shared_search_service()
 
 # ====================== 初始化会话状态 ======================
-if "dynamic_dbs" not in st.session_state:
-    st.session_state.dynamic_dbs = init_dynamic_dbs()
-if "user_auth" not in st.session_state:
-    st.session_state.user_auth = init_user_auth()
+if "search_session" not in st.session_state:
+    # 会话只持有轻量句柄（本会话凭据+共享配置的引用）
+    st.session_state.search_session = search_service.open_session()
 if "logger" not in st.session_state:
     st.session_state.logger = init_logger()
 if "search_result" not in st.session_state:
-    st.session_state.search_result = pd.DataFrame()
+    st.session_state.search_result = None  # 检索结果（SearchResult：窄命中表+按表保存的整行）
 if "search_history" not in st.session_state:
     st.session_state.search_history = []
+if "search_stats" not in st.session_state:
+    st.session_state.search_stats = []
+if "use_shadow_index" not in st.session_state:
+    st.session_state.use_shadow_index = SHADOW_INDEX_CONFIG["enabled"]
+if "highlight_cache" not in st.session_state:
+    st.session_state.highlight_cache = {}  # 当前结果已高亮的页：{"result_id", "pages": {(页码, 每页条数): ...}}
+if "paged_search" not in st.session_state:
+    st.session_state.paged_search = None  # 分页检索会话（分页模式下替代search_result）
+if "table_previews" not in st.session_state:
+    # 本会话查看的表预览数据：{(db_id, 表名): 行列表}（按本会话凭据读取，不放入共享配置）
+    st.session_state.table_previews = {}
 
 # ====================== 初始化核心业务类 ======================
-auth_manager = DBAuthManager(st.session_state)
-search_engine = CAESearchEngine(st.session_state)
+search_session = st.session_state.search_session
+search_session["use_shadow_index"] = st.session_state.use_shadow_index  # 检索选项随本会话的开关
+auth_manager = search_service.create_auth_manager(search_session)
+search_engine = search_service.create_engine(search_session)
 logger = st.session_state.logger
 
 
 # ====================== 工具函数（读取表元信息） ======================
-def load_db_table_meta(db_id):
-    """加载数据库的表元信息（主线程执行，避免子线程访问SessionState）"""
-    db_info = None
-    for db in st.session_state.dynamic_dbs:
-        if db["db_id"] == db_id:
-            db_info = db
-            break
+def create_db_adapter(db_id):
+    """创建已验证数据库的适配器实例（主线程执行），返回(db_info, adapter)，不可用时adapter为None"""
+    db_info = get_db_info_by_id(search_session, db_id)
     if not db_info:
-        return
+        return (None, None)
 
-    user_auth = st.session_state.user_auth.get(db_id, {})
+    user_auth = get_db_auth_by_id(search_session, db_id) or {}
     if not user_auth.get("is_verified", False):
-        return
+        return (db_info, None)
 
-    # 创建适配器实例（主线程）
     adapter = None
     if db_info["db_type"] == "mysql":
         adapter = MySQLAdapter(db_id, db_info, user_auth)
     elif db_info["db_type"] == "postgresql":
         adapter = PGAdapter(db_id, db_info, user_auth)
+    return (db_info, adapter)
 
+
+def load_db_table_meta(db_id):
+    """
+    加载数据库的表元信息（主线程执行，避免子线程访问SessionState）：
+    用目录视图批量读取所有表的列、主键、估算行数和索引，预览数据在查看时才按需读取
+    """
+    # 创建适配器实例（主线程）
+    db_info, adapter = create_db_adapter(db_id)
     if not adapter:
         return
 
-    # 获取所有表名
-    tables = adapter.get_all_tables()
+    tables_meta = adapter.get_tables_meta()
+    old_meta = db_info.get("table_meta", {})
     table_meta = {}
-    for table in tables:
-        # 获取表元信息
-        meta = adapter.get_table_meta(table)
+    for table, meta in tables_meta.items():
         table_meta[table] = {
             "columns": meta["columns"],
-            "preview_data": meta["preview_data"],
-            "enable_search": True  # 默认启用表检索
+            "primary_key": meta["primary_key"],
+            "row_estimate": meta["row_estimate"],
+            "indexes": meta["indexes"],
+            "enable_search": old_meta.get(table, {}).get("enable_search", True)  # 新表默认启用检索，已有表保留设置
         }
-    # 保存元信息到SessionState
-    save_table_meta(st.session_state, db_id, table_meta)
-    adapter.close()
+        # 保留已创建的检索索引方案，便于回滚
+        if "search_index_ddl" in old_meta.get(table, {}):
+            table_meta[table]["search_index_ddl"] = old_meta[table]["search_index_ddl"]
+        # 保留仍然存在的不参与检索列
+        skip_columns = [col for col in old_meta.get(table, {}).get("non_searchable_columns", [])
+                        if col in meta["columns"]]
+        if skip_columns:
+            table_meta[table]["non_searchable_columns"] = skip_columns
+    # 保存元信息到共享配置（其他会话直接可见）
+    save_table_meta(search_session, db_id, table_meta)
+    # 元信息已重新加载，该库的缓存结果作废
+    get_result_cache().invalidate(db_id)
+    # 同步刷新列目录缓存（指纹+列类型），刷新结束后归还连接
+    get_schema_catalog().refresh(make_catalog_key(db_id, db_info), adapter, force=True)
+
+
+def load_table_previews(db_id, tables):
+    """并行读取指定表的预览数据并保存到本会话状态（其他会话的预览互不影响）"""
+    _, adapter = create_db_adapter(db_id)
+    if not adapter:
+        return
+    try:
+        previews = adapter.get_table_previews(tables)
+    finally:
+        adapter.close()
+    for table, rows in previews.items():
+        st.session_state.table_previews[(db_id, table)] = rows
+
+
+def log_shared_change(db_id, content):
+    """记录对共享配置（所有用户生效）的修改：注明操作账号，同时写入本会话日志和服务端控制台"""
+    user = (get_db_auth_by_id(search_session, db_id) or {}).get("user") or "未知账号"
+    content = f"{content}（操作账号：{user}，对所有用户生效）"
+    add_log(logger, content)
+    print(content)
+
+
+def filter_table_names(table_meta, keyword, status):
+    """
+    按关键词（匹配表名或列名，不区分大小写）和检索启用状态筛选表
+    :param status: "all" / "enabled" / "disabled"
+    :return: 符合条件的表名列表（保持表元信息中的顺序）
+    """
+    keyword = (keyword or "").strip().lower()
+    names = []
+    for table_name, meta in table_meta.items():
+        enabled = meta.get("enable_search", True)
+        if (status == "enabled" and not enabled) or (status == "disabled" and enabled):
+            continue
+        if keyword and keyword not in table_name.lower() \
+                and not any(keyword in col.lower() for col in meta["columns"]):
+            continue
+        names.append(table_name)
+    return names
+
+
+def render_table_detail(db_id, table_name, meta):
+    """渲染单张表的详情：列名、主键/索引、前5条数据预览（查看时才读取）、不参与检索的列"""
+    # 表名大写+加黑（核心修改②）
+    st.markdown(f"**{table_name.upper()}**")
+    # 列名：大写+加黑展示（核心修改②）
+    st.markdown(f"**列名：** {' | '.join([col.upper() for col in meta['columns']])}")
+    table_facts = []
+    if meta.get("row_estimate") is not None:
+        table_facts.append(f"约{meta['row_estimate']}行")
+    if meta.get("primary_key"):
+        table_facts.append(f"主键：{', '.join(meta['primary_key'])}")
+    if meta.get("indexes"):
+        table_facts.append("索引：" + "；".join(
+            f"{idx['name']}({', '.join(idx['columns'])})" for idx in meta["indexes"]))
+    if table_facts:
+        st.caption(" | ".join(table_facts))
+
+    # 前5条数据预览：查看时才读取，保存在本会话（去掉外层框、列名大写，核心修改②）
+    previews = st.session_state.table_previews
+    preview_key = (db_id, table_name)
+    show_preview = st.toggle("前5条数据预览", value=preview_key in previews,
+                             key=f"table_preview_{db_id}_{table_name}")
+    if show_preview and preview_key not in previews:
+        with st.spinner("读取预览数据..."):
+            load_table_previews(db_id, [table_name])
+    if show_preview:
+        preview_data = previews.get(preview_key)
+        if preview_data:
+            preview_df = pd.DataFrame(preview_data, columns=meta["columns"])
+            # 列名转为大写
+            preview_df.columns = [col.upper() for col in preview_df.columns]
+            # 展示数据：仅保留基础样式，移除额外框体（适配1.52.1版本）
+            st.dataframe(preview_df, use_container_width=True, hide_index=True)
+        elif preview_data is not None:
+            st.info("该表暂无数据")
+        else:
+            st.warning("预览数据读取失败，请查看控制台日志")
+
+    # 不参与检索的列（如大字段、二进制列），检索条件中整列跳过
+    skip_columns = st.multiselect(
+        "不参与检索的列",
+        options=meta["columns"],
+        default=meta.get("non_searchable_columns", []),
+        key=f"table_skip_cols_{db_id}_{table_name}",
+        help="选中的列仍会在结果中展示，但不参与关键词匹配；"
+             "二进制、JSON等类型的列会自动跳过"
+    )
+    if skip_columns != meta.get("non_searchable_columns", []):
+        update_table_non_searchable_columns(search_session, db_id, table_name, skip_columns)
+        log_shared_change(db_id, f"修改表{table_name}不参与检索的列：{', '.join(skip_columns) or '无'}")
+        get_result_cache().invalidate(db_id)
+        st.rerun()
+
+
+def render_table_browser(db):
+    """
+    渲染表结构浏览：按表名/列名和启用状态筛选、分页，只渲染当前页的表清单（一个表格控件），
+    表详情和预览数据只针对选中的一张表读取；支持对筛选结果批量启用/停用检索
+    """
+    db_id = db["db_id"]
+    table_meta = db.get("table_meta", {})
+    if not table_meta:
+        st.info("点击上方「测试连接」加载表元信息")
+        return
+
+    enabled_count = sum(1 for meta in table_meta.values() if meta.get("enable_search", True))
+    col_info, col_reload = st.columns([3, 1])
+    with col_info:
+        st.caption(f"共{len(table_meta)}张表，其中{enabled_count}张启用检索"
+                   "（检索启用状态为全局设置，修改对所有用户生效）")
+    with col_reload:
+        if st.button("🔄 重新加载表元信息", key=f"reload_meta_{db_id}",
+                     help="重新读取表、列、主键和索引（新增或修改表结构后使用）"):
+            with st.spinner("加载表元信息..."):
+                load_db_table_meta(db_id)
+            add_log(logger, f"重新加载数据库{db['db_alias']}的表元信息")
+            st.rerun()
+
+    # 筛选条件
+    col_kw, col_status, col_size = st.columns([3, 1, 1])
+    with col_kw:
+        keyword = st.text_input("筛选表", placeholder="按表名或列名筛选", key=f"browser_kw_{db_id}")
+    with col_status:
+        status = st.selectbox("检索状态", options=["all", "enabled", "disabled"],
+                              format_func=lambda x: {"all": "全部", "enabled": "已启用", "disabled": "未启用"}[x],
+                              key=f"browser_status_{db_id}")
+    with col_size:
+        page_size = st.selectbox("每页表数", options=TABLE_BROWSER_CONFIG["page_sizes"],
+                                 index=TABLE_BROWSER_CONFIG["page_sizes"].index(
+                                     TABLE_BROWSER_CONFIG["default_page_size"]),
+                                 key=f"browser_page_size_{db_id}")
+    names = filter_table_names(table_meta, keyword, status)
+    if not names:
+        st.info("没有符合筛选条件的表")
+        return
+
+    # 批量启用/停用（作用于全部筛选结果，不限当前页）
+    col_pages, col_enable, col_disable = st.columns([2, 1, 1])
+    with col_pages:
+        total_pages = max(1, (len(names) - 1) // page_size + 1)
+        page_no = st.number_input(f"页码（共{total_pages}页，{len(names)}张表）", min_value=1,
+                                  max_value=total_pages, value=1, key=f"browser_page_{db_id}")
+    with col_enable:
+        if st.button(f"启用筛选结果（{len(names)}张）", key=f"browser_enable_{db_id}", use_container_width=True):
+            update_tables_enable_search(search_session, db_id, names, True)
+            log_shared_change(db_id, f"数据库{db['db_alias']}批量启用{len(names)}张表的检索")
+            st.rerun()
+    with col_disable:
+        if st.button(f"停用筛选结果（{len(names)}张）", key=f"browser_disable_{db_id}", use_container_width=True):
+            update_tables_enable_search(search_session, db_id, names, False)
+            log_shared_change(db_id, f"数据库{db['db_alias']}批量停用{len(names)}张表的检索")
+            st.rerun()
+    page_no = min(int(page_no), total_pages)
+    page_names = names[(page_no - 1) * page_size:page_no * page_size]
+
+    # 当前页的表清单：一个可编辑表格（只有“检索”列可勾选），渲染成本只与每页表数有关
+    summary_len = TABLE_BROWSER_CONFIG["column_summary_len"]
+    rows = []
+    for table_name in page_names:
+        meta = table_meta[table_name]
+        columns_text = ", ".join(meta["columns"])
+        rows.append({
+            "检索": meta.get("enable_search", True),
+            "表名": table_name,
+            "列数": len(meta["columns"]),
+            "估算行数": meta.get("row_estimate"),
+            "主键": ", ".join(meta.get("primary_key") or []),
+            "列名": columns_text if len(columns_text) <= summary_len else columns_text[:summary_len] + "…"
+        })
+    # 控件键包含当前页的启用状态：状态变化（含批量操作、其他会话修改）后表格重建，不残留旧的勾选
+    flags = "".join("1" if row["检索"] else "0" for row in rows)
+    edited = st.data_editor(
+        pd.DataFrame(rows), hide_index=True, use_container_width=True,
+        disabled=["表名", "列数", "估算行数", "主键", "列名"],
+        column_config={"检索": st.column_config.CheckboxColumn("检索", help="全局设置：修改对所有用户生效")},
+        key=f"browser_editor_{db_id}_{page_no}_{page_size}_{status}_{keyword}_{flags}"
+    )
+    changed = [(row["表名"], bool(row["检索"])) for row in edited.to_dict("records")
+               if bool(row["检索"]) != table_meta[row["表名"]].get("enable_search", True)]
+    if changed:
+        for enable in (True, False):
+            tables = [table_name for table_name, value in changed if value == enable]
+            if tables:
+                update_tables_enable_search(search_session, db_id, tables, enable)
+                log_shared_change(db_id, f"数据库{db['db_alias']}{'启用' if enable else '停用'}表"
+                                         f"{', '.join(tables)}的检索")
+        st.rerun()
+
+    # 表详情：只渲染选中的一张表，切换时释放本会话之前读取的该库预览数据
+    detail_table = st.selectbox("查看表详情", options=[None] + page_names,
+                                format_func=lambda x: "（不查看）" if x is None else x.upper(),
+                                key=f"browser_detail_{db_id}")
+    last_key = f"browser_last_detail_{db_id}"
+    if st.session_state.get(last_key) != detail_table:
+        st.session_state[last_key] = detail_table
+        previews = st.session_state.table_previews
+        for key in [key for key in previews if key[0] == db_id and key[1] != detail_table]:
+            del previews[key]
+    if detail_table is not None:
+        render_table_detail(db_id, detail_table, table_meta[detail_table])
+
+
+def render_index_advisor(db):
+    """渲染检索索引建议：列出频繁全表扫描且无可用索引的表，确认DDL后执行，已创建的可回滚"""
+    db_id = db["db_id"]
+    table_meta = db.get("table_meta", {})
+    catalog_key = make_catalog_key(db_id, db)
+    catalog_tables = get_schema_catalog().get_tables(catalog_key)
+    if catalog_tables is None:
+        st.info("列目录尚未加载，点击上方「测试连接」后再查看建议")
+        return
+
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        show_all = st.checkbox("列出所有无可用索引的表", value=False, key=f"advisor_all_{db_id}",
+                               help=f"默认只列出累计检索≥{INDEX_ADVISOR_CONFIG['min_searches']}次且平均扫描"
+                                    f"≥{INDEX_ADVISOR_CONFIG['min_avg_scan_seconds']}秒的表")
+    with col2:
+        pg_kind = "trgm"
+        if db["db_type"] == "postgresql":
+            pg_kind = st.radio("PostgreSQL方案", options=["trgm", "tsvector"], horizontal=True,
+                               format_func=lambda x: ("trigram表达式索引" if x == "trgm"
+                                                     else "tsvector生成列（分词匹配，默认子串检索不使用）"),
+                               key=f"advisor_kind_{db_id}")
+    with col3:
+        pause_seconds = st.number_input("语句间暂停（秒）", min_value=0, max_value=600,
+                                        value=INDEX_ADVISOR_CONFIG["ddl_pause_seconds"],
+                                        key=f"advisor_pause_{db_id}")
+
+    db_stats = get_search_stats_store().get_db_stats(db_id)
+    proposals = suggest_search_indexes(db["db_type"], table_meta, catalog_tables, db_stats, show_all, pg_kind)
+    if not proposals:
+        st.caption("暂无需要建立检索索引的表")
+    for proposal in proposals:
+        table_name = proposal["table"]
+        st.markdown(f"**{table_name.upper()}** · 检索{proposal['searches']}次 · "
+                    f"平均扫描{proposal['avg_scan_seconds']}秒")
+        st.caption(proposal["description"])
+        st.code(";\n".join(proposal["ddl"]) + ";", language="sql")
+        confirmed = st.checkbox("我已确认以上DDL", key=f"advisor_confirm_{db_id}_{table_name}")
+        if st.button("执行", key=f"advisor_apply_{db_id}_{table_name}", disabled=not confirmed):
+            _, adapter = create_db_adapter(db_id)
+            with st.spinner(f"正在为{table_name}创建检索索引..."):
+                is_ok, msg = apply_search_index(adapter, proposal, pause_seconds)
+            add_log(logger, f"数据库{db['db_alias']}创建检索索引：{msg}")
+            if is_ok:
+                update_table_search_index(search_session, db_id, table_name, proposal)
+                _, adapter = create_db_adapter(db_id)
+                get_schema_catalog().refresh(catalog_key, adapter)
+                st.success(f"✅ {msg}")
+            else:
+                st.error(f"❌ {msg}")
+
+    # 已创建的检索索引（可回滚）
+    provisioned = [(t, m["search_index_ddl"]) for t, m in table_meta.items() if m.get("search_index_ddl")]
+    if provisioned:
+        st.markdown("**已创建的检索索引**")
+    for table_name, proposal in provisioned:
+        st.code(";\n".join(proposal["rollback"]) + ";", language="sql")
+        if st.button(f"回滚{table_name.upper()}的检索索引", key=f"advisor_rollback_{db_id}_{table_name}"):
+            _, adapter = create_db_adapter(db_id)
+            with st.spinner(f"正在回滚{table_name}的检索索引..."):
+                is_ok, msg = rollback_search_index(adapter, proposal)
+            add_log(logger, f"数据库{db['db_alias']}回滚检索索引：{msg}")
+            if is_ok:
+                update_table_search_index(search_session, db_id, table_name, None)
+                _, adapter = create_db_adapter(db_id)
+                get_schema_catalog().refresh(catalog_key, adapter)
+                st.success(f"✅ {msg}")
+                st.rerun()
+            else:
+                st.error(f"❌ {msg}")
+
+
+def format_lag(seconds):
+    """同步延迟格式化为易读文本"""
+    if seconds is None:
+        return "-"
+    if seconds < 60:
+        return f"{int(seconds)}秒"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}分钟"
+    return f"{seconds / 3600:.1f}小时"
+
+
+def render_shadow_index(db):
+    """渲染本地影子索引状态（含增量同步方式、水位与同步延迟），支持后台全量爬取和增量同步启用的表"""
+    db_id = db["db_id"]
+    shadow_index = get_shadow_index()
+    change_sync = get_change_sync()
+    catalog_tables = get_schema_catalog().get_tables(make_catalog_key(db_id, db))
+    if catalog_tables is None:
+        st.info("列目录尚未加载，点击上方「测试连接」后再建立影子索引")
+        return
+
+    enabled_tables = get_enabled_tables(search_session, db_id)
+    states = shadow_index.get_table_states(db_id)
+    sync_states = shadow_index.get_sync_states(db_id)
+    sync_lags = change_sync.get_sync_lag(db_id)
+    status_labels = {"ready": "✅ 就绪", "crawling": "⏳ 爬取中", "no_pk": "⚠️ 无主键", "error": "❌ 失败"}
+    if states:
+        rows = []
+        for table, state in states.items():
+            sync_state = sync_states.get(table, {})
+            rows.append({
+                "表名": table,
+                "状态": status_labels.get(state["status"], state["status"]),
+                "已索引行数": state["doc_count"],
+                "建立时间": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(state["crawled_at"]))
+                           if state["crawled_at"] else "-",
+                "同步方式": SYNC_STRATEGY_LABELS.get(sync_state.get("strategy"), "-"),
+                "水位": "-" if sync_state.get("watermark") is None else str(sync_state["watermark"]),
+                "同步延迟": format_lag(sync_lags.get(table)),
+                "上次变更行数": sync_state.get("last_changes", 0),
+                "说明": state["message"] or sync_state.get("message", "")
+            })
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    else:
+        st.caption("尚未建立影子索引")
+
+    db_info_copy = copy.deepcopy(db)
+    user_auth_copy = copy.deepcopy(search_session["user_auth"].get(db_id, {}))
+    adapter_class = MySQLAdapter if db["db_type"] == "mysql" else PGAdapter
+    if shadow_index.is_crawling(db_id):
+        st.info("⏳ 正在后台爬取，可稍后刷新页面查看进度")
+        return
+    if change_sync.is_syncing(db_id):
+        st.info("⏳ 正在后台增量同步，可稍后刷新页面查看进度")
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button(f"建立/重建影子索引（{len(enabled_tables)}张启用表）", key=f"shadow_crawl_{db_id}"):
+            shadow_index.crawl_tables_async(
+                lambda: adapter_class(db_id, db_info_copy, user_auth_copy), db_id, enabled_tables, catalog_tables,
+                baseline_fn=capture_sync_baseline
+            )
+            add_log(logger, f"数据库{db['db_alias']}开始后台建立影子索引，共{len(enabled_tables)}张表")
+            st.rerun()
+    with col2:
+        indexed_tables = [table for table in enabled_tables if states.get(table, {}).get("status") == "ready"]
+        if indexed_tables and st.button(f"增量同步（{len(indexed_tables)}张已索引表）", key=f"shadow_sync_{db_id}"):
+            change_sync.sync_tables_async(
+                lambda: adapter_class(db_id, db_info_copy, user_auth_copy), db_id, indexed_tables, catalog_tables
+            )
+            add_log(logger, f"数据库{db['db_alias']}开始后台增量同步影子索引，共{len(indexed_tables)}张表")
+            st.rerun()
+
+
+def render_paged_result(paged):
+    """渲染分页检索结果：翻页时才向数据库读取该页所需的行，总数由可取消的后台COUNT统计"""
+    page_no = st.session_state.get("paged_page_no", 1)
+    page_df = paged.get_page(page_no)
+
+    col1, col2, col3, col4 = st.columns([1, 1, 2, 2])
+    with col1:
+        if st.button("⬅️ 上一页", key="paged_prev", disabled=page_no <= 1, use_container_width=True):
+            st.session_state.paged_page_no = page_no - 1
+            st.rerun()
+    with col2:
+        if st.button("下一页 ➡️", key="paged_next", disabled=not paged.has_next_page(page_no),
+                     use_container_width=True):
+            st.session_state.paged_page_no = page_no + 1
+            st.rerun()
+    with col3:
+        count_status = paged.get_count_status()
+        if not paged.count_started:
+            if st.button("🔢 统计总数", key="paged_count", help="在后台对每张表执行COUNT，可随时取消"):
+                paged.start_count()
+                st.rerun()
+        elif count_status["cancelled"]:
+            st.caption(f"统计已取消（已统计{count_status['done']}/{count_status['tables']}张表，"
+                       f"共{count_status['total']}条）")
+        elif count_status["finished"]:
+            st.metric("总结果数", value=count_status["total"])
+        else:
+            st.caption(f"⏳ 统计中：{count_status['done']}/{count_status['tables']}张表，已统计{count_status['total']}条")
+            if st.button("取消统计", key="paged_count_cancel"):
+                paged.cancel_count()
+                st.rerun()
+    with col4:
+        st.caption(f"第{page_no}页（每页{paged.page_size}条），已从数据库读取{paged.loaded_rows()}条")
+
+    if page_df.empty:
+        st.info(f"❌ 未检索到包含「{paged.keyword}」的记录" if page_no == 1 else "没有更多结果")
+    else:
+        st.dataframe(page_df, use_container_width=True, hide_index=True)
+    st.caption("分页模式只读取当前翻到的页，如需导出全部结果请使用下方的流式导出")
+
+
+def get_highlighted_page(result, page_no, page_size, alias_map):
+    """
+    取一页高亮后的命中摘要和整行（只处理当前页，按(结果ID, 页码, 每页条数)缓存在会话中，翻回已看过的页不再重新计算）
+    :return: (命中摘要DataFrame, {(db_id, 表名): 整行DataFrame})
+    """
+    cache = st.session_state.highlight_cache
+    if cache.get("result_id") != result.result_id:
+        cache.clear()
+        cache["result_id"] = result.result_id
+        cache["pages"] = {}
+    page_key = (page_no, page_size)
+    if page_key not in cache["pages"]:
+        page_hits = result.get_page(page_no, page_size)
+        hits_df = highlight_frame(pd.DataFrame({
+            "数据库": page_hits["_db_id"].map(lambda db_id: alias_map.get(db_id, db_id)).astype(object),
+            "表名": page_hits["_table"].astype(object),
+            "主键": page_hits["_pk"],
+            "命中列": page_hits["_matched_column"].astype(object),
+            "命中摘要": page_hits["_snippet"],
+            "得分": page_hits["_score"]
+        }), result.keyword)
+        page_rows = {key: highlight_frame(df, result.keyword) for key, df in result.get_rows(page_hits).items()}
+        cache["pages"][page_key] = (hits_df, page_rows)
+    return cache["pages"][page_key]
+
+
+def render_search_result(result):
+    """
+    渲染检索结果（完整结果与批量命中模式共用）：当前页的命中摘要+按表分开的整行（每张表只显示自己的列），
+    批量命中模式下当前页的整行在首次显示时按主键回表
+    """
+    alias_map = {db["db_id"]: db["db_alias"] for db in search_session.list_dbs()}
+    # 结果概览
+    col_stats1, col_stats2, col_stats3 = st.columns(3)
+    with col_stats1:
+        st.metric("总结果数", value=len(result))
+    with col_stats2:
+        st.metric("涉及数据库数", value=result.db_count)
+    with col_stats3:
+        st.metric("耗时（秒）", value=st.session_state.search_history[-1]["cost"])
+
+    # 分页
+    page_size = st.slider("每页显示条数", 5, 50, 10, key="page_size")
+    total_pages = max(1, (len(result) - 1) // page_size + 1)
+    current_page = st.number_input("页码", 1, total_pages, 1, key="current_page")
+    start_idx = (current_page - 1) * page_size
+
+    hits_df, page_rows = get_highlighted_page(result, current_page, page_size, alias_map)
+    st.dataframe(hits_df, use_container_width=True, hide_index=True)
+    st.caption(f"显示第{start_idx + 1}-{start_idx + len(hits_df)}条，共{len(result)}条（第{current_page}/{total_pages}页）")
+    for (db_id, table), display_df in page_rows.items():
+        with st.expander(f"本页整行：{alias_map.get(db_id, db_id)} / {table}（{len(display_df)}行）", expanded=True):
+            st.dataframe(display_df, use_container_width=True, hide_index=True)
+
+    # 导出（点击后才生成文件，同一结果只生成一次）
+    st.markdown("### 💾 结果导出")
+    format_labels = {"csv": "CSV", "xlsx": "Excel", "parquet": "Parquet", "arrow": "Arrow/Feather", "ndjson": "NDJSON"}
+    result_formats = get_result_formats()
+    export_cols = st.columns(len(result_formats))
+    for export_col, file_format in zip(export_cols, result_formats):
+        label = format_labels.get(file_format, file_format)
+        with export_col:
+            path = get_export_cache().get(result.result_id, file_format)
+            if path is None and st.button(f"生成{label}文件", key=f"make_export_{file_format}",
+                                          use_container_width=True):
+                with st.spinner(f"正在生成{label}文件..."):
+                    path = get_result_export(result, file_format)
+                if path is None:
+                    st.error(f"❌ {label}文件生成失败，请查看控制台日志")
+                else:
+                    add_log(logger, f"生成{label}导出文件：关键词{result.keyword}，共{len(result)}条")
+            if path:
+                with open(path, "rb") as f:
+                    st.download_button(
+                        f"导出{label}", f,
+                        f"检索结果_{result.keyword}_{time.strftime('%Y%m%d_%H%M%S')}{EXPORT_FORMATS[file_format][0]}",
+                        mime=EXPORT_FORMATS[file_format][1],
+                        key=f"download_export_{file_format}",
+                        use_container_width=True
+                    )
+
+
+def run_search_with_checkpoints(engine, search_func, *args):
+    """
+    后台线程执行检索，主线程每隔poll_interval刷新一次已用时间；每次刷新都是Streamlit的中断点：
+    检索过程中页面重新运行（再次检索、点击取消）时在此中断，finally中取消检索，终止各库在途语句
+    """
+    progress_placeholder = st.empty()
+    start_time = time.time()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cae_ui_search")
+    future = executor.submit(search_func, *args)
+    try:
+        while True:
+            try:
+                return future.result(timeout=SEARCH_DEADLINE_CONFIG["poll_interval"])
+            except FutureTimeout:
+                progress_placeholder.caption(f"⏳ 已用时{round(time.time() - start_time, 1)}秒，仍在检索...")
+    finally:
+        if not future.done():
+            engine.cancel()
+        executor.shutdown(wait=False)
+        progress_placeholder.empty()
+
+
+def render_stream_export(keyword):
+    """流式导出：直接读取各库服务端游标写出文件（每张表一个CSV/工作表），适合结果过大无法在页面中加载的情况"""
+    with st.expander("⚡ 流式导出全部命中（直接读取数据库，不经过页面结果）", expanded=False):
+        stream_labels = {"zip": "CSV压缩包（每张表一个CSV）", "xlsx": "Excel（每张表一个工作表）"}
+        file_format = st.selectbox("导出格式", list(stream_labels.keys()), format_func=lambda fmt: stream_labels[fmt],
+                                   key="stream_export_format")
+        if st.button("开始流式导出", key="stream_export_btn"):
+            with st.spinner("正在逐表读取并写出，请稍候..."):
+                start_time = time.time()
+                path, row_count = export_table_stream(search_engine.iter_export_rows(keyword), file_format)
+                cost_time = round(time.time() - start_time, 2)
+            if path is None:
+                st.error("❌ 流式导出失败，请查看控制台日志")
+            else:
+                st.session_state.stream_export = {"keyword": keyword, "format": file_format, "path": path,
+                                                  "rows": row_count, "cost": cost_time}
+                add_log(logger, f"流式导出完成：关键词{keyword}，{row_count}行，耗时{cost_time}秒")
+        export = st.session_state.get("stream_export")
+        if export and export["keyword"] == keyword and os.path.exists(export["path"]):
+            st.caption(f"已导出{export['rows']}行，耗时{export['cost']}秒")
+            with open(export["path"], "rb") as f:
+                st.download_button(
+                    f"下载{stream_labels[export['format']]}", f,
+                    f"检索结果_{keyword}_{time.strftime('%Y%m%d_%H%M%S')}{EXPORT_FORMATS[export['format']][0]}",
+                    mime=EXPORT_FORMATS[export["format"]][1],
+                    key="download_stream_export"
+                )
 
 
 # ====================== 页面基础配置 ======================
@@ -127,7 +702,7 @@ with tab1:
                     "description": description,
                     "is_extend": DB_TYPE_TEMPLATES[db_type]["is_extend"]
                 }
-                db_id = add_db_to_list(st.session_state, new_db)
+                db_id = add_db_to_list(search_session, new_db)
                 st.success(f"✅ {db_alias} 添加成功！ID：{db_id}")
                 add_log(logger, f"新增数据库：{db_alias}（{db_type}），ID：{db_id}")
                 st.rerun()
@@ -136,32 +711,58 @@ with tab1:
 
     # 已添加数据库列表（核心改造：一个数据库一个独立展开框）
     st.markdown("### 📦 已添加数据库")
-    if st.session_state.dynamic_dbs:
-        for db_idx, db in enumerate(st.session_state.dynamic_dbs):
+    dynamic_dbs = search_session.list_dbs()
+    if dynamic_dbs:
+        for db_idx, db in enumerate(dynamic_dbs):
             db_id = db["db_id"]
-            auth = st.session_state.user_auth.get(db_id, {})
+            auth = search_session["user_auth"].get(db_id, {})
+
+            breaker = get_circuit_breaker(db_id)
+            breaker_status = breaker.get_status()
+            breaker_flag = "" if breaker_status["state"] == "closed" else f" {BREAKER_STATE_LABELS[breaker_status['state']]}"
 
             # 每个数据库一个独立的展开框（核心修改①）
-            with st.expander(f"📦 {db['db_alias']}（{db['db_type']}）", expanded=False):
+            with st.expander(f"📦 {db['db_alias']}（{db['db_type']}）{breaker_flag}", expanded=False):
                 # 数据库基本信息 + 操作按钮
                 col1, col2, col3 = st.columns([3, 1, 1])
                 with col1:
                     st.caption(f"ID：{db_id} | 主机：{db['host']}:{db['port']} | 库名：{db['database']}")
                     st.caption(f"描述：{db['description']}")
+                    if breaker_status["state"] == "closed":
+                        st.caption(f"连接状态：{BREAKER_STATE_LABELS['closed']}")
+                    else:
+                        # 已熔断：检索直接跳过该库，后台按退避间隔探测
+                        retry_in = breaker_status["retry_in"]
+                        st.caption(f"连接状态：{BREAKER_STATE_LABELS[breaker_status['state']]}，检索时跳过该库"
+                                   + (f"，{retry_in}秒后自动探测" if retry_in is not None else "")
+                                   + f"（累计熔断{breaker_status['trips']}次）")
+                        st.caption(f"最近错误：{breaker_status['last_error']}")
+                        if st.button("立即探测", key=f"probe_db_{db_id}"):
+                            with st.spinner("探测连接中..."):
+                                recovered = breaker.probe()
+                            add_log(logger, f"探测数据库{db['db_alias']}：{'已恢复' if recovered else '仍不可用'}")
+                            st.rerun()
                 with col2:
                     # 启用检索勾选框
                     enable_search = st.checkbox(
                         "启用检索",
                         value=db.get("enable_search", True),
                         key=f"db_enable_{db_id}",
-                        help="勾选后，该数据库会参与跨库检索"
+                        help="勾选后，该数据库会参与跨库检索（全局设置，修改对所有用户生效）"
                     )
                     if enable_search != db.get("enable_search", True):
-                        update_db_enable_search(st.session_state, db_id, enable_search)
+                        update_db_enable_search(search_session, db_id, enable_search)
+                        log_shared_change(db_id, f"数据库{db['db_alias']}{'启用' if enable_search else '停用'}检索")
                         st.rerun()
                 with col3:
                     if st.button("删除", type="secondary", key=f"del_db_{db_id}", use_container_width=True):
-                        delete_db_from_list(st.session_state, db_id)
+                        delete_db_from_list(search_session, db_id)
+                        close_pools(db_id)  # 释放该库在连接池中的连接
+                        remove_circuit_breaker(db_id)  # 移除该库的熔断状态
+                        get_shadow_index().drop_db(db_id)  # 删除该库的本地影子索引
+                        get_result_cache().invalidate(db_id)  # 清除该库的检索结果缓存
+                        get_schema_catalog().invalidate(make_catalog_key(db_id, db))  # 删除该库的列目录（含本地）
+                        get_search_stats_store().clear(db_id)  # 删除该库的检索统计
                         st.success(f"✅ {db['db_alias']} 已删除")
                         add_log(logger, f"删除数据库：{db['db_alias']}（{db_id}）")
                         st.rerun()
@@ -182,10 +783,15 @@ with tab1:
                                 if is_valid:
                                     st.success(f"✅ {msg}")
                                     add_log(logger, f"验证数据库{db['db_alias']}连接成功：{msg}")
-                                    # 加载表元信息
-                                    with st.spinner("加载表元信息..."):
-                                        load_db_table_meta(db_id)
-                                        st.success("✅ 表元信息加载完成")
+                                    if db.get("table_meta"):
+                                        # 表元信息已从本地持久化目录恢复，不再重新加载（检索时后台按表结构指纹校验）
+                                        st.info(f"已恢复{len(db['table_meta'])}张表的元信息，"
+                                                "表结构变化后可在「表结构与数据预览」中重新加载")
+                                    else:
+                                        # 加载表元信息
+                                        with st.spinner("加载表元信息..."):
+                                            load_db_table_meta(db_id)
+                                            st.success("✅ 表元信息加载完成")
                                 else:
                                     st.error(f"❌ {msg}")
                                     add_log(logger, f"验证数据库{db['db_alias']}连接失败：{msg}")
@@ -193,41 +799,14 @@ with tab1:
                 # 2. 表结构与数据预览（仅验证通过后显示）
                 if auth.get("is_verified", False):
                     with st.expander("📋 表结构与数据预览", expanded=False):
-                        table_meta = db.get("table_meta", {})
-                        if not table_meta:
-                            st.info("点击上方「测试连接」加载表元信息")
-                        else:
-                            enabled_tables = get_enabled_tables(st.session_state, db_id)
-                            st.caption(f"共{len(table_meta)}张表，其中{len(enabled_tables)}张启用检索")
-
-                            for table_name, meta in table_meta.items():
-                                # 表名大写+加黑（核心修改②）
-                                st.markdown(f"**{table_name.upper()}**")
-                                # 列名：大写+加黑展示（核心修改②）
-                                st.markdown(f"**列名：** {' | '.join([col.upper() for col in meta['columns']])}")
-
-                                # 前5条数据预览：去掉外层框、列名大写（核心修改②）
-                                st.markdown("**前5条数据预览：**")
-                                if meta["preview_data"]:
-                                    preview_df = pd.DataFrame(meta["preview_data"], columns=meta["columns"])
-                                    # 列名转为大写
-                                    preview_df.columns = [col.upper() for col in preview_df.columns]
-                                    # 展示数据：仅保留基础样式，移除额外框体（适配1.52.1版本）
-                                    st.dataframe(preview_df, use_container_width=True, hide_index=True)
-                                else:
-                                    st.info("该表暂无数据")
-
-                                # 检索该表的勾选框
-                                table_enable = st.checkbox(
-                                    "检索该表",
-                                    value=meta.get("enable_search", True),
-                                    key=f"table_enable_{db_id}_{table_name}",
-                                    help="勾选后，该表会参与检索"
-                                )
-                                if table_enable != meta.get("enable_search", True):
-                                    update_table_enable_search(st.session_state, db_id, table_name, table_enable)
-                                    st.rerun()
-                                st.divider()
+                        render_table_browser(db)
+                    # 3. 检索索引建议（频繁全表扫描的表）
+                    if db.get("table_meta"):
+                        with st.expander("🛠️ 检索索引建议", expanded=False):
+                            render_index_advisor(db)
+                        # 4. 本地影子索引
+                        with st.expander("🗂️ 本地影子索引", expanded=False):
+                            render_shadow_index(db)
                 else:
                     st.info("🔒 请先完成数据库连接验证，查看表结构与数据预览")
         st.divider()
@@ -255,92 +834,176 @@ with tab2:
             disabled=not keyword
         )
 
-    # 清空结果
-    if st.button("🗑️ 清空检索结果", key="clear_result"):
-        st.session_state.search_result = pd.DataFrame()
-        st.rerun()
+    search_mode_labels = {
+        "stream": "完整结果（流式）",
+        "paged": "分页检索",
+        "hits": "批量命中"
+    }
+    st.radio(
+        "检索模式",
+        options=list(search_mode_labels.keys()),
+        format_func=lambda mode: search_mode_labels[mode],
+        horizontal=True,
+        key="search_mode",
+        help="完整结果：读取全部命中行，首批到达即展示；\n"
+             "分页检索：LIMIT/主键分页下推到数据库，只读取当前页需要的行（不使用影子索引和结果缓存）；\n"
+             "批量命中：每个库用一条UNION ALL语句取回命中摘要（表、主键、命中列），翻页时才按主键取整行"
+    )
+    st.checkbox(
+        "使用本地影子索引",
+        key="use_shadow_index",
+        help="已建立影子索引的表由本地倒排索引回答，只按主键回源数据库取命中行；其余表仍直接检索数据库"
+    )
+
+    # 取消检索 / 清空结果 / 清空缓存
+    col0, col1, col2, col3 = st.columns([1, 1, 1, 2])
+    with col0:
+        if st.button("⏹️ 取消检索", key="cancel_search", help="终止本会话正在执行的检索，已取回的结果不保留"):
+            # 点击按钮会中断正在执行的检索脚本，这里再取消一次以防检索线程仍在运行
+            search_session.supersede(None)
+            add_log(logger, "用户取消检索")
+    with col1:
+        if st.button("🗑️ 清空检索结果", key="clear_result"):
+            st.session_state.search_result = None
+            st.session_state.search_stats = []
+            if st.session_state.paged_search is not None:
+                st.session_state.paged_search.cancel_count()
+            st.session_state.paged_search = None
+            st.rerun()
+    with col2:
+        if st.button("♻️ 清空检索缓存", key="clear_result_cache", help="清除所有会话共享的检索结果缓存，下次检索重新查询数据库"):
+            get_result_cache().invalidate()
+            add_log(logger, "用户清空检索结果缓存")
+            st.rerun()
+    with col3:
+        cache_stats = get_result_cache().get_stats()
+        st.caption(f"结果缓存：{cache_stats['entries']}条，{cache_stats['memory_mb']}MB，"
+                   f"命中{cache_stats['hits']}次/未命中{cache_stats['misses']}次")
 
     # 执行检索
+    search_mode = st.session_state.get("search_mode", "stream")
     if search_btn and keyword:
+        # 同一会话的上一次检索（如仍在执行）被新检索取代：终止其在途语句
+        search_session.supersede(search_engine)
+    if search_btn and keyword and search_mode == "hits":
+        add_log(logger, f"用户发起批量命中检索，关键词：{keyword}")
+        with st.spinner("正在批量检索所有启用的数据库，请稍候..."):
+            start_time = time.time()
+            result = run_search_with_checkpoints(search_engine, search_engine.search_hits_all_enabled_dbs, keyword)
+            cost_time = round(time.time() - start_time, 2)
+            st.session_state.paged_search = None
+            st.session_state.search_result = result
+            st.session_state.search_stats = search_engine.last_search_stats
+            st.session_state.search_history.append({
+                "keyword": keyword,
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "count": len(result),
+                "cost": cost_time
+            })
+            if len(st.session_state.search_history) > 10:
+                st.session_state.search_history.pop(0)
+            add_log(logger, f"批量命中检索完成：关键词{keyword}，命中{len(result)}条，耗时{cost_time}秒")
+    elif search_btn and keyword and search_mode == "paged":
+        add_log(logger, f"用户发起分页检索，关键词：{keyword}")
+        with st.spinner("正在检索第一页，请稍候..."):
+            start_time = time.time()
+            if st.session_state.paged_search is not None:
+                st.session_state.paged_search.cancel_count()
+            paged = search_engine.paged_search(keyword, st.session_state.get("page_size", 10))
+            first_page = paged.get_page(1)
+            cost_time = round(time.time() - start_time, 2)
+            st.session_state.paged_search = paged
+            st.session_state.paged_page_no = 1
+            st.session_state.search_result = None
+            st.session_state.search_stats = paged.get_table_stats()
+            st.session_state.search_history.append({
+                "keyword": keyword,
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "count": len(first_page),
+                "cost": cost_time
+            })
+            if len(st.session_state.search_history) > 10:
+                st.session_state.search_history.pop(0)
+            add_log(logger, f"分页检索完成：关键词{keyword}，第一页{len(first_page)}条，耗时{cost_time}秒")
+    elif search_btn and keyword:
         add_log(logger, f"用户发起一键检索，关键词：{keyword}")
+        st.session_state.paged_search = None
         with st.spinner("正在检索所有启用的数据库，请稍候..."):
             start_time = time.time()
-            # 执行检索（改回单线程）
-            result_df = search_engine.search_all_enabled_dbs(keyword)
+            # 流式检索：首批结果到达即展示第一页，后续批次只更新计数，全部完成后按数据库、表顺序合并
+            progress_placeholder = st.empty()
+            preview_placeholder = st.empty()
+            preview_size = st.session_state.get("page_size", 10)
+            preview_frames, preview_rows, total_rows = [], 0, 0
+            hit_tables = set()
+            # 长时间没有新批次时也定期刷新（None），使页面重新运行时能及时中断并取消检索
+            stream = search_engine.stream_all_enabled_dbs(keyword, heartbeat=SEARCH_DEADLINE_CONFIG["poll_interval"])
+            try:
+                for item in stream:
+                    if item is not None:
+                        db_id, table, batch_df = item
+                        total_rows += len(batch_df)
+                        hit_tables.add((db_id, table))
+                        if preview_rows < preview_size:
+                            preview_frames.append(batch_df.head(preview_size - preview_rows))
+                            preview_rows += len(preview_frames[-1])
+                            preview_placeholder.dataframe(pd.concat(preview_frames, ignore_index=True),
+                                                          use_container_width=True, hide_index=True)
+                    progress_placeholder.caption(f"⏳ 已找到{total_rows}条结果（{len(hit_tables)}张表），"
+                                                 f"已用时{round(time.time() - start_time, 1)}秒，仍在检索...")
+            finally:
+                stream.close()
+            progress_placeholder.empty()
+            preview_placeholder.empty()
+            result = search_engine.last_search_result
             end_time = time.time()
             cost_time = round(end_time - start_time, 2)
 
             # 更新结果
-            st.session_state.search_result = result_df
+            st.session_state.search_result = result
+            st.session_state.search_stats = search_engine.last_search_stats
             # 记录历史
             st.session_state.search_history.append({
                 "keyword": keyword,
                 "time": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "count": len(result_df),
+                "count": len(result),
                 "cost": cost_time
             })
             if len(st.session_state.search_history) > 10:
                 st.session_state.search_history.pop(0)
             # 日志
-            add_log(logger, f"检索完成：关键词{keyword}，返回{len(result_df)}条结果，耗时{cost_time}秒")
+            add_log(logger, f"检索完成：关键词{keyword}，返回{len(result)}条结果，耗时{cost_time}秒")
+
+    # 各表检索路径（索引检索/全表扫描）
+    if st.session_state.search_stats:
+        incomplete = [stat for stat in st.session_state.search_stats if stat["path"] in ("timeout", "cancelled")]
+        if incomplete:
+            st.warning(f"⚠️ {len(incomplete)}张表检索超时或被取消，结果不完整（详见下方各表检索路径）")
+        with st.expander("🧭 各表检索路径", expanded=False):
+            alias_map = {db["db_id"]: db["db_alias"] for db in search_session.list_dbs()}
+            stats_df = pd.DataFrame([{
+                "数据库": alias_map.get(stat["db_id"], stat["db_id"]),
+                "表名": stat["table"],
+                "检索路径": SEARCH_PATH_LABELS.get(stat["path"], stat["path"]),
+                "命中行数": stat["rows"],
+                "耗时（秒）": stat["elapsed"]
+            } for stat in st.session_state.search_stats])
+            st.dataframe(stats_df, use_container_width=True, hide_index=True)
 
     # 结果展示
     st.markdown("### 📊 检索结果")
-    if not st.session_state.search_result.empty:
-        result_df = st.session_state.search_result
-        # 结果概览
-        col_stats1, col_stats2, col_stats3 = st.columns(3)
-        with col_stats1:
-            st.metric("总结果数", value=len(result_df))
-        with col_stats2:
-            st.metric("涉及数据库数", value=len(result_df["_db_alias"].unique()))
-        with col_stats3:
-            st.metric("耗时（秒）", value=st.session_state.search_history[-1]["cost"])
-
-        # 分页
-        page_size = st.slider("每页显示条数", 5, 50, 10, key="page_size")
-        total_pages = max(1, (len(result_df) - 1) // page_size + 1)
-        current_page = st.number_input("页码", 1, total_pages, 1, key="current_page")
-        start_idx = (current_page - 1) * page_size
-        end_idx = min(start_idx + page_size, len(result_df))
-        display_df = result_df.iloc[start_idx:end_idx].copy()
-
-        # 关键词高亮
-        def highlight_keyword(text, kw):
-            if pd.isna(text) or not kw:
-                return text
-            return str(text).replace(kw, f"**{kw}**")
-
-        for col in display_df.columns:
-            if display_df[col].dtype == "object":
-                display_df[col] = display_df[col].apply(lambda x: highlight_keyword(x, keyword))
-
-        # 展示表格
-        st.dataframe(display_df, use_container_width=True, hide_index=True)
-        st.caption(f"显示第{start_idx + 1}-{end_idx}条，共{len(result_df)}条（第{current_page}/{total_pages}页）")
-
-        # 导出
-        st.markdown("### 💾 结果导出")
-        col1, col2 = st.columns(2)
-        with col1:
-            csv_data = export_to_csv(result_df)
-            st.download_button(
-                "导出CSV", csv_data,
-                f"检索结果_{keyword}_{time.strftime('%Y%m%d_%H%M%S')}.csv",
-                use_container_width=True
-            )
-        with col2:
-            excel_data = export_to_excel(result_df)
-            st.download_button(
-                "导出Excel", excel_data,
-                f"检索结果_{keyword}_{time.strftime('%Y%m%d_%H%M%S')}.xlsx",
-                use_container_width=True
-            )
+    has_result = st.session_state.search_result is not None and not st.session_state.search_result.empty
+    if st.session_state.paged_search is not None:
+        render_paged_result(st.session_state.paged_search)
+    elif has_result:
+        render_search_result(st.session_state.search_result)
     else:
         if search_btn:
             st.info(f"❌ 未检索到包含「{keyword}」的记录")
         else:
             st.info("请输入关键词，一键检索所有启用的数据库")
+    if keyword and (st.session_state.paged_search is not None or has_result):
+        render_stream_export(keyword)
 
 # ====================== 标签页3：操作日志 ======================
 with tab3:
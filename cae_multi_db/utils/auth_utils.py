@@ -3,47 +3,34 @@
 CAE多数据库检索工具 - 数据库权限验证工具
 适配动态数据库类型，支持MySQL/PostgreSQL/Qdrant（计划支持）
 """
-import pymysql
-import psycopg2
-
-
-def verify_mysql_connection(host, user, password, port, database):
+from cae_multi_db.adapters.circuit_breaker import get_circuit_breaker
+from cae_multi_db.adapters.mysql_adapter import MySQLAdapter
+from cae_multi_db.adapters.pg_adapter import PGAdapter
+
+
+def _verify_by_pool(adapter_class, db_type, host, user, password, port, database, db_id=None):
+    """
+    通过连接池借出并归还一个连接来验证凭据（验证成功的连接留在池中供后续检索复用）；
+    手动验证时先解除该库的熔断，实际尝试连接（失败会重新熔断）
+    """
+    db_id = db_id or f"{db_type}@{host}:{port}/{database}"
+    get_circuit_breaker(db_id).reset()
+    db_info = {"db_type": db_type, "host": host, "port": port, "database": database}
+    user_auth = {"user": user, "password": password, "port": port}
+    adapter = adapter_class(db_id, db_info, user_auth)
+    is_connected, msg = adapter.connect()
+    adapter.close()
+    return (is_connected, msg)
+
+
+def verify_mysql_connection(host, user, password, port, database, db_id=None):
     """验证MySQL数据库连接，返回（是否成功，错误信息）"""
-    try:
-        conn = pymysql.connect(
-            host=host,
-            user=user,
-            password=password,
-            port=int(port),
-            database=database,
-            charset="utf8mb4",
-            connect_timeout=5
-        )
-        conn.close()
-        return (True, "连接成功")
-    except Exception as e:
-        error_msg = f"MySQL连接失败：{str(e)}"
-        print(error_msg)
-        return (False, error_msg)
+    return _verify_by_pool(MySQLAdapter, "mysql", host, user, password, port, database, db_id)
 
 
-def verify_postgresql_connection(host, user, password, port, database):
+def verify_postgresql_connection(host, user, password, port, database, db_id=None):
     """验证PostgreSQL数据库连接，返回（是否成功，错误信息）"""
-    try:
-        conn = psycopg2.connect(
-            host=host,
-            user=user,
-            password=password,
-            port=int(port),
-            dbname=database,
-            connect_timeout=5
-        )
-        conn.close()
-        return (True, "连接成功")
-    except Exception as e:
-        error_msg = f"PostgreSQL连接失败：{str(e)}"
-        print(error_msg)
-        return (False, error_msg)
+    return _verify_by_pool(PGAdapter, "postgresql", host, user, password, port, database, db_id)
 
 
 def verify_qdrant_connection(host, user, password, port, database):
@@ -59,9 +46,9 @@ def verify_db_auth(db_id, user, password, port, db_info):
     db_type = db_info["db_type"]
 
     if db_type == "mysql":
-        return verify_mysql_connection(host, user, password, port, database)
+        return verify_mysql_connection(host, user, password, port, database, db_id)
     elif db_type == "postgresql":
-        return verify_postgresql_connection(host, user, password, port, database)
+        return verify_postgresql_connection(host, user, password, port, database, db_id)
     elif db_type == "qdrant":
         return verify_qdrant_connection(host, user, password, port, database)
     else:
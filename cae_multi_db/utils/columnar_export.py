@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 列式导出（Parquet / Arrow IPC(Feather v2) / NDJSON）
+供下游CAE后处理直接用pandas/NumPy读取：Parquet与Arrow按列保存并保留列类型，
+来源列_db_id/_db_alias/_table按字典编码保存；各格式都按表逐批（record batch）写出，内存占用与批大小相关，
+需回表的命中只读取一遍（schema由每张表的首批推断，首批在写出时复用）。
+Parquet/Arrow依赖pyarrow（可选依赖，未安装时这两种格式不可用），NDJSON只依赖pandas
+"""
+from itertools import chain
+
+import pandas as pd
+from cae_multi_db.config.db_config import EXPORT_CONFIG
+
+# 按字典编码保存的来源列
+DICTIONARY_COLUMNS = ["_db_id", "_db_alias", "_table"]
+
+
+def pyarrow_available():
+    """是否安装了pyarrow"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _iter_chunks(data, chunk_size=None):
+    """
+    按表逐批生成DataFrame（每批只含所属表自己的列）
+    :param data: DataFrame 或 SearchResult
+    """
+    chunk_size = chunk_size or EXPORT_CONFIG["chunk_size"]
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, len(data), chunk_size):
+            yield data.iloc[start:start + chunk_size]
+        return
+    for _, df in data.iter_table_rows(chunk_size):
+        yield df
+
+
+def _dictionary_values(data):
+    """来源列的字典取值（SearchResult直接取窄命中表的分类取值，所有批次共用同一字典）"""
+    if isinstance(data, pd.DataFrame):
+        return {col: [str(v) for v in data[col].dropna().unique()] for col in DICTIONARY_COLUMNS if col in data}
+    return {col: [str(v) for v in data.hits[col].cat.categories] for col in DICTIONARY_COLUMNS}
+
+
+def _infer_type(series):
+    """推断单列的Arrow类型（混合类型的object列按字符串保存）"""
+    import pyarrow as pa
+    try:
+        return pa.array(series, from_pandas=True).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.string()
+
+
+def _merge_types(left, right):
+    """合并同名列在不同表/批次中的类型：空列取另一方，可提升的类型（如int→double、decimal加宽）取提升后的类型，否则按字符串保存"""
+    import pyarrow as pa
+    if left == right or pa.types.is_null(right):
+        return left
+    if pa.types.is_null(left):
+        return right
+    try:
+        merged = pa.unify_schemas([pa.schema([("v", left)]), pa.schema([("v", right)])],
+                                  promote_options="permissive")
+        return merged.field("v").type
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.string()
+
+
+def _iter_table_batches(data, chunk_size=None):
+    """
+    按表生成(推断类型用的样本, 该表全部批次的迭代器)：DataFrame整体视为一张表；
+    SearchResult已取回整行的表以整表为样本，需回表的表先读取首批作为样本，首批在迭代批次时复用而不再回表
+    """
+    if isinstance(data, pd.DataFrame):
+        yield (data, _iter_chunks(data, chunk_size))
+        return
+    for key, batches in data.iter_tables(chunk_size or EXPORT_CONFIG["chunk_size"]):
+        first = next(batches, None)
+        if first is None:
+            continue
+        yield (data.frames.get(key, first), chain([first], batches))
+
+
+def _schema_from_samples(samples):
+    """由各表样本合并出统一的Arrow schema"""
+    import pyarrow as pa
+    types = {}
+    for sample in samples:
+        for col in sample.columns:
+            if col in DICTIONARY_COLUMNS:
+                types.setdefault(col, None)
+                continue
+            col_type = _infer_type(sample[col])
+            types[col] = col_type if col not in types else _merge_types(types[col], col_type)
+    fields = []
+    for col, col_type in types.items():
+        if col in DICTIONARY_COLUMNS:
+            fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(str(col), pa.string() if col_type is None or pa.types.is_null(col_type)
+                                   else col_type))
+    return pa.schema(fields)
+
+
+def infer_arrow_schema(data, chunk_size=None):
+    """
+    推断导出用的统一Arrow schema：各表列按首次出现顺序合并，来源列为dictionary<int32, string>，全空列按字符串保存
+    （需回表的表按首批推断，之后批次中类型不一致的值在写出时转换）
+    :return: pyarrow.Schema
+    """
+    return _schema_from_samples(sample for sample, _ in _iter_table_batches(data, chunk_size))
+
+
+def _prepare_batches(data, chunk_size=None):
+    """
+    写出前的准备：读取各表首批推断schema
+    :return: (schema, 按表依次生成的DataFrame批次) - 批次复用已读取的首批，全程只回表一遍
+    """
+    tables = list(_iter_table_batches(data, chunk_size))
+    schema = _schema_from_samples(sample for sample, _ in tables)
+    return (schema, chain.from_iterable(batches for _, batches in tables))
+
+
+def _to_arrow_array(series, field, dictionaries):
+    """按schema中的字段类型把一列转为Arrow数组"""
+    import pyarrow as pa
+    if pa.types.is_dictionary(field.type):
+        values = dictionaries.get(field.name, [])
+        codes = pd.Categorical(series.astype(str), categories=values).codes.astype("int32")
+        return pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), pa.array(values, type=pa.string()))
+    if pa.types.is_string(field.type):
+        values = [None if pd.isna(v) else (v if isinstance(v, str) else str(v)) for v in series.astype(object)]
+        return pa.array(values, type=pa.string())
+    try:
+        return pa.array(series, type=field.type, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.array(series, from_pandas=True).cast(field.type, safe=False)
+
+
+def iter_record_batches(data, schema, chunks=None, chunk_size=None):
+    """
+    按表逐批生成与schema一致的RecordBatch（本表没有的列填空值）
+    :param chunks: 已准备好的DataFrame批次（_prepare_batches的结果），缺省时按表逐批读取data
+    """
+    import pyarrow as pa
+    dictionaries = _dictionary_values(data)
+    for chunk in (chunks if chunks is not None else _iter_chunks(data, chunk_size)):
+        arrays = [
+            _to_arrow_array(chunk[field.name], field, dictionaries) if field.name in chunk.columns
+            else pa.nulls(len(chunk), type=field.type)
+            for field in schema
+        ]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_parquet_file(data, path, chunk_size=None, compression=None):
+    """
+    写出Parquet文件（按列压缩、保留列类型，每批一个row group）
+    :param data: DataFrame 或 SearchResult
+    :return: 文件路径
+    """
+    import pyarrow.parquet as pq
+    schema, chunks = _prepare_batches(data, chunk_size)
+    compression = compression or EXPORT_CONFIG["columnar_compression"]
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for batch in iter_record_batches(data, schema, chunks):
+            writer.write_batch(batch)
+    return path
+
+
+def write_arrow_file(data, path, chunk_size=None, compression=None):
+    """
+    写出Arrow IPC文件（即Feather v2，可用pandas.read_feather/pyarrow.feather读取）
+    :param data: DataFrame 或 SearchResult
+    :return: 文件路径
+    """
+    import pyarrow as pa
+    schema, chunks = _prepare_batches(data, chunk_size)
+    compression = compression or EXPORT_CONFIG["columnar_compression"]
+    options = pa.ipc.IpcWriteOptions(compression=compression if compression in ("lz4", "zstd") else None)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+        for batch in iter_record_batches(data, schema, chunks):
+            writer.write_batch(batch)
+    return path
+
+
+def write_ndjson_file(data, path, chunk_size=None):
+    """
+    写出NDJSON（JSON Lines）文件：每行一个JSON对象，每张表的行只包含自己的列和来源列，日期按ISO格式
+    :param data: DataFrame 或 SearchResult
+    :return: 文件路径
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in _iter_chunks(data, chunk_size):
+            text = chunk.to_json(orient="records", lines=True, force_ascii=False, date_format="iso",
+                                 default_handler=str)
+            f.write(text if text.endswith("\n") else text + "\n")
+    return path
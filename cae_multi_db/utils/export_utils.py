@@ -2,20 +2,319 @@
 """
 CAE多数据库检索工具 - 数据导出工具
 支持CSV/Excel格式导出检索结果，解决中文乱码问题
+检索结果（SearchResult）按表逐块写入临时文件，各表列按首次出现顺序对齐，不在内存中拼出整张宽表；
+Excel使用openpyxl只写模式逐行写出；导出文件按需生成，并按结果ID缓存，同一结果重复下载不再重新生成。
+超大结果可走流式导出：直接消费数据库服务端游标的行元组，每张表写成压缩包中的一个CSV（或Excel中的一个工作表），
+全程不构建DataFrame；Parquet/Arrow IPC/NDJSON等列式格式见columnar_export
 """
+import csv
+import io
+import os
+import re
+import threading
+import uuid
+import zipfile
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+
 import pandas as pd
 from io import BytesIO, StringIO
+from cae_multi_db.config.db_config import EXPORT_CONFIG
+from cae_multi_db.utils.columnar_export import (
+    pyarrow_available, write_parquet_file, write_arrow_file, write_ndjson_file
+)
+
+# Excel单个工作表的最大行数（超出时续写到新工作表）
+EXCEL_MAX_ROWS = 1048576
+# Excel工作表名不允许的字符
+_SHEET_NAME_INVALID = re.compile(r"[\[\]:*?/\\]")
+# 压缩包内文件名不允许的字符
+_FILE_NAME_INVALID = re.compile(r'[\\/:*?"<>|]')
+
+# 导出格式：{格式: (文件扩展名, MIME类型)}
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "zip": (".zip", "application/zip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+    "ndjson": (".ndjson", "application/x-ndjson")
+}
+
+
+def _iter_export_frames(data, chunk_size=None):
+    """
+    按块生成待导出的DataFrame
+    :param data: DataFrame 或 SearchResult
+    :return: 生成器DataFrame（SearchResult时每块为一张表的一批行，列已对齐到所有表列的并集）
+    """
+    chunk_size = chunk_size or EXPORT_CONFIG["chunk_size"]
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, max(len(data), 1), chunk_size):
+            yield data.iloc[start:start + chunk_size]
+        return
+    columns = data.get_columns()
+    for _, df in data.iter_table_rows(chunk_size):
+        yield df.reindex(columns=columns)
+
+
+def _excel_value(value):
+    """单元格取值转换：openpyxl不支持的类型转为文本，去除Excel不允许的控制字符"""
+    if value is None or isinstance(value, (bool, int, float, Decimal, datetime, date, dt_time)):
+        return value
+    if hasattr(value, "item"):
+        return value.item()
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+    return ILLEGAL_CHARACTERS_RE.sub("", str(value))
+
+
+def _excel_rows(df):
+    """DataFrame逐行转为Excel行（空值写为空单元格）"""
+    values = df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        yield [_excel_value(value) for value in row]
+
+
+class _SheetWriter:
+    """只写模式工作簿中的一个逻辑工作表：超过Excel行数上限时自动续写到新工作表"""
+
+    def __init__(self, workbook, title, columns):
+        self.workbook = workbook
+        self.title = title
+        self.columns = list(columns)
+        self.part = 0
+        self.rows = EXCEL_MAX_ROWS
+
+    def append(self, row):
+        if self.rows >= EXCEL_MAX_ROWS:
+            self.part += 1
+            title = self.title if self.part == 1 else f"{self.title[:27]}_{self.part}"
+            self.sheet = self.workbook.create_sheet(_unique_sheet_title(self.workbook, title))
+            self.sheet.append(self.columns)
+            self.rows = 1
+        self.sheet.append(row)
+        self.rows += 1
+
+
+def _unique_sheet_title(workbook, title):
+    """生成合法且不重复的工作表名（最长31字符）"""
+    title = _SHEET_NAME_INVALID.sub("_", str(title))[:31] or "Sheet"
+    existing = set(workbook.sheetnames)
+    candidate, idx = title, 1
+    while candidate in existing:
+        idx += 1
+        suffix = f"_{idx}"
+        candidate = title[:31 - len(suffix)] + suffix
+    return candidate
+
+
+def write_csv_file(data, path, chunk_size=None):
+    """
+    分块写出CSV文件（utf-8-sig，Excel打开中文不乱码）
+    :param data: DataFrame 或 SearchResult
+    :return: 文件路径
+    """
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        for idx, chunk in enumerate(_iter_export_frames(data, chunk_size)):
+            chunk.to_csv(f, index=False, header=idx == 0)
+    return path
+
+
+def write_excel_file(data, path, chunk_size=None):
+    """
+    用openpyxl只写模式逐行写出Excel文件（不在内存中保留整张工作表）
+    :param data: DataFrame 或 SearchResult
+    :return: 文件路径
+    """
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = None
+    for chunk in _iter_export_frames(data, chunk_size):
+        if sheet is None:
+            sheet = _SheetWriter(workbook, "检索结果", chunk.columns)
+        for row in _excel_rows(chunk):
+            sheet.append(row)
+    if sheet is None:
+        workbook.create_sheet("检索结果")
+    workbook.save(path)
+    return path
+
+
+def write_table_stream(table_stream, path, file_format="zip"):
+    """
+    流式导出：直接写出数据库游标读取的行元组（不构建DataFrame）
+    :param table_stream: 生成器(db_alias, 表名, 列名列表, 行元组列表)，同一张表的各批连续到达
+    :param file_format: zip - 每张表一个CSV的压缩包；xlsx - 每张表一个工作表
+    :return: (文件路径, 写出行数)
+    """
+    row_count = 0
+    if file_format == "xlsx":
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        current_key, sheet = None, None
+        for db_alias, table, columns, rows in table_stream:
+            if (db_alias, table) != current_key:
+                current_key = (db_alias, table)
+                sheet = _SheetWriter(workbook, f"{db_alias}_{table}", columns)
+            for row in rows:
+                sheet.append([_excel_value(value) for value in row])
+            row_count += len(rows)
+        if not workbook.sheetnames:
+            workbook.create_sheet("检索结果")
+        workbook.save(path)
+        return (path, row_count)
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        current_key, handle, writer, names = None, None, None, set()
+        try:
+            for db_alias, table, columns, rows in table_stream:
+                if (db_alias, table) != current_key:
+                    if handle is not None:
+                        handle.close()
+                    current_key = (db_alias, table)
+                    name = f"{_FILE_NAME_INVALID.sub('_', str(db_alias))}/{_FILE_NAME_INVALID.sub('_', str(table))}"
+                    idx, candidate = 1, f"{name}.csv"
+                    while candidate in names:
+                        idx += 1
+                        candidate = f"{name}_{idx}.csv"
+                    names.add(candidate)
+                    handle = io.TextIOWrapper(archive.open(candidate, "w"), encoding="utf-8-sig", newline="")
+                    writer = csv.writer(handle)
+                    writer.writerow(columns)
+                writer.writerows(rows)
+                row_count += len(rows)
+        finally:
+            if handle is not None:
+                handle.close()
+    return (path, row_count)
+
+
+# 检索结果导出的写出函数：{格式: 函数(data, path)}
+RESULT_WRITERS = {
+    "csv": write_csv_file,
+    "xlsx": write_excel_file,
+    "parquet": write_parquet_file,
+    "arrow": write_arrow_file,
+    "ndjson": write_ndjson_file
+}
+# 依赖pyarrow的格式
+PYARROW_FORMATS = {"parquet", "arrow"}
+
+
+def get_result_formats():
+    """当前环境可用的检索结果导出格式（未安装pyarrow时不含Parquet/Arrow）"""
+    has_pyarrow = pyarrow_available()
+    return [fmt for fmt in RESULT_WRITERS if has_pyarrow or fmt not in PYARROW_FORMATS]
+
+
+class ExportFileCache:
+    """
+    导出文件缓存（进程级，线程安全）：{结果ID: {格式: 文件路径}}
+    按生成顺序只保留最近max_results个结果的文件，更早的文件从临时目录删除
+    """
+
+    def __init__(self, export_dir=None, max_results=None):
+        self.export_dir = export_dir or EXPORT_CONFIG["export_dir"]
+        self.max_results = max_results or EXPORT_CONFIG["max_cached_results"]
+        os.makedirs(self.export_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._files = {}
+
+    def new_path(self, result_id, file_format):
+        """生成导出文件路径"""
+        return os.path.join(self.export_dir, f"{result_id}{EXPORT_FORMATS[file_format][0]}")
+
+    def get(self, result_id, file_format):
+        """已生成的导出文件路径（文件已被删除时返回None）"""
+        with self._lock:
+            path = self._files.get(result_id, {}).get(file_format)
+        return path if path and os.path.exists(path) else None
+
+    def put(self, result_id, file_format, path):
+        """登记导出文件，并清理超出保留数量的旧结果文件"""
+        with self._lock:
+            self._files.setdefault(result_id, {})[file_format] = path
+            expired = list(self._files)[:-self.max_results]
+            expired_paths = [p for rid in expired for p in self._files.pop(rid).values()]
+        for expired_path in expired_paths:
+            try:
+                os.remove(expired_path)
+            except OSError:
+                pass
+
+    def get_or_create(self, result_id, file_format, writer):
+        """
+        取导出文件，未生成时调用writer(临时路径)生成（写完再改名，避免读到半个文件）
+        :return: 文件路径，生成失败返回None
+        """
+        path = self.get(result_id, file_format)
+        if path:
+            return path
+        path = self.new_path(result_id, file_format)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            writer(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"导出{file_format}失败：{str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        self.put(result_id, file_format, path)
+        return path
+
+
+# 进程级单例（跨Streamlit重跑与会话共享）
+_EXPORT_CACHE = None
+_EXPORT_CACHE_LOCK = threading.Lock()
+
+
+def get_export_cache():
+    """获取进程级导出文件缓存"""
+    global _EXPORT_CACHE
+    with _EXPORT_CACHE_LOCK:
+        if _EXPORT_CACHE is None:
+            _EXPORT_CACHE = ExportFileCache()
+        return _EXPORT_CACHE
+
+
+def get_result_export(result, file_format):
+    """
+    按需生成检索结果的导出文件（同一结果ID、同一格式只生成一次）
+    :param result: SearchResult
+    :param file_format: RESULT_WRITERS中的格式
+    :return: 文件路径，生成失败返回None
+    """
+    writer = RESULT_WRITERS[file_format]
+    return get_export_cache().get_or_create(result.result_id, file_format, lambda path: writer(result, path))
+
+
+def export_table_stream(table_stream, file_format="zip"):
+    """
+    流式导出到临时文件（登记到导出文件缓存，按相同策略清理）
+    :return: (文件路径, 写出行数)，失败时返回(None, 0)
+    """
+    export_id = f"stream_{uuid.uuid4().hex}"
+    row_count = [0]
+
+    def writer(path):
+        row_count[0] = write_table_stream(table_stream, path, file_format)[1]
+
+    path = get_export_cache().get_or_create(export_id, file_format, writer)
+    return (path, row_count[0])
+
 
 def export_to_csv(df):
     """
-    将DataFrame导出为CSV格式（解决中文乱码）
-    :param df: 检索结果DataFrame
+    将检索结果导出为CSV格式（解决中文乱码）
+    :param df: 检索结果DataFrame或SearchResult
     :return: bytes - CSV字节数据（可直接用于Streamlit下载）
     """
     try:
         # StringIO处理字符串，指定编码为utf-8-sig解决中文乱码
         output = StringIO()
-        df.to_csv(output, index=False, encoding="utf-8-sig")
+        for idx, chunk in enumerate(_iter_export_frames(df)):
+            chunk.to_csv(output, index=False, header=idx == 0, encoding="utf-8-sig")
         output.seek(0)  # 重置指针到开头
         return output.getvalue().encode("utf-8-sig")
     except Exception as e:
@@ -24,17 +323,16 @@ def export_to_csv(df):
 
 def export_to_excel(df):
     """
-    将DataFrame导出为Excel格式
-    :param df: 检索结果DataFrame
+    将检索结果导出为Excel格式
+    :param df: 检索结果DataFrame或SearchResult
     :return: bytes - Excel字节数据（可直接用于Streamlit下载）
     """
     try:
-        # BytesIO处理二进制数据
+        # BytesIO处理二进制数据（只写模式逐行写出）
         output = BytesIO()
-        # 使用openpyxl引擎，支持.xlsx格式
-        df.to_excel(output, index=False, engine="openpyxl")
+        write_excel_file(df, output)
         output.seek(0)  # 重置指针到开头
         return output.getvalue()
     except Exception as e:
         print(f"Excel导出失败：{str(e)}")
-        return b""
\ No newline at end of file
+        return b""
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+CAE多数据库检索工具 - 文本归一化与分词工具
+供本地影子索引使用：中日韩文字切分为二元组（bigram），
+字母数字及单位类片段（如35m/s、Q235-B）切分为三元组（trigram），
+两种切分都能保证"关键词是原文子串"时关键词的分词结果是原文分词结果的子集；
+另提供检索结果展示用的关键词高亮（忽略大小写和全角/半角差异）
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+# 中日韩文字连续片段
+_CJK_RUN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]+")
+# 字母数字及单位类片段：字母数字开头，可包含 . _ / % + - 等连接符
+_WORD_RUN = re.compile(r"[0-9a-z][0-9a-z._/%+\-]*")
+
+
+def normalize_text(text):
+    """文本归一化：全角转半角（NFKC）+小写"""
+    if text is None:
+        return ""
+    return unicodedata.normalize("NFKC", str(text)).lower()
+
+
+def _ngrams(run, size):
+    """生成长度为size的滑动子串（片段不足size时返回空）"""
+    return {run[i:i + size] for i in range(len(run) - size + 1)}
+
+
+def tokenize_for_index(text):
+    """
+    索引分词：中日韩片段切二元组（单字片段保留单字），字母数字片段切三元组（不足3字符保留整体）
+    :return: set - 分词结果
+    """
+    text = normalize_text(text)
+    tokens = set()
+    for run in _CJK_RUN.findall(text):
+        tokens.update(_ngrams(run, 2) if len(run) > 1 else {run})
+    for run in _WORD_RUN.findall(text):
+        tokens.update(_ngrams(run, 3) if len(run) > 2 else {run})
+    return tokens
+
+
+def tokenize_keyword(keyword):
+    """
+    关键词分词：只保留能保证召回的分词（中日韩片段≥2字、字母数字片段≥3字符）
+    :return: set - 分词结果；为空表示该关键词无法由索引回答，应退回数据库检索
+    """
+    keyword = normalize_text(keyword)
+    tokens = set()
+    for run in _CJK_RUN.findall(keyword):
+        if len(run) > 1:
+            tokens.update(_ngrams(run, 2))
+    for run in _WORD_RUN.findall(keyword):
+        if len(run) > 2:
+            tokens.update(_ngrams(run, 3))
+    return tokens
+
+
+@lru_cache(maxsize=128)
+def build_highlight_pattern(keyword):
+    """
+    关键词高亮用的预编译正则：关键词先归一化，每个ASCII可见字符同时匹配其全角形式（如A/Ａ），
+    空格同时匹配全角空格，并忽略大小写；其余字符按原样转义
+    :return: re.Pattern，关键词为空时返回None
+    """
+    keyword = normalize_text(keyword).strip()
+    if not keyword:
+        return None
+    parts = []
+    for char in keyword:
+        if char == " ":
+            parts.append("[ \u3000]")
+        elif "!" <= char <= "~":
+            parts.append(f"[{re.escape(char)}{re.escape(chr(ord(char) + 0xFEE0))}]")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), re.IGNORECASE)
+
+
+def highlight_frame(df, keyword):
+    """
+    向量化关键词高亮：文本列中与关键词匹配的片段用**包围（Series.str.replace+预编译正则），空值保持不变
+    :return: 新的DataFrame（不修改传入的DataFrame）
+    """
+    pattern = build_highlight_pattern(keyword)
+    if pattern is None or df.empty:
+        return df
+    df = df.copy()
+    for col in df.columns:
+        series = df[col]
+        if series.dtype != "object" and str(series.dtype) != "string":
+            continue
+        present = series.notna()
+        if not present.any():
+            continue
+        texts = series[present].astype(str)
+        df[col] = series.where(~present, texts.str.replace(pattern, r"**\g<0>**", regex=True))
+    return df
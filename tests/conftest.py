@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具：以本地SQLite文件充当源数据库的适配器（只实现影子索引爬取和增量同步用到的接口），
+以及临时目录中的影子索引
+"""
+import os
+import sqlite3
+import zlib
+
+import pytest
+from cae_multi_db.core.shadow_index import ShadowIndex
+
+
+def _crc32(*values):
+    """与MySQL CRC32(CONCAT_WS('|', ...))等价的行/主键哈希"""
+    return zlib.crc32("|".join(str(v) for v in values if v is not None).encode("utf-8"))
+
+
+class SQLiteSourceAdapter:
+    """SQLite源表适配器：SQL片段与MySQLAdapter一致（%s占位、CRC32分块），标识符用双引号"""
+
+    def __init__(self, db_path, db_id="src"):
+        self.db_path = db_path
+        self.db_id = db_id
+        self.db_info = {"db_alias": db_id}
+        self.closed = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.create_function("CRC32", -1, _crc32)
+        return conn
+
+    @staticmethod
+    def _quote_ident(name):
+        return '"' + str(name).replace('"', '""') + '"'
+
+    def execute(self, sql, params=()):
+        """直接修改源表（模拟业务写入）"""
+        conn = self._connect()
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def iter_table_rows(self, table_name, columns, batch_size=5000, where_sql="", params=()):
+        q = self._quote_ident
+        sql = f"SELECT {', '.join(q(col) for col in columns)} FROM {q(table_name)}"
+        if where_sql:
+            sql += f" WHERE {where_sql}"
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql.replace("%s", "?"), tuple(params))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+    def _row_hash_sql(self, columns):
+        return f"CRC32({', '.join(self._quote_ident(col) for col in columns)})"
+
+    def _bucket_sql(self, pk_columns, buckets):
+        return f"(CRC32({', '.join(self._quote_ident(col) for col in pk_columns)}) % {int(buckets)})"
+
+    def _scalar(self, sql):
+        conn = self._connect()
+        try:
+            return conn.execute(sql).fetchone()[0]
+        finally:
+            conn.close()
+
+    def get_row_count(self, table_name):
+        return self._scalar(f"SELECT COUNT(*) FROM {self._quote_ident(table_name)}")
+
+    def get_max_value(self, table_name, column):
+        return self._scalar(f"SELECT MAX({self._quote_ident(column)}) FROM {self._quote_ident(table_name)}")
+
+    def get_chunk_checksums(self, table_name, columns, pk_columns, buckets):
+        bucket_sql = self._bucket_sql(pk_columns, buckets)
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"""
+                SELECT {bucket_sql} AS bucket, COUNT(*), SUM({self._row_hash_sql(columns)})
+                FROM {self._quote_ident(table_name)}
+                GROUP BY {bucket_sql}
+            """).fetchall()
+        finally:
+            conn.close()
+        return {int(bucket): [count, str(total)] for bucket, count, total in rows}
+
+    def close(self):
+        self.closed += 1
+
+
+# 源表：material有更新时间列（按水位同步），sim没有（按分块校验和同步）
+MATERIAL_SCHEMA = {
+    "columns": ["id", "name", "updated_at"],
+    "types": {"id": "int", "name": "varchar", "updated_at": "datetime"},
+    "primary_key": ["id"]
+}
+SIM_SCHEMA = {
+    "columns": ["id", "title"],
+    "types": {"id": "int", "title": "varchar"},
+    "primary_key": ["id"]
+}
+
+
+@pytest.fixture
+def source(tmp_path):
+    """带两张表的源数据库"""
+    adapter = SQLiteSourceAdapter(str(tmp_path / "source.sqlite3"))
+    adapter.execute("CREATE TABLE material (id INTEGER PRIMARY KEY, name TEXT, updated_at TEXT)")
+    adapter.execute("CREATE TABLE sim (id INTEGER PRIMARY KEY, title TEXT)")
+    for row in [(1, "steel Q235", "2026-01-01 10:00:00"), (2, "aluminium 6061", "2026-01-02 10:00:00"),
+                (3, "titanium TC4", "2026-01-02 10:00:00")]:
+        adapter.execute("INSERT INTO material VALUES (?, ?, ?)", row)
+    for i in range(1, 41):
+        adapter.execute("INSERT INTO sim VALUES (?, ?)", (i, f"case{i:03d} crash"))
+    return adapter
+
+
+@pytest.fixture
+def shadow_index(tmp_path):
+    """临时目录中的影子索引"""
+    return ShadowIndex(os.path.join(str(tmp_path), "shadow", "shadow_index.sqlite3"))
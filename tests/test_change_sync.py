@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""增量同步：更新时间列水位、分块校验和、删除清理与同步方式变化时的重爬"""
+import pytest
+from cae_multi_db.core.change_sync import ChangeSync, capture_sync_baseline, detect_sync_strategy
+from conftest import MATERIAL_SCHEMA, SIM_SCHEMA
+
+
+@pytest.fixture
+def change_sync(shadow_index):
+    return ChangeSync(shadow_index)
+
+
+def _crawl(shadow_index, source, table_name, schema):
+    is_ok, msg = shadow_index.crawl_table(source, "src", table_name, schema, baseline_fn=capture_sync_baseline)
+    assert is_ok, msg
+
+
+def _pks(shadow_index, keyword, table_name):
+    return sorted(shadow_index.search(keyword, "src", [table_name])[table_name]["pks"])
+
+
+def test_detect_sync_strategy():
+    assert detect_sync_strategy(MATERIAL_SCHEMA) == ("updated_at", "updated_at")
+    assert detect_sync_strategy(SIM_SCHEMA) == ("checksum", None)
+    # 名称匹配但不是时间类型的列不能作为水位
+    assert detect_sync_strategy({**MATERIAL_SCHEMA, "types": {**MATERIAL_SCHEMA["types"], "updated_at": "varchar"}}) \
+        == ("checksum", None)
+
+
+def test_updated_at_sync_reads_only_changed_rows(source, shadow_index, change_sync):
+    _crawl(shadow_index, source, "material", MATERIAL_SCHEMA)
+    assert change_sync.sync_table(source, "src", "material", MATERIAL_SCHEMA) == \
+        (True, "material同步完成：更新0行，删除0行")
+
+    source.execute("UPDATE material SET name = 'copper C110', updated_at = '2026-03-01 00:00:00' WHERE id = 2")
+    is_ok, msg = change_sync.sync_table(source, "src", "material", MATERIAL_SCHEMA)
+    assert is_ok and "更新1行" in msg
+    assert _pks(shadow_index, "copper", "material") == [(2,)]
+    assert _pks(shadow_index, "aluminium", "material") == []
+    state = shadow_index.get_sync_states("src")["material"]
+    assert state["watermark"] == "2026-03-01 00:00:00"
+    assert state["watermark_pks"] == ["[2]"]
+    # 水位行不会在每次同步时被>=重新计为变化
+    assert "更新0行" in change_sync.sync_table(source, "src", "material", MATERIAL_SCHEMA)[1]
+
+
+def test_updated_at_sync_picks_up_rows_at_the_watermark(source, shadow_index, change_sync):
+    _crawl(shadow_index, source, "material", MATERIAL_SCHEMA)
+    change_sync.sync_table(source, "src", "material", MATERIAL_SCHEMA)
+    # 与当前水位同一时刻写入的新行
+    source.execute("INSERT INTO material VALUES (4, 'nickel N6', '2026-01-02 10:00:00')")
+    is_ok, msg = change_sync.sync_table(source, "src", "material", MATERIAL_SCHEMA)
+    assert is_ok and "更新1行" in msg
+    assert _pks(shadow_index, "nickel", "material") == [(4,)]
+    assert "更新0行" in change_sync.sync_table(source, "src", "material", MATERIAL_SCHEMA)[1]
+
+
+def test_checksum_sync_catches_updates_without_timestamp(source, shadow_index, change_sync):
+    _crawl(shadow_index, source, "sim", SIM_SCHEMA)
+    source.execute("UPDATE sim SET title = 'case007 rollover' WHERE id = 7")
+    is_ok, msg = change_sync.sync_table(source, "src", "sim", SIM_SCHEMA)
+    assert is_ok
+    assert _pks(shadow_index, "rollover", "sim") == [(7,)]
+    # 只重读校验和变化的块，不是整表
+    assert 0 < int(msg.split("更新")[1].split("行")[0]) < 40
+    assert "更新0行" in change_sync.sync_table(source, "src", "sim", SIM_SCHEMA)[1]
+
+
+def test_deleted_rows_are_removed(source, shadow_index, change_sync):
+    _crawl(shadow_index, source, "sim", SIM_SCHEMA)
+    source.execute("DELETE FROM sim WHERE id IN (3, 5)")
+    is_ok, msg = change_sync.sync_table(source, "src", "sim", SIM_SCHEMA)
+    assert is_ok and "删除2行" in msg
+    assert shadow_index.get_table_states("src")["sim"]["doc_count"] == 38
+    assert "[3]" not in shadow_index.get_table_pks("src", "sim")
+
+
+def test_recrawl_when_strategy_or_columns_change(source, shadow_index, change_sync):
+    _crawl(shadow_index, source, "material", MATERIAL_SCHEMA)
+    # 更新时间列不再被识别（类型变化）：同步方式变化，改为全量重爬并记录新的基线
+    schema = {**MATERIAL_SCHEMA, "types": {**MATERIAL_SCHEMA["types"], "updated_at": "varchar"}}
+    is_ok, msg = change_sync.sync_table(source, "src", "material", schema)
+    assert is_ok and msg.endswith("（全量重爬）")
+    assert shadow_index.get_sync_states("src")["material"]["strategy"] == "checksum"
+
+    source.execute("ALTER TABLE material ADD COLUMN grade TEXT")
+    schema = {**schema, "columns": schema["columns"] + ["grade"]}
+    assert change_sync.sync_table(source, "src", "material", schema)[1].endswith("（全量重爬）")
+    assert change_sync.sync_table(source, "src", "material", schema)[1] == "material同步完成：更新0行，删除0行"
+
+
+def test_stale_tables(source, shadow_index, change_sync):
+    _crawl(shadow_index, source, "sim", SIM_SCHEMA)
+    assert change_sync.get_stale_tables("src", ["sim", "material"], max_lag=-1) == ["sim"]
+    assert change_sync.get_stale_tables("src", ["sim", "material"], max_lag=3600) == []
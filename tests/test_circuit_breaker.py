@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""数据库熔断器：closed → open → half_open → closed / open 的状态转换与退避"""
+import threading
+
+import pytest
+from cae_multi_db.adapters import circuit_breaker
+from cae_multi_db.adapters.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from cae_multi_db.config.db_config import CIRCUIT_BREAKER_CONFIG
+
+
+class Clock:
+    """可手动拨动的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "time", clock.time)
+    # 不启动后台探测线程，探测由测试显式调用
+    monkeypatch.setattr(circuit_breaker, "_ensure_prober", lambda: None)
+    monkeypatch.setitem(CIRCUIT_BREAKER_CONFIG, "enabled", True)
+    monkeypatch.setitem(CIRCUIT_BREAKER_CONFIG, "failure_threshold", 2)
+    monkeypatch.setitem(CIRCUIT_BREAKER_CONFIG, "base_backoff", 5)
+    monkeypatch.setitem(CIRCUIT_BREAKER_CONFIG, "max_backoff", 12)
+    return clock
+
+
+def _failing_probe():
+    raise ConnectionError("timed out")
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker("db")
+    breaker.record_failure(ConnectionError("refused"), probe=_failing_probe)
+    assert breaker.state == CLOSED and breaker.allow_request()
+    breaker.record_failure(ConnectionError("refused"))
+    assert breaker.state == OPEN and not breaker.allow_request()
+    status = breaker.get_status()
+    assert status["trips"] == 1 and status["retry_in"] == 5 and status["last_error"] == "refused"
+
+
+def test_success_resets_failures(clock):
+    breaker = CircuitBreaker("db")
+    breaker.record_failure(ConnectionError("refused"))
+    breaker.record_success()
+    breaker.record_failure(ConnectionError("refused"))
+    assert breaker.state == CLOSED
+
+
+def test_failed_probes_double_backoff_up_to_limit(clock):
+    breaker = CircuitBreaker("db")
+    for _ in range(2):
+        breaker.record_failure(ConnectionError("refused"), probe=_failing_probe)
+    assert not breaker.probe_due()
+    clock.now += 5
+    assert breaker.probe_due()
+    assert breaker.probe() is False
+    assert breaker.state == OPEN and breaker.backoff == 10 and breaker.last_error == "timed out"
+    clock.now += 10
+    breaker.probe()
+    assert breaker.backoff == 12
+    # 熔断期间的探测失败不累计熔断次数
+    assert breaker.get_status()["trips"] == 1
+
+
+def test_successful_probe_closes(clock):
+    breaker = CircuitBreaker("db")
+    probe_states = []
+    breaker.record_failure(ConnectionError("refused"))
+    breaker.record_failure(ConnectionError("refused"), probe=lambda: probe_states.append(breaker.state))
+    clock.now += 5
+    assert breaker.probe() is True
+    # 探测进行中为half_open，不放行检索
+    assert probe_states == [HALF_OPEN]
+    assert breaker.state == CLOSED and breaker.allow_request()
+    assert breaker.get_status()["retry_in"] is None
+    # 再次熔断时计为新的一次
+    breaker.record_failure(ConnectionError("refused"))
+    breaker.record_failure(ConnectionError("refused"))
+    assert breaker.get_status()["trips"] == 2
+
+
+def test_half_open_blocks_requests_and_concurrent_probes(clock):
+    breaker = CircuitBreaker("db")
+    started, release = threading.Event(), threading.Event()
+
+    def slow_probe():
+        started.set()
+        release.wait(5)
+
+    breaker.record_failure(ConnectionError("refused"))
+    breaker.record_failure(ConnectionError("refused"), probe=slow_probe)
+    worker = threading.Thread(target=breaker.probe)
+    worker.start()
+    assert started.wait(5)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+    assert not breaker.probe_due()
+    # 探测中再次调用不会重复探测
+    assert breaker.probe() is False
+    release.set()
+    worker.join(5)
+    assert breaker.state == CLOSED
+
+
+def test_reset_and_disabled(clock, monkeypatch):
+    breaker = CircuitBreaker("db")
+    breaker.record_failure(ConnectionError("refused"))
+    breaker.record_failure(ConnectionError("refused"))
+    monkeypatch.setitem(CIRCUIT_BREAKER_CONFIG, "enabled", False)
+    assert breaker.allow_request()
+    monkeypatch.setitem(CIRCUIT_BREAKER_CONFIG, "enabled", True)
+    breaker.reset()
+    assert breaker.state == CLOSED and breaker.failures == 0
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""列式导出：需回表的命中只读取一遍，首批推断的schema能容纳之后批次的空值"""
+import pandas as pd
+import pytest
+from cae_multi_db.core.search_result import SearchResult
+from cae_multi_db.utils.columnar_export import write_arrow_file, write_ndjson_file, write_parquet_file
+
+pa = pytest.importorskip("pyarrow")
+
+
+def _remote_result(table_rows):
+    """整行全部需回表的检索结果，fetched记录每次回表的命中数"""
+    fetched = []
+
+    def row_fetcher(hits):
+        fetched.append(len(hits))
+        rows = {}
+        for (db_id, table), group in hits.groupby(["_db_id", "_table"], observed=True):
+            ids = [int(pk.strip("[]")) for pk in group["_pk"]]
+            # id大于3的行val为空：首批没有空值，之后的批次出现空值
+            rows[(db_id, table)] = pd.DataFrame({"id": ids, "val": [None if i > 3 else i * 1.5 for i in ids],
+                                                 "_db_id": db_id, "_db_alias": db_id, "_table": table})
+        return rows
+
+    hits = pd.DataFrame([{"_db_id": "db", "_db_alias": "db", "_table": table, "_pk": f"[{i}]",
+                          "_matched_column": "val", "_snippet": "steel"}
+                         for table, count in table_rows.items() for i in range(count)])
+    pk_columns = {("db", table): ["id"] for table in table_rows}
+    return SearchResult.from_frames("steel", [], pk_columns, hits=hits, row_fetcher=row_fetcher), fetched
+
+
+@pytest.mark.parametrize("writer", [write_parquet_file, write_arrow_file, write_ndjson_file])
+def test_remote_rows_are_fetched_once(tmp_path, writer):
+    result, fetched = _remote_result({"a": 5, "b": 3})
+    writer(result, str(tmp_path / "out"), chunk_size=2)
+    # 每批回表一次，共8条命中（各表首批在推断schema时读取，写出时复用）
+    assert sorted(fetched) == [1, 1, 2, 2, 2]
+
+
+def test_parquet_keeps_types_and_late_nulls(tmp_path):
+    import pyarrow.parquet as pq
+    result, _ = _remote_result({"a": 5, "b": 3})
+    table = pq.read_table(write_parquet_file(result, str(tmp_path / "out.parquet"), chunk_size=2))
+    assert table.schema.field("id").type == pa.int64()
+    assert table.schema.field("val").type == pa.float64()
+    df = table.to_pandas()
+    assert list(df["_table"]) == ["a"] * 5 + ["b"] * 3
+    assert df["val"].isna().tolist() == [False] * 4 + [True] + [False] * 3
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+检索索引建议：生成的DDL与回滚语句一一对应，执行后回滚（含执行到一半失败时的自动回滚）能恢复原表结构
+DDL在一个只记录列、索引和扩展的表结构模型上执行，语义与MySQL/PostgreSQL一致：
+对象已存在/不存在时报错，IF [NOT] EXISTS时跳过
+"""
+import re
+
+import pytest
+from cae_multi_db.adapters.base_adapter import SEARCH_TEXT_COLUMN, SEARCH_TSV_COLUMN
+from cae_multi_db.adapters.pg_adapter import PGAdapter, _parse_search_index
+from cae_multi_db.core.index_advisor import (
+    apply_search_index, build_search_index_proposal, rollback_search_index, suggest_search_indexes
+)
+
+_IDENT = r'[`"]([^`"]+)[`"]'
+_DDL_PATTERNS = [
+    (re.compile(rf"ALTER TABLE {_IDENT} ADD COLUMN (IF NOT EXISTS )?{_IDENT}"), "add_column"),
+    (re.compile(rf"ALTER TABLE {_IDENT} DROP COLUMN (IF EXISTS )?{_IDENT}"), "drop_column"),
+    (re.compile(rf"ALTER TABLE {_IDENT} ADD FULLTEXT INDEX (){_IDENT}"), "add_index"),
+    (re.compile(rf"ALTER TABLE {_IDENT} DROP INDEX (){_IDENT}"), "drop_index"),
+    (re.compile(rf"CREATE INDEX CONCURRENTLY (IF NOT EXISTS )?{_IDENT} ON {_IDENT}"), "create_index"),
+    (re.compile(rf"DROP INDEX CONCURRENTLY (IF EXISTS )?{_IDENT}()"), "drop_index_pg"),
+    (re.compile(r"CREATE EXTENSION IF NOT EXISTS (\w+)"), "extension"),
+]
+
+
+class SchemaModelAdapter:
+    """在表结构模型上执行DDL的适配器（fail_at：执行到第几条语句时模拟一次失败，从0计）"""
+
+    def __init__(self, table_name, columns, fail_at=None):
+        self.db_id = "model"
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.indexes = set()
+        self.extensions = set()
+        self.executed = []
+        self.fail_at = fail_at
+        self.closed = 0
+
+    def snapshot(self):
+        return (list(self.columns), set(self.indexes))
+
+    def _apply(self, sql):
+        for pattern, action in _DDL_PATTERNS:
+            match = pattern.match(sql)
+            if not match:
+                continue
+            if action == "extension":
+                self.extensions.add(match.group(1))
+                return
+            if action in ("add_column", "drop_column", "add_index", "drop_index"):
+                table, guarded, name = match.groups()
+            else:
+                guarded, name, table = match.groups()
+            assert not table or table == self.table_name
+            if action == "add_column":
+                if name in self.columns:
+                    if guarded:
+                        return
+                    raise RuntimeError(f"Duplicate column name '{name}'")
+                self.columns.append(name)
+            elif action == "drop_column":
+                if name not in self.columns:
+                    if guarded:
+                        return
+                    raise RuntimeError(f"Can't DROP '{name}'; check that column/key exists")
+                self.columns.remove(name)
+            elif action in ("add_index", "create_index"):
+                if name in self.indexes:
+                    if guarded:
+                        return
+                    raise RuntimeError(f"Duplicate key name '{name}'")
+                self.indexes.add(name)
+            else:
+                if name not in self.indexes:
+                    if guarded:
+                        return
+                    raise RuntimeError(f"Can't DROP '{name}'; check that column/key exists")
+                self.indexes.discard(name)
+            return
+        raise AssertionError(f"未识别的DDL：{sql}")
+
+    def execute_ddl(self, statements, pause_seconds=0):
+        executed = 0
+        for sql in statements:
+            if self.fail_at is not None and len(self.executed) == self.fail_at:
+                self.fail_at = None  # 只失败一次，之后的回滚语句正常执行
+                return (False, f"第{executed + 1}条语句执行失败：模拟失败")
+            try:
+                self._apply(sql)
+            except RuntimeError as e:
+                return (False, f"第{executed + 1}条语句执行失败：{str(e)}")
+            self.executed.append(sql)
+            executed += 1
+        return (True, f"已执行{executed}条语句")
+
+    def close(self):
+        self.closed += 1
+
+
+MYSQL_SCHEMA = {
+    "columns": ["id", "name", "note", "payload"],
+    "types": {"id": "int", "name": "varchar", "note": "text", "payload": "blob"}
+}
+PG_SCHEMA = {
+    "columns": ["id", "name", "note", "doc"],
+    "types": {"id": "integer", "name": "character varying", "note": "text", "doc": "jsonb"}
+}
+PROPOSALS = [("mysql", MYSQL_SCHEMA, "trgm"), ("postgresql", PG_SCHEMA, "trgm"), ("postgresql", PG_SCHEMA, "tsvector")]
+
+
+def _proposal(db_type, schema, pg_kind):
+    return build_search_index_proposal(db_type, "material", schema, pg_kind)
+
+
+def test_mysql_proposal_ddl():
+    proposal = _proposal("mysql", MYSQL_SCHEMA, "trgm")
+    assert proposal["kind"] == "fulltext"
+    assert proposal["columns"] == ["id", "name", "note"]
+    assert proposal["ddl"] == [
+        f"ALTER TABLE `material` ADD COLUMN `{SEARCH_TEXT_COLUMN}` LONGTEXT GENERATED ALWAYS AS "
+        "(CONCAT_WS(' ', IFNULL(`id`, ''), IFNULL(`name`, ''), IFNULL(`note`, ''))) STORED",
+        f"ALTER TABLE `material` ADD FULLTEXT INDEX `ft_cae_search` (`{SEARCH_TEXT_COLUMN}`) WITH PARSER ngram"
+    ]
+    assert proposal["rollback"] == [
+        "ALTER TABLE `material` DROP INDEX `ft_cae_search`",
+        f"ALTER TABLE `material` DROP COLUMN `{SEARCH_TEXT_COLUMN}`"
+    ]
+
+
+def test_pg_proposal_ddl():
+    trgm = _proposal("postgresql", PG_SCHEMA, "trgm")
+    assert trgm["columns"] == ["name", "note"]
+    assert trgm["ddl"][1] == (
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_cae_trgm_material" ON "material" '
+        """USING gin ((COALESCE("name", '') || ' ' || COALESCE("note", '')) gin_trgm_ops)"""
+    )
+    assert trgm["rollback"] == ['DROP INDEX CONCURRENTLY IF EXISTS "idx_cae_trgm_material"']
+    tsv = _proposal("postgresql", PG_SCHEMA, "tsvector")
+    assert f'ADD COLUMN IF NOT EXISTS "{SEARCH_TSV_COLUMN}" tsvector' in tsv["ddl"][0]
+
+
+def test_no_proposal_without_searchable_columns():
+    assert _proposal("mysql", {"columns": ["payload"], "types": {"payload": "blob"}}, "trgm") is None
+    assert _proposal("postgresql", {"columns": ["id"], "types": {"id": "integer"}}, "trgm") is None
+    # 已有检索生成列不会被再次拼接进检索文本
+    schema = {"columns": ["name", SEARCH_TEXT_COLUMN], "types": {"name": "varchar", SEARCH_TEXT_COLUMN: "longtext"}}
+    assert _proposal("mysql", schema, "trgm")["columns"] == ["name"]
+
+
+def _pg_search_path(schema, keyword="kw"):
+    """建议的trgm索引创建后（按pg_indexes.indexdef解析），检索该表走的路径"""
+    proposal = _proposal("postgresql", schema, "trgm")
+    index_def = proposal["ddl"][1].replace(" CONCURRENTLY IF NOT EXISTS", "")
+    schema = {**schema, "search_indexes": _parse_search_index("idx_cae_trgm_material", index_def, schema["types"])}
+    pg = PGAdapter("pg", {"host": "localhost", "database": "d"}, {"user": "u", "password": "p", "port": 5432})
+    return proposal, pg._compile_where(schema["columns"], schema, keyword)
+
+
+def test_pg_proposal_is_used_by_search():
+    schema = {"columns": ["id", "name", "note", "active"],
+              "types": {"id": "integer", "name": "character varying", "note": "text", "active": "boolean"}}
+    proposal, (where_sql, params, path) = _pg_search_path(schema)
+    assert proposal["columns"] == ["name", "note", "active"]
+    assert """COALESCE("active"::text, '')""" in proposal["ddl"][1]
+    assert path == "trgm"
+    assert params == ("%kw%",)
+    # 不能进入索引表达式的转换列逐列OR匹配，仍走索引
+    schema = {"columns": ["name", "span"], "types": {"name": "text", "span": "interval"}}
+    proposal, (where_sql, params, path) = _pg_search_path(schema)
+    assert proposal["columns"] == ["name"]
+    assert path == "trgm"
+    assert '"span"::text LIKE %s' in where_sql and params == ("%kw%", "%kw%")
+    # 不参与检索的列不进入索引表达式
+    schema = {**schema, "skip_columns": ["span"]}
+    assert _pg_search_path(schema)[1][2] == "trgm"
+
+
+
+def test_pg_lower_trgm_index_is_not_used():
+    # lower(...)索引不区分大小写，用于默认（区分大小写）的子串检索会与全表扫描结果不一致
+    schema = {"columns": ["name"], "types": {"name": "text"}, "search_indexes": _parse_search_index(
+        "idx_lower", "CREATE INDEX idx_lower ON public.t USING gin (lower(name) gin_trgm_ops)", {"name": "text"})}
+    pg = PGAdapter("pg", {"host": "localhost", "database": "d"}, {"user": "u", "password": "p", "port": 5432})
+    assert pg._compile_where(["name"], schema, "Steel") == ('("name" LIKE %s)', ("%Steel%",), "scan")
+
+
+@pytest.mark.parametrize("db_type, schema, pg_kind", PROPOSALS)
+def test_apply_then_rollback_restores_schema(db_type, schema, pg_kind):
+    proposal = _proposal(db_type, schema, pg_kind)
+    adapter = SchemaModelAdapter("material", schema["columns"])
+    before = adapter.snapshot()
+
+    is_ok, msg = apply_search_index(adapter, proposal, pause_seconds=0)
+    assert is_ok, msg
+    assert adapter.snapshot() != before
+    is_ok, msg = rollback_search_index(adapter, proposal)
+    assert is_ok, msg
+    assert adapter.snapshot() == before
+    assert adapter.closed == 2
+
+
+@pytest.mark.parametrize("db_type, schema, pg_kind", PROPOSALS)
+def test_partial_failure_is_rolled_back(db_type, schema, pg_kind):
+    proposal = _proposal(db_type, schema, pg_kind)
+    for fail_at in range(len(proposal["ddl"])):
+        adapter = SchemaModelAdapter("material", schema["columns"], fail_at=fail_at)
+        before = adapter.snapshot()
+        is_ok, msg = apply_search_index(adapter, proposal, pause_seconds=0)
+        assert not is_ok
+        assert msg.endswith("已回滚已执行的部分")
+        assert adapter.snapshot() == before
+
+
+def test_rollback_of_missing_index_fails():
+    proposal = _proposal("mysql", MYSQL_SCHEMA, "trgm")
+    adapter = SchemaModelAdapter("material", MYSQL_SCHEMA["columns"])
+    is_ok, msg = rollback_search_index(adapter, proposal)
+    assert not is_ok and msg.startswith("回滚失败")
+
+
+def test_suggestions_follow_thresholds():
+    table_meta = {"material": {"enable_search": True}, "sim": {"enable_search": True},
+                  "off": {"enable_search": False}}
+    catalog_tables = {
+        "material": MYSQL_SCHEMA,
+        "sim": {**MYSQL_SCHEMA, "search_indexes": [{"kind": "fulltext", "columns": ["name"]}]},
+        "off": MYSQL_SCHEMA
+    }
+    db_stats = {"material": {"searches": 10, "scans": 10, "scan_time": 20.0},
+                "sim": {"searches": 10, "scans": 10, "scan_time": 20.0}}
+    proposals = suggest_search_indexes("mysql", table_meta, catalog_tables, db_stats)
+    assert [(p["table"], p["avg_scan_seconds"]) for p in proposals] == [("material", 2.0)]
+    assert suggest_search_indexes("mysql", table_meta, catalog_tables, {}) == []
+    assert [p["table"] for p in suggest_search_indexes("mysql", table_meta, catalog_tables, {}, show_all=True)] \
+        == ["material"]
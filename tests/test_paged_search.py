@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""分页检索：按表顺序惰性串接、翻页只查询到达的表、无主键表的稳定排序"""
+from collections import namedtuple
+
+import pandas as pd
+from cae_multi_db.adapters.mysql_adapter import MySQLAdapter
+from cae_multi_db.adapters.pg_adapter import PGAdapter
+from cae_multi_db.core.paged_search import PagedSearch
+
+Snapshot = namedtuple("Snapshot", ["db_id", "enabled_tables", "table_schemas"])
+
+
+class PagingAdapter:
+    """按表返回固定行数的分页适配器，记录每次分页查询"""
+
+    def __init__(self, table_rows, failing=()):
+        self.table_rows = table_rows
+        self.failing = set(failing)
+        self.calls = []
+
+    def fetch_search_page(self, table_name, keyword, schema, after_key, limit):
+        self.calls.append((table_name, after_key))
+        if table_name in self.failing:
+            raise RuntimeError("连接中断")
+        start = after_key or 0
+        end = min(start + limit, self.table_rows[table_name])
+        rows = [{"_table": table_name, "n": n} for n in range(start, end)]
+        return (pd.DataFrame(rows), end, "scan")
+
+    def close(self):
+        pass
+
+
+def _paged(table_rows, page_size=3, failing=()):
+    adapter = PagingAdapter(table_rows, failing)
+    snapshot = Snapshot("db", list(table_rows), {})
+    return PagedSearch("kw", [snapshot], lambda s: adapter, page_size=page_size), adapter
+
+
+def _keys(page):
+    return list(zip(page["_table"], page["n"]))
+
+
+def test_first_page_only_queries_tables_it_reaches():
+    paged, adapter = _paged({f"t{i}": 10 for i in range(20)})
+    assert _keys(paged.get_page(1)) == [("t0", 0), ("t0", 1), ("t0", 2)]
+    assert [table for table, _ in adapter.calls] == ["t0"]
+
+
+def test_pages_follow_table_order_across_tables():
+    paged, adapter = _paged({"a": 4, "b": 0, "c": 2})
+    assert _keys(paged.get_page(1)) == [("a", 0), ("a", 1), ("a", 2)]
+    assert _keys(paged.get_page(2)) == [("a", 3), ("c", 0), ("c", 1)]
+    assert paged.has_next_page(2)
+    assert paged.get_page(3).empty
+    assert not paged.has_next_page(2)
+    assert paged.loaded_rows() == 6
+    # 已读取的页直接返回，不再查询
+    calls = len(adapter.calls)
+    assert _keys(paged.get_page(1)) == [("a", 0), ("a", 1), ("a", 2)]
+    assert len(adapter.calls) == calls
+
+
+def test_jumping_ahead_reads_intermediate_pages_once():
+    paged, adapter = _paged({"a": 5, "b": 5})
+    assert _keys(paged.get_page(3)) == [("b", 1), ("b", 2), ("b", 3)]
+    assert adapter.calls == [("a", None), ("a", 3), ("b", None), ("b", 3)]
+
+
+def test_failing_table_is_skipped_and_reported():
+    paged, _ = _paged({"a": 2, "bad": 5, "c": 2}, failing=["bad"])
+    assert _keys(paged.get_page(1)) == [("a", 0), ("a", 1), ("c", 0)]
+    paths = {stat["table"]: stat["path"] for stat in paged.get_table_stats()}
+    assert paths == {"a": "scan", "bad": "error", "c": "scan"}
+
+
+def test_stable_order_for_tables_without_primary_key():
+    schema = {"types": {"id": "integer", "doc": "jsonb", "name": "text"}}
+    pg = PGAdapter("pg", {"host": "localhost", "database": "d"}, {"user": "u", "password": "p", "port": 5432})
+    assert pg._stable_order_sql(["id", "doc", "name"], schema) == '"id", "doc"::text, "name"'
+    schema = {"types": {"id": "int", "payload": "blob"}}
+    mysql = MySQLAdapter("my", {"host": "localhost", "database": "d"}, {"user": "u", "password": "p", "port": 3306})
+    assert mysql._stable_order_sql(["id", "payload"], schema) == "`id`, CAST(`payload` AS CHAR)"
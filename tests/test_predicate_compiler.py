@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""检索条件编译：数值/日期关键词解析与按列类型编译的检索条件"""
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from cae_multi_db.adapters.mysql_adapter import MySQLAdapter
+from cae_multi_db.adapters.pg_adapter import PGAdapter
+from cae_multi_db.adapters.predicate_compiler import (
+    MySQLPredicateCompiler, PGPredicateCompiler, parse_date_range, parse_number
+)
+
+MYSQL_TYPES = {"id": "int", "name": "varchar", "weight": "double", "price": "decimal",
+               "created": "datetime", "payload": "blob", "shift": "time"}
+
+
+@pytest.fixture
+def mysql():
+    return MySQLPredicateCompiler(MySQLAdapter._quote_ident)
+
+
+@pytest.mark.parametrize("keyword, expected", [
+    ("235", (Decimal("235"), 0)),
+    ("-1.50", (Decimal("-1.50"), 2)),
+    ("１２３", (Decimal("123"), 0)),  # 全角数字
+    ("1,200", (Decimal("1200"), 0)),
+    ("Q235", None),
+    ("1.2.3", None),
+])
+def test_parse_number(keyword, expected):
+    assert parse_number(keyword) == expected
+
+
+@pytest.mark.parametrize("keyword, expected", [
+    ("2026-01-03", (datetime(2026, 1, 3), datetime(2026, 1, 4))),
+    ("2026/1/3 8:05", (datetime(2026, 1, 3, 8, 5), datetime(2026, 1, 3, 8, 6))),
+    ("2026-01-03 10:00:05", (datetime(2026, 1, 3, 10, 0, 5), datetime(2026, 1, 3, 10, 0, 6))),
+    ("2026年12月", (datetime(2026, 12, 1), datetime(2027, 1, 1))),
+    ("2026-02-30", None),
+    ("2026-13", None),
+    ("steel", None),
+])
+def test_parse_date_range(keyword, expected):
+    assert parse_date_range(keyword) == expected
+
+
+def test_classify(mysql):
+    assert [mysql.classify(MYSQL_TYPES[col]) for col in MYSQL_TYPES] == \
+        ["integer", "text", "approx", "exact", "date", "skip", "cast_text"]
+    # 未知或缺失的类型按文本处理，保持可检索
+    assert mysql.classify(None) == "cast_text"
+
+
+def test_compile_text_keyword(mysql):
+    assert mysql.compile(list(MYSQL_TYPES), MYSQL_TYPES, "steel") == \
+        ("(`name` LIKE %s OR `shift` LIKE %s)", ("%steel%", "%steel%"))
+    # 只有不参与检索的列时没有条件
+    assert mysql.compile(["payload"], MYSQL_TYPES, "steel") is None
+
+
+def test_compile_number_keyword(mysql):
+    where_sql, params = mysql.compile(list(MYSQL_TYPES), MYSQL_TYPES, "12", skip_columns={"name"})
+    assert where_sql == "(`id` = %s OR (`weight` >= %s AND `weight` < %s) OR `price` = %s OR `shift` LIKE %s)"
+    assert params == (12, 11.5, 12.5, Decimal("12"), "%12%")
+    # 带小数的关键词不匹配整数列，浮点列按关键词精度匹配
+    where_sql, params = mysql.compile(["id", "weight"], MYSQL_TYPES, "1.5")
+    assert where_sql == "((`weight` >= %s AND `weight` < %s))"
+    assert params == pytest.approx((1.45, 1.55))
+
+
+def test_compile_date_keyword(mysql):
+    assert mysql.compile(["created", "id"], MYSQL_TYPES, "2026-01-03") == \
+        ("((`created` >= %s AND `created` < %s))", (datetime(2026, 1, 3), datetime(2026, 1, 4)))
+
+
+def test_compile_without_text(mysql):
+    assert mysql.compile(["name", "id"], MYSQL_TYPES, "12", include_text=False) == ("(`id` = %s)", (12,))
+
+
+def test_pg_casts_non_text_columns():
+    pg = PGPredicateCompiler(PGAdapter._quote_ident)
+    assert pg.compile(["uid", "name"], {"uid": "uuid", "name": "text"}, "ab") == \
+        ('("uid"::text LIKE %s OR "name" LIKE %s)', ("%ab%", "%ab%"))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""检索结果缓存：缓存键的组成、按库失效、有效期与表结构变化时的失效"""
+import pandas as pd
+import pytest
+from cae_multi_db.config.db_config import CATALOG_STORE_CONFIG
+from cae_multi_db.core import result_cache
+from cae_multi_db.core.result_cache import ResultCache, make_result_key
+from cae_multi_db.core.schema_catalog import SchemaCatalog
+
+FRAMES = [pd.DataFrame({"name": ["steel Q235"], "_db_id": "db1", "_table": "material"})]
+STATS = [{"table": "material", "path": "scan"}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(max_memory_mb=16, default_ttl=600, db_ttl={}, persist=False, disk_dir=str(tmp_path))
+
+
+def _key(db_id="db1", **kwargs):
+    args = {"keyword": "steel", "tables": ["material", "sim"], "schema_version": "fp1"}
+    args.update(kwargs)
+    return make_result_key(args.pop("keyword"), db_id, args.pop("tables"), args.pop("schema_version"), **args)
+
+
+def test_key_normalization():
+    assert _key(keyword=" steel ") == _key()
+    assert _key(tables=["sim", "material"]) == _key()
+
+
+@pytest.mark.parametrize("changed", [
+    {"keyword": "copper"}, {"tables": ["material"]}, {"schema_version": "fp2"},
+    {"use_shadow_index": True}, {"identity": ("host", "db", "other_user")},
+])
+def test_key_changes_with_each_component(changed):
+    base = _key(identity=("host", "db", "user"))
+    assert _key(**{"identity": ("host", "db", "user"), **changed}) != base
+
+
+def test_identity_is_digested():
+    key = _key(identity=("host", "db", "user", "secret"))
+    assert "secret" not in repr(key)
+
+
+def test_get_put_and_copy(cache):
+    key = _key()
+    assert cache.get(key) is None
+    cache.put(key, FRAMES, STATS)
+    frames, stats = cache.get(key)
+    frames[0]["extra"] = 1
+    assert "extra" not in cache.get(key)[0][0].columns
+    assert stats == STATS
+    assert cache.get_stats()["hits"] == 2 and cache.get_stats()["misses"] == 1
+
+
+def test_invalidate_by_db(cache):
+    cache.put(_key("db1"), FRAMES, STATS)
+    cache.put(_key("db2"), FRAMES, STATS)
+    cache.invalidate("db1")
+    assert cache.get(_key("db1")) is None
+    assert cache.get(_key("db2")) is not None
+    cache.invalidate()
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_ttl(cache, monkeypatch):
+    cache.db_ttl["nocache"] = 0
+    cache.put(_key("nocache"), FRAMES, STATS)
+    assert cache.get(_key("nocache")) is None
+    cache.put(_key(), FRAMES, STATS)
+    now = result_cache.time.time()
+    monkeypatch.setattr(result_cache.time, "time", lambda: now + 601)
+    assert cache.get(_key()) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_persisted_entries_are_invalidated(tmp_path):
+    cache = ResultCache(max_memory_mb=16, default_ttl=600, db_ttl={}, persist=True, disk_dir=str(tmp_path))
+    cache.put(_key("db1"), FRAMES, STATS)
+    cache.put(_key("db2"), FRAMES, STATS)
+    # 新的缓存实例（进程重启）从磁盘命中
+    reloaded = ResultCache(max_memory_mb=16, default_ttl=600, db_ttl={}, persist=True, disk_dir=str(tmp_path))
+    assert reloaded.get(_key("db1")) is not None
+    reloaded.invalidate("db1")
+    fresh = ResultCache(max_memory_mb=16, default_ttl=600, db_ttl={}, persist=True, disk_dir=str(tmp_path))
+    assert fresh.get(_key("db1")) is None
+    assert fresh.get(_key("db2")) is not None
+
+
+def test_schema_change_invalidates_db(cache, monkeypatch):
+    monkeypatch.setitem(CATALOG_STORE_CONFIG, "enabled", False)
+    monkeypatch.setattr(result_cache, "_RESULT_CACHE", cache)
+    catalog = SchemaCatalog(refresh_interval=60, refresh_workers=1)
+    catalog_key = ("mysql", "db1", "host", "3306", "cae")
+    catalog.update(catalog_key, "fp1", {"material": {"columns": ["name"]}})
+    cache.put(_key(schema_version=catalog.get_fingerprint(catalog_key)), FRAMES, STATS)
+    # 指纹未变化：缓存保留
+    assert not catalog.update(catalog_key, "fp1", {"material": {"columns": ["name"]}})
+    assert cache.get(_key()) is not None
+    # 指纹变化：该库缓存清除，新键也不会命中旧结果
+    assert catalog.update(catalog_key, "fp2", {"material": {"columns": ["name", "grade"]}})
+    assert cache.get(_key()) is None
+    assert cache.get(_key(schema_version=catalog.get_fingerprint(catalog_key))) is None
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""检索结果模型：窄命中分页、按表逐批取整行（导出不缓存）与回表整行缓存的淘汰"""
+import pandas as pd
+import pytest
+from cae_multi_db.config.db_config import BATCH_SEARCH_CONFIG
+from cae_multi_db.core.search_result import SearchResult
+
+
+def _material_frame():
+    return pd.DataFrame({"id": [1, 2, 3], "name": ["steel Q235", "steel 45", "copper steel"],
+                         "_db_id": "db", "_db_alias": "db", "_table": "material"})
+
+
+def _result(remote_rows=4):
+    """material为已取回整行的表，sim的整行需回表；fetched记录每次回表的主键"""
+    fetched = []
+
+    def row_fetcher(hits):
+        fetched.append(list(hits["_pk"]))
+        ids = [int(pk.strip("[]")) for pk in hits["_pk"]]
+        return {("db", "sim"): pd.DataFrame({"id": ids, "title": [f"case{i} steel" for i in ids],
+                                             "_db_id": "db", "_db_alias": "db", "_table": "sim"})}
+
+    hits = pd.DataFrame([{"_db_id": "db", "_db_alias": "db", "_table": "sim", "_pk": f"[{i}]",
+                          "_matched_column": "title", "_snippet": f"case{i} steel"} for i in range(remote_rows)])
+    result = SearchResult.from_frames(
+        "steel", [_material_frame()], {("db", "material"): ["id"], ("db", "sim"): ["id"]}, hits=hits,
+        row_fetcher=row_fetcher, table_order=[("db", "material"), ("db", "sim")],
+        table_columns={("db", "sim"): ["id", "title", "_db_id", "_db_alias", "_table"]})
+    return result, fetched
+
+
+def test_get_page():
+    result, fetched = _result()
+    assert len(result) == 7
+    assert list(result.get_page(1, 3)["_pk"]) == ["[1]", "[2]", "[3]"]
+    assert list(result.get_page(2, 3)["_pk"]) == ["[0]", "[1]", "[2]"]
+    assert list(result.get_page(3, 3)["_table"]) == ["sim"]
+    assert result.get_page(4, 3).empty
+    # 取页只读窄命中，不回表
+    assert fetched == []
+
+
+def test_get_rows_fetches_and_caches_remote_rows():
+    result, fetched = _result()
+    rows = result.get_rows(result.get_page(1, 4))
+    assert list(rows) == [("db", "material"), ("db", "sim")]
+    assert list(rows[("db", "material")]["id"]) == [1, 2, 3]
+    assert list(rows[("db", "sim")]["id"]) == [0]
+    # 已缓存的主键不再回表
+    result.get_rows(result.get_page(1, 4))
+    assert list(result.get_rows(result.get_page(2, 4))[("db", "sim")]["id"]) == [1, 2, 3]
+    assert fetched == [["[0]"], ["[1]", "[2]", "[3]"]]
+
+
+def test_iter_table_rows_in_chunks_without_caching():
+    result, fetched = _result(remote_rows=5)
+    chunks = [(key, list(df["id"])) for key, df in result.iter_table_rows(chunk_size=2)]
+    assert chunks == [(("db", "material"), [1, 2]), (("db", "material"), [3]),
+                      (("db", "sim"), [0, 1]), (("db", "sim"), [2, 3]), (("db", "sim"), [4])]
+    assert len(fetched) == 3
+    assert not result._fetched
+    # 每张表的批次在迭代到时才回表
+    tables = result.iter_tables(chunk_size=2)
+    next(tables)
+    key, batches = next(tables)
+    assert key == ("db", "sim") and len(fetched) == 3
+    next(batches)
+    assert len(fetched) == 4
+
+
+def test_get_columns_uses_catalog_columns():
+    result, fetched = _result()
+    assert result.get_columns() == ["id", "name", "_db_id", "_db_alias", "_table", "title"]
+    assert fetched == []
+
+
+def test_fetched_rows_are_bounded(monkeypatch):
+    monkeypatch.setitem(BATCH_SEARCH_CONFIG, "max_fetched_rows", 3)
+    result, fetched = _result(remote_rows=5)
+    sim_hits = result.hits[result.hits["_table"] == "sim"]
+    result.get_rows(sim_hits)
+    assert list(result._fetched[("db", "sim")].index) == ["[2]", "[3]", "[4]"]
+    # 被淘汰的行再次展示时重新回表
+    rows = result.get_rows(sim_hits.iloc[:1])
+    assert list(rows[("db", "sim")]["id"]) == [0]
+    assert fetched[-1] == ["[0]"]
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 7, 10])
+def test_pages_cover_all_hits_once(page_size):
+    result, _ = _result()
+    pages = [result.get_page(page_no, page_size) for page_no in range(1, len(result) // page_size + 2)]
+    assert sum(len(page) for page in pages) == len(result)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""影子索引：全量爬取、候选查找、增量写入与删除"""
+from conftest import MATERIAL_SCHEMA, SIM_SCHEMA
+
+
+def test_crawl_and_search(source, shadow_index):
+    is_ok, msg = shadow_index.crawl_table(source, "src", "material", MATERIAL_SCHEMA)
+    assert is_ok, msg
+    state = shadow_index.get_table_states("src")["material"]
+    assert state["status"] == "ready"
+    assert state["doc_count"] == 3
+    assert state["pk_columns"] == ["id"]
+
+    found = shadow_index.search("steel", "src", ["material"])
+    assert found["material"]["pks"] == [(1,)]
+    assert shadow_index.search("nothing", "src", ["material"])["material"]["pks"] == []
+    # 无法由索引保证召回的关键词（过短）返回None，由调用方退回数据库检索
+    assert shadow_index.search("st", "src", ["material"]) is None
+
+
+def test_crawl_replaces_previous_index(source, shadow_index):
+    shadow_index.crawl_table(source, "src", "material", MATERIAL_SCHEMA)
+    source.execute("DELETE FROM material WHERE id = 1")
+    shadow_index.crawl_table(source, "src", "material", MATERIAL_SCHEMA)
+    assert shadow_index.get_table_states("src")["material"]["doc_count"] == 2
+    assert shadow_index.search("steel", "src", ["material"])["material"]["pks"] == []
+
+
+def test_table_without_primary_key_is_skipped(source, shadow_index):
+    is_ok, _ = shadow_index.crawl_table(source, "src", "sim", {**SIM_SCHEMA, "primary_key": []})
+    assert not is_ok
+    assert shadow_index.get_table_states("src")["sim"]["status"] == "no_pk"
+    assert shadow_index.search("crash", "src", ["sim"]) == {}
+
+
+def test_index_rows_upserts_and_deletes(source, shadow_index):
+    shadow_index.crawl_table(source, "src", "material", MATERIAL_SCHEMA)
+    columns = MATERIAL_SCHEMA["columns"]
+    shadow_index.index_rows("src", "material", columns, ["id"], [(1, "copper C110", "2026-02-01 00:00:00")],
+                            deleted_pks=[(3,)])
+    assert shadow_index.search("steel", "src", ["material"])["material"]["pks"] == []
+    assert shadow_index.search("copper", "src", ["material"])["material"]["pks"] == [(1,)]
+    assert shadow_index.search("titanium", "src", ["material"])["material"]["pks"] == []
+    assert shadow_index.get_table_states("src")["material"]["doc_count"] == 2
+    assert shadow_index.get_table_pks("src", "material") == {"[1]", "[2]"}
+
+
+def test_too_many_candidates_fall_back(source, shadow_index):
+    shadow_index.crawl_table(source, "src", "sim", SIM_SCHEMA)
+    assert len(shadow_index.search("crash", "src", ["sim"])["sim"]["pks"]) == 40
+    assert shadow_index.search("crash", "src", ["sim"], max_candidates=10) == {}
+
+
+def test_drop_db(source, shadow_index):
+    shadow_index.crawl_table(source, "src", "material", MATERIAL_SCHEMA)
+    shadow_index.drop_db("src")
+    assert shadow_index.get_table_states("src") == {}